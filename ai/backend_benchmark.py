@@ -0,0 +1,152 @@
+"""
+Сравнение бэкендов инференса ProductClassifier: точность относительно fp32 и скорость на CPU.
+
+Пример:
+    python -m ai.backend_benchmark --backends torch int8 onnx
+    python -m ai.backend_benchmark --classifier-model ./tiny-cls --ner-model ./tiny-ner
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .classifier import ModelRegistry, ProductClassifier
+
+DESCRIPTIONS_PATH = "data/benchmark_descriptions.json"
+
+
+def load_descriptions(path: str = DESCRIPTIONS_PATH, language: Optional[str] = None) -> List[str]:
+    """
+    Загружает фиксированный набор описаний товаров
+
+    Args:
+        path (str): Путь к JSON со списком {"language", "text"}
+        language (Optional[str]): Оставить только описания на этом языке
+
+    Returns:
+        List[str]: Описания
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    return [item["text"] for item in items if language is None or item["language"] == language]
+
+
+def _make_classifier(backend: str, language: str, classifier_model: Optional[str],
+                     ner_model: Optional[str]) -> ProductClassifier:
+    """Классификатор с отдельным реестром, чтобы бэкенды не делили загруженные модели"""
+    overrides = {}
+    if classifier_model:
+        overrides["CLASSIFIER_MODELS"] = {}
+        overrides["DEFAULT_CLASSIFIER_MODEL"] = classifier_model
+    if ner_model:
+        overrides["NER_MODEL"] = ner_model
+    classifier_class = type("BenchmarkClassifier", (ProductClassifier,), overrides) if overrides else ProductClassifier
+    return classifier_class(language=language, model_registry=ModelRegistry(), backend=backend)
+
+
+def _entity_f1(reference: List[Dict], candidate: List[Dict]) -> float:
+    """F1 совпадения сущностей (текст, тип) с эталоном"""
+    expected = {(entity["text"], entity["type"]) for entity in reference}
+    found = {(entity["text"], entity["type"]) for entity in candidate}
+    if not expected and not found:
+        return 1.0
+    matched = len(expected & found)
+    if not matched:
+        return 0.0
+    precision = matched / len(found)
+    recall = matched / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _timed(function, texts: List[str], repeats: int) -> Tuple[List, float]:
+    """Медианное время на одно описание, секунды"""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function(texts)
+        timings.append((time.perf_counter() - started) / max(len(texts), 1))
+    return result, statistics.median(timings)
+
+
+def compare_backends(texts: Sequence[str], backends: Sequence[str] = ("torch", "int8"),
+                     language: str = "ru", classifier_model: Optional[str] = None,
+                     ner_model: Optional[str] = None, repeats: int = 3) -> Dict[str, Dict]:
+    """
+    Сравнивает бэкенды инференса с эталоном fp32 ("torch")
+
+    Args:
+        texts (Sequence[str]): Описания товаров
+        backends (Sequence[str]): Бэкенды для сравнения
+        language (str): Язык классификатора
+        classifier_model (Optional[str]): Модель классификации вместо стандартной (например, маленькая локальная)
+        ner_model (Optional[str]): NER-модель вместо стандартной
+        repeats (int): Количество повторов замера
+
+    Returns:
+        Dict[str, Dict]: Для каждого бэкенда - задержки на описание, ускорение и согласие с эталоном
+    """
+    texts = list(texts)
+    runs = {}
+    for backend in ["torch", *[b for b in backends if b != "torch"]]:
+        classifier = _make_classifier(backend, language, classifier_model, ner_model)
+        started = time.perf_counter()
+        classifier.warm_up()
+        load_time = time.perf_counter() - started
+
+        labels, classify_latency = _timed(classifier.classify_batch, texts, repeats)
+        entities, ner_latency = _timed(classifier.ner_batch, texts, repeats)
+        runs[backend] = {
+            "labels": labels,
+            "entities": entities,
+            "load_seconds": round(load_time, 3),
+            "classify_ms": round(classify_latency * 1000, 3),
+            "ner_ms": round(ner_latency * 1000, 3),
+        }
+
+    reference = runs["torch"]
+    report = {}
+    for backend in backends:
+        run = runs[backend]
+        label_agreement = statistics.mean(
+            1.0 if a["label"] == b["label"] else 0.0 for a, b in zip(reference["labels"], run["labels"])
+        ) if texts else 1.0
+        score_delta = statistics.mean(
+            abs(a["score"] - b["score"]) for a, b in zip(reference["labels"], run["labels"])
+        ) if texts else 0.0
+        entity_f1 = statistics.mean(
+            _entity_f1(a, b) for a, b in zip(reference["entities"], run["entities"])
+        ) if texts else 1.0
+        report[backend] = {
+            "load_seconds": run["load_seconds"],
+            "classify_ms": run["classify_ms"],
+            "ner_ms": run["ner_ms"],
+            "classify_speedup": round(reference["classify_ms"] / run["classify_ms"], 2) if run["classify_ms"] else None,
+            "ner_speedup": round(reference["ner_ms"] / run["ner_ms"], 2) if run["ner_ms"] else None,
+            "label_agreement": round(label_agreement, 4),
+            "mean_score_delta": round(score_delta, 4),
+            "entity_f1": round(entity_f1, 4),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов инференса классификатора")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8"])
+    parser.add_argument("--language", default="ru")
+    parser.add_argument("--descriptions", default=DESCRIPTIONS_PATH)
+    parser.add_argument("--classifier-model")
+    parser.add_argument("--ner-model")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = load_descriptions(args.descriptions, args.language)
+    report = compare_backends(
+        texts, args.backends, args.language, args.classifier_model, args.ner_model, args.repeats
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('parser')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Нормализует описание перед хешированием: NFC и схлопнутые пробелы"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize("NFC", text or "")).strip()
+
+
+def text_key(text: str) -> str:
+    """Ключ кэша: SHA-256 нормализованного текста"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class InferenceCache:
+    """
+    Кэш результатов инференса с двумя уровнями: LRU в памяти и SQLite на диске.
+
+    Записи группируются по области (scope, например "analyze:ru") и идентичности
+    модели (модель, версия, язык, настройки), которая входит в ключ записи.
+    Вызовы с разными идентичностями в одной области (например, классификаторы
+    с разными бэкендами) хранят результаты рядом и не мешают друг другу; записи
+    идентичностей, которые давно не использовались, удаляет prune().
+    """
+
+    def __init__(self, path: Optional[str] = "data/inference_cache.sqlite", max_memory_items: int = 10000):
+        """
+        Args:
+            path (Optional[str]): Путь к файлу SQLite; None - только память
+            max_memory_items (int): Размер LRU в памяти
+        """
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[tuple, str]" = OrderedDict()
+        # (область, идентичность) -> номер модели в таблице models
+        self._models: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._db = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS models ("
+                "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, identity TEXT NOT NULL, last_used REAL NOT NULL, "
+                "UNIQUE (scope, identity))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "model INTEGER NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+
+    def _model(self, scope: str, identity: str) -> Optional[int]:
+        """Номер пары (область, идентичность) в файле; None - кэш только в памяти"""
+        if self._db is None:
+            return None
+        model = self._models.get((scope, identity))
+        if model is None:
+            self._db.execute(
+                "INSERT INTO models (scope, identity, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT (scope, identity) DO UPDATE SET last_used = excluded.last_used",
+                (scope, identity, time.time())
+            )
+            self._db.commit()
+            model = self._db.execute(
+                "SELECT id FROM models WHERE scope = ? AND identity = ?", (scope, identity)
+            ).fetchone()[0]
+            self._models[(scope, identity)] = model
+        return model
+
+    def prune(self, max_age_days: float = 30.0) -> int:
+        """
+        Удаляет записи идентичностей, которые не использовались дольше max_age_days
+        (например, после смены версии модели или настроек каскада)
+
+        Args:
+            max_age_days (float): Срок, дни
+
+        Returns:
+            int: Сколько идентичностей удалено
+        """
+        if self._db is None:
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            stale = [row[0] for row in self._db.execute("SELECT id FROM models WHERE last_used < ?", (cutoff,))]
+            for model in stale:
+                self._db.execute("DELETE FROM entries WHERE model = ?", (model,))
+                self._db.execute("DELETE FROM models WHERE id = ?", (model,))
+            self._db.commit()
+            self._models = {pair: model for pair, model in self._models.items() if model not in stale}
+        if stale:
+            logger.info(f"Из кэша инференса удалены записи {len(stale)} устаревших моделей")
+        return len(stale)
+
+    def _remember(self, memory_key: tuple, value: str):
+        self._memory[memory_key] = value
+        self._memory.move_to_end(memory_key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, scope: str, identity: str, texts: List[str]) -> List[Optional[Any]]:
+        """
+        Ищет результаты для списка текстов
+
+        Args:
+            scope (str): Область кэша
+            identity (str): Идентичность модели
+            texts (List[str]): Тексты
+
+        Returns:
+            List[Optional[Any]]: Результаты по порядку; None - промах
+        """
+        keys = [text_key(text) for text in texts]
+        results: List[Optional[Any]] = [None] * len(texts)
+
+        with self._lock:
+            model = self._model(scope, identity)
+            missing = []
+            for index, key in enumerate(keys):
+                value = self._memory.get((scope, identity, key))
+                if value is not None:
+                    self._memory.move_to_end((scope, identity, key))
+                    results[index] = json.loads(value)
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing.append(index)
+
+            if missing and model is not None:
+                found = {}
+                unique = list({keys[index] for index in missing})
+                # Ограничение SQLite на число параметров запроса
+                for start in range(0, len(unique), 500):
+                    chunk = unique[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._db.execute(
+                        f"SELECT key, value FROM entries WHERE model = ? AND key IN ({placeholders})",
+                        (model, *chunk)
+                    )
+                    found.update(rows)
+                still_missing = []
+                for index in missing:
+                    value = found.get(keys[index])
+                    if value is not None:
+                        self._remember((scope, identity, keys[index]), value)
+                        results[index] = json.loads(value)
+                        self._stats["disk_hits"] += 1
+                    else:
+                        still_missing.append(index)
+                missing = still_missing
+
+            self._stats["misses"] += len(missing)
+
+        return results
+
+    def put_many(self, scope: str, identity: str, texts: List[str], values: List[Any]):
+        """
+        Сохраняет результаты для списка текстов в оба уровня
+
+        Args:
+            scope (str): Область кэша
+            identity (str): Идентичность модели
+            texts (List[str]): Тексты
+            values (List[Any]): Результаты (сериализуемые в JSON)
+        """
+        if not texts:
+            return
+
+        rows = [(text_key(text), json.dumps(value, ensure_ascii=False)) for text, value in zip(texts, values)]
+        with self._lock:
+            model = self._model(scope, identity)
+            for key, value in rows:
+                self._remember((scope, identity, key), value)
+            if model is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", [(model, key, value) for key, value in rows]
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики попаданий и промахов"""
+        with self._lock:
+            return dict(self._stats, memory_items=len(self._memory))
+
+    def close(self):
+        """Закрывает файл кэша"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,129 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .product_categories import ProductCategory
+from .feature_extractor import ProductFeature
+
+
+def _default_required_features() -> Dict[ProductCategory, Tuple[str, ...]]:
+    return {
+        ProductCategory.SMARTPHONE: ("memory", "camera", "battery"),
+        ProductCategory.LAPTOP: ("memory", "screen_size"),
+        ProductCategory.TV: ("screen_size", "resolution"),
+        ProductCategory.TABLET: ("memory", "screen_size"),
+        ProductCategory.HEADPHONES: (),
+    }
+
+
+@dataclass
+class CascadeConfig:
+    """Настройки каскада: когда правил достаточно и NER не нужен"""
+    # Выключенный каскад всегда запускает NER (поведение до каскада)
+    enabled: bool = True
+    # Характеристики, которые правила должны найти для уверенного результата по категории
+    required_features: Dict[ProductCategory, Tuple[str, ...]] = field(default_factory=_default_required_features)
+    # Минимальная доля найденных обязательных характеристик
+    min_confidence: float = 0.67
+    # Длинные описания содержат больше, чем ловят регулярные выражения
+    max_rules_only_length: int = 1500
+
+
+@dataclass
+class CascadeDecision:
+    """Решение каскада для одного описания"""
+    run_ner: bool
+    reason: str
+    confidence: float
+
+    @property
+    def stages(self) -> List[str]:
+        return ["rules", "ner"] if self.run_ner else ["rules"]
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": self.stages,
+            "reason": self.reason,
+            "confidence": round(self.confidence, 3)
+        }
+
+
+class InferenceCascade:
+    """
+    Каскад инференса: сначала дешевые правила (CategoryMatcher и FeatureExtractor),
+    тяжелая NER-модель - только если правилам не хватило уверенности
+    """
+
+    def __init__(self, config: CascadeConfig = None):
+        self.config = config or CascadeConfig()
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def rule_confidence(self, category: ProductCategory, features: List[ProductFeature]) -> float:
+        """
+        Уверенность правил: доля обязательных для категории характеристик, найденных регулярками
+
+        Args:
+            category (ProductCategory): Категория по ключевым словам
+            features (List[ProductFeature]): Характеристики FeatureExtractor
+
+        Returns:
+            float: Уверенность от 0 до 1
+        """
+        if category == ProductCategory.UNKNOWN:
+            return 0.0
+
+        required = self.config.required_features.get(category)
+        if required is None:
+            return 1.0 if features else 0.0
+        if not required:
+            return 1.0
+
+        found = {feature.name for feature in features}
+        return sum(1 for name in required if name in found) / len(required)
+
+    def decide(self, text: str, category: ProductCategory, features: List[ProductFeature]) -> CascadeDecision:
+        """
+        Решает, нужен ли описанию этап NER
+
+        Args:
+            text (str): Описание товара
+            category (ProductCategory): Категория по ключевым словам
+            features (List[ProductFeature]): Характеристики FeatureExtractor
+
+        Returns:
+            CascadeDecision: Решение и его причина
+        """
+        confidence = self.rule_confidence(category, features)
+
+        if not self.config.enabled:
+            decision = CascadeDecision(True, "cascade_disabled", confidence)
+        elif category == ProductCategory.UNKNOWN:
+            decision = CascadeDecision(True, "unknown_category", confidence)
+        elif len(text) > self.config.max_rules_only_length:
+            decision = CascadeDecision(True, "long_text", confidence)
+        elif confidence < self.config.min_confidence:
+            decision = CascadeDecision(True, "missing_features", confidence)
+        else:
+            decision = CascadeDecision(False, "rules_confident", confidence)
+
+        self._record(decision)
+        return decision
+
+    def _record(self, decision: CascadeDecision):
+        with self._lock:
+            self._stats["items"] += 1
+            for stage in decision.stages:
+                self._stats[f"stage:{stage}"] += 1
+            self._stats[f"reason:{decision.reason}"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики: сколько описаний прошло через каждый этап и по какой причине"""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        """Сбрасывает счетчики"""
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,258 @@
+import json
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+class CategoryIndex:
+    """
+    Быстрый классификатор категорий по ближайшему центроиду.
+
+    Названия товаров превращаются в хешированные признаки (символьные n-граммы
+    внутри слов и слова целиком), центроиды категорий хранятся строками разреженной
+    матрицы: память растет с числом различных n-грамм категории, а не с n_features.
+    Батч классифицируется одним умножением разреженной матрицы признаков
+    на матрицу центроидов; оценка - косинусная близость к центроиду.
+
+    Индекс хранит суммы векторов и количество примеров по категориям, поэтому
+    новые размеченные товары добавляются через partial_fit без переобучения.
+
+    InferenceService передает рабочим процессам копию индекса при запуске пула:
+    partial_fit в родительском процессе процессы не видят до перезапуска сервиса.
+    """
+
+    def __init__(self, n_features: int = 2 ** 15, ngram_range: Tuple[int, int] = (2, 4),
+                 min_score: float = 0.3, version: str = "1"):
+        """
+        Args:
+            n_features (int): Размерность хешированного пространства признаков
+            ngram_range (Tuple[int, int]): Длины символьных n-грамм
+            min_score (float): Минимальная близость, при которой predict возвращает категорию
+            version (str): Версия индекса для идентичности кэша инференса; повышается вручную,
+                когда индекс переобучен и прежние результаты из кэша больше не годятся
+        """
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.min_score = min_score
+        self.version = version
+
+        self.labels: List[str] = []
+        self._label_index: Dict[str, int] = {}
+        self._sums = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._centroids = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self._lock = threading.Lock()
+
+        self._char_vectorizer = HashingVectorizer(
+            analyzer="char_wb", ngram_range=self.ngram_range, n_features=n_features,
+            alternate_sign=False, norm=None, dtype=np.float32
+        )
+        self._word_vectorizer = HashingVectorizer(
+            analyzer="word", n_features=n_features, alternate_sign=False, norm=None, dtype=np.float32
+        )
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getstate__(self):
+        # Индекс передается в рабочие процессы InferenceService; блокировку не сериализуем
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def transform(self, titles: Sequence[str]):
+        """
+        Хешированные признаки названий
+
+        Args:
+            titles (Sequence[str]): Названия или описания товаров
+
+        Returns:
+            scipy.sparse.csr_matrix: Нормированные (L2) признаки, строка на название
+        """
+        titles = [title or "" for title in titles]
+        features = self._char_vectorizer.transform(titles) + self._word_vectorizer.transform(titles)
+        return normalize(features, norm="l2", copy=False)
+
+    def fit(self, titles: Sequence[str], labels: Sequence[str]) -> "CategoryIndex":
+        """
+        Строит индекс с нуля по размеченным названиям
+
+        Args:
+            titles (Sequence[str]): Названия товаров
+            labels (Sequence[str]): Категории (например, ProductCategory.value)
+
+        Returns:
+            CategoryIndex: self
+        """
+        with self._lock:
+            self.labels = []
+            self._label_index = {}
+            self._sums = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+            self._counts = np.zeros(0, dtype=np.int64)
+            self._centroids = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+        return self.partial_fit(titles, labels)
+
+    def partial_fit(self, titles: Sequence[str], labels: Sequence[str]) -> "CategoryIndex":
+        """
+        Добавляет размеченные названия к индексу без переобучения.
+        Версия индекса не меняется: результаты в кэше инференса остаются действительными
+
+        Args:
+            titles (Sequence[str]): Названия товаров
+            labels (Sequence[str]): Категории; новые категории добавляются в индекс
+
+        Returns:
+            CategoryIndex: self
+        """
+        if len(titles) != len(labels):
+            raise ValueError("Количество названий и меток не совпадает")
+        if not len(titles):
+            return self
+
+        features = self.transform(titles)
+        with self._lock:
+            new_labels = [label for label in dict.fromkeys(labels) if label not in self._label_index]
+            for label in new_labels:
+                self._label_index[label] = len(self.labels)
+                self.labels.append(label)
+            size = len(self.labels)
+
+            rows = np.fromiter((self._label_index[label] for label in labels), dtype=np.int64, count=len(labels))
+            # Разреженная матрица "категория x пример" (одна единица на пример)
+            # суммирует признаки по категориям одним умножением
+            assignment = sparse.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, np.arange(len(rows)))),
+                shape=(size, len(rows))
+            )
+            sums = self._sums
+            if sums.shape[0] < size:
+                sums = sparse.vstack([sums, sparse.csr_matrix((size - sums.shape[0], self.n_features),
+                                                              dtype=np.float32)], format="csr")
+            self._sums = (sums + assignment @ features).astype(np.float32)
+            self._counts = np.concatenate([self._counts, np.zeros(size - len(self._counts), dtype=np.int64)])
+            self._counts += np.bincount(rows, minlength=size)
+            # Новая матрица, а не правка на месте: scores() читает прежнюю без блокировки умножения
+            self._centroids = normalize(self._sums, norm="l2")
+        return self
+
+    def scores(self, titles: Sequence[str]) -> np.ndarray:
+        """
+        Косинусная близость названий ко всем центроидам
+
+        Args:
+            titles (Sequence[str]): Названия товаров
+
+        Returns:
+            np.ndarray: Матрица (названия x категории) в порядке self.labels
+        """
+        features = self.transform(titles)
+        with self._lock:
+            centroids = self._centroids
+        if not centroids.shape[0]:
+            return np.zeros((features.shape[0], 0), dtype=np.float32)
+        return (features @ centroids.T).toarray()
+
+    def top_k(self, titles: Sequence[str], k: int = 3) -> List[List[Tuple[str, float]]]:
+        """
+        Лучшие категории для каждого названия
+
+        Args:
+            titles (Sequence[str]): Названия товаров
+            k (int): Сколько категорий вернуть
+
+        Returns:
+            List[List[Tuple[str, float]]]: Пары (категория, близость) от лучшей к худшей
+        """
+        scores = self.scores(titles)
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(scores.shape[0])]
+
+        # argpartition выбирает k лучших без полной сортировки по всем категориям
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [(self.labels[column], float(score)) for column, score in zip(row, row_scores)]
+            for row, row_scores in zip(best, best_scores)
+        ]
+
+    def predict(self, titles: Sequence[str]) -> List[Tuple[Optional[str], float]]:
+        """
+        Лучшая категория для каждого названия
+
+        Args:
+            titles (Sequence[str]): Названия товаров
+
+        Returns:
+            List[Tuple[Optional[str], float]]: Категория (None ниже min_score) и близость
+        """
+        predictions = []
+        for best in self.top_k(titles, k=1):
+            label, score = best[0] if best else (None, 0.0)
+            predictions.append((label if score >= self.min_score else None, score))
+        return predictions
+
+    def fingerprint(self) -> str:
+        """
+        Идентичность индекса для кэша инференса: настройки и версия. Состояние центроидов
+        в нее не входит, иначе каждый partial_fit обнулял бы кэш
+        """
+        return f"{self.version}:{self.n_features}:{self.ngram_range}:{self.min_score}"
+
+    def save(self, path: str):
+        """
+        Сохраняет индекс в файл .npz
+
+        Args:
+            path (str): Путь к файлу
+        """
+        config = {"n_features": self.n_features, "ngram_range": list(self.ngram_range), "min_score": self.min_score,
+                  "version": self.version}
+        with self._lock:
+            np.savez_compressed(
+                path,
+                sums_data=self._sums.data,
+                sums_indices=self._sums.indices,
+                sums_indptr=self._sums.indptr,
+                counts=self._counts,
+                labels=np.array(self.labels, dtype=str),
+                config=np.array(json.dumps(config))
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryIndex":
+        """
+        Загружает индекс, сохраненный save()
+
+        Args:
+            path (str): Путь к файлу .npz
+
+        Returns:
+            CategoryIndex: Индекс
+        """
+        with np.load(path, allow_pickle=False) as data:
+            config = json.loads(str(data["config"]))
+            index = cls(config["n_features"], tuple(config["ngram_range"]), config["min_score"],
+                        config.get("version", "1"))
+            index.labels = [str(label) for label in data["labels"]]
+            index._label_index = {label: row for row, label in enumerate(index.labels)}
+            index._sums = sparse.csr_matrix(
+                (data["sums_data"].astype(np.float32), data["sums_indices"], data["sums_indptr"]),
+                shape=(len(index.labels), index.n_features)
+            )
+            index._counts = data["counts"].astype(np.int64)
+
+        index._centroids = normalize(index._sums, norm="l2")
+        return index
@@ -0,0 +1,176 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Tuple
+
+
+@dataclass
+class ChunkingConfig:
+    """Настройки подготовки длинных описаний к NER"""
+    # Бюджет токенов на один фрагмент, включая служебные токены модели
+    max_tokens: int = 256
+    # Перекрытие соседних фрагментов в токенах, чтобы не резать сущности на границе
+    stride: int = 32
+    # Предел токенов на одно описание: все, что дальше, в NER не попадает
+    max_item_tokens: int = 1024
+    # Удалять типовые фразы про доставку, оплату, гарантию и т.п.
+    strip_boilerplate: bool = True
+
+
+# Предложения и строки, которые не описывают сам товар
+BOILERPLATE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r'доставк[аиуе]|доставл',
+        r'оплат[аиуы]|передоплат|наложенн|накладен',
+        r'гаранті[яї]|гаранти[яи]',
+        r'(?:производитель|виробник)\s+(?:оставляет|залишає)',
+        r'(?:характеристики|комплектация|комплектація).{0,40}(?:изменен|змінен|могут|можуть)',
+        r'купить|купити|в корзин|в кошик',
+        r'(?:https?://|www\.)\S+',
+        r'\+?\d[\d\s()-]{8,}\d',
+    ]
+]
+
+# Признаки того, что в предложении есть сведения о товаре: латинское слово (бренд, модель)
+# или число с единицей измерения. Предложение с шаблонной фразой и такими сведениями
+# ("Купить смартфон Samsung Galaxy S24 8/256 ГБ") не удаляется
+_PRODUCT_FACT_RE = re.compile(
+    r'[A-Za-z]{2,}|\d+(?:[.,]\d+)?\s?(?:ГБ|Гб|МБ|ТБ|GB|MB|TB|Мп|МП|MP|мАч|mAh|дюйм|"|Гц|Hz|Вт|W|мм|см|кг)',
+)
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+_WHITESPACE_RE = re.compile(r'[ \t\r\f\v]+')
+
+
+def is_boilerplate(sentence: str) -> bool:
+    """
+    Предложение состоит только из шаблонных фраз: шаблон найден, а после удаления
+    шаблонных фраз в нем не осталось сведений о товаре
+
+    Args:
+        sentence (str): Предложение
+
+    Returns:
+        bool: True, если предложение можно удалить
+    """
+    rest = sentence
+    matched = False
+    for pattern in BOILERPLATE_PATTERNS:
+        rest, count = pattern.subn(" ", rest)
+        matched = matched or count > 0
+    return matched and not _PRODUCT_FACT_RE.search(rest)
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Удаляет из описания предложения-шаблоны и повторы
+
+    Args:
+        text (str): Описание товара
+
+    Returns:
+        str: Описание без шаблонных предложений
+    """
+    sentences = []
+    seen = set()
+    for sentence in _SENTENCE_SPLIT_RE.split(text or ""):
+        sentence = _WHITESPACE_RE.sub(' ', sentence).strip()
+        if not sentence:
+            continue
+        key = sentence.lower()
+        if key in seen or is_boilerplate(sentence):
+            continue
+        seen.add(key)
+        sentences.append(sentence)
+    return " ".join(sentences)
+
+
+class Chunk(NamedTuple):
+    """Фрагмент описания для NER"""
+    offset: int  # Смещение фрагмента в тексте
+    text: str
+    tokens: int  # Длина в токенах без служебных; 0 - текст не токенизировался
+
+
+def chunk_text(text: str, tokenizer, config: ChunkingConfig) -> List[Chunk]:
+    """
+    Делит текст на перекрывающиеся фрагменты в пределах бюджета токенов.
+    Длина фрагментов в токенах берется из этой же токенизации, чтобы группировать
+    фрагменты в батчи по длине без повторной токенизации
+
+    Args:
+        text (str): Текст
+        tokenizer: Быстрый токенизатор NER-модели (нужны offset_mapping)
+        config (ChunkingConfig): Настройки
+
+    Returns:
+        List[Chunk]: Фрагменты по порядку
+    """
+    if not text or tokenizer is None:
+        return [Chunk(0, text, 0)]
+
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    total = min(len(offsets), config.max_item_tokens)
+    # Запас в пару токенов: фрагмент, токенизированный отдельно, может разбиться на границе иначе
+    window = max(1, config.max_tokens - tokenizer.num_special_tokens_to_add() - 2)
+    stride = min(config.stride, window - 1) if window > 1 else 0
+
+    chunks = []
+    start = 0
+    while start < total:
+        end = min(start + window, total)
+        char_start = offsets[start][0]
+        char_end = offsets[end - 1][1]
+        chunks.append(Chunk(char_start, text[char_start:char_end], end - start))
+        if end >= total:
+            break
+        start = end - stride
+    return chunks or [Chunk(0, text, len(offsets))]
+
+
+def merge_entities(chunk_entities: List[Tuple[int, List[Dict]]]) -> List[Dict]:
+    """
+    Объединяет сущности фрагментов: переводит смещения в координаты всего текста
+    и из пересекающихся сущностей оставляет самую уверенную (при равенстве - самую длинную)
+
+    Args:
+        chunk_entities (List[Tuple[int, List[Dict]]]): Пары (смещение фрагмента, сущности pipeline)
+
+    Returns:
+        List[Dict]: Сущности в порядке появления в тексте
+    """
+    entities = []
+    for chunk_start, items in chunk_entities:
+        for entity in items:
+            entity = dict(entity)
+            if entity.get("start") is not None and entity.get("end") is not None:
+                entity["start"] += chunk_start
+                entity["end"] += chunk_start
+            entities.append(entity)
+
+    if len(chunk_entities) <= 1:
+        return entities
+
+    kept: List[Dict] = []
+    unpositioned = set()
+    ranked = sorted(
+        entities,
+        key=lambda e: (-e["score"], -((e.get("end") or 0) - (e.get("start") or 0)))
+    )
+    for entity in ranked:
+        start, end = entity.get("start"), entity.get("end")
+        if start is None or end is None:
+            # Без смещений дедуплицируем по тексту и типу
+            key = (entity["word"], entity["entity_group"])
+            if key not in unpositioned:
+                unpositioned.add(key)
+                kept.append(entity)
+            continue
+        if any(
+            other.get("start") is not None and start < other["end"] and other["start"] < end
+            for other in kept
+        ):
+            continue
+        kept.append(entity)
+
+    return sorted(kept, key=lambda e: e.get("start") if e.get("start") is not None else -1)
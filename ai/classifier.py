@@ -1,47 +1,510 @@
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-import torch
-from typing import List, Dict, Optional, Tuple
+import asyncio
+import copy
+import glob
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 from .product_categories import CategoryMatcher, ProductCategory
 from .feature_extractor import FeatureExtractor, ProductFeature
+from .cascade import InferenceCascade
+from .cache import InferenceCache, text_key
+from .chunking import Chunk, ChunkingConfig, chunk_text, merge_entities, strip_boilerplate
+from utils.metrics import EVENTS_METRIC, metrics
+
+if TYPE_CHECKING:
+    from .category_index import CategoryIndex
+    from .service import InferenceService
+
+logger = logging.getLogger('parser')
+
+# Описание модели в реестре: (задача, имя модели, параметры pipeline)
+ModelSpec = Tuple[str, str, Dict[str, Any]]
+
+
+class ModelRegistry:
+    """
+    Реестр моделей процесса.
+
+    Каждая модель загружается при первом обращении и затем разделяется всеми
+    экземплярами ProductClassifier. transformers и torch импортируются только
+    при первой загрузке, поэтому создание классификатора ничего не стоит.
+    
+    Если задан artifact_dir, модели хранятся там в формате safetensors: при
+    первой загрузке из хаба они экспортируются, дальше читаются локально через
+    mmap. Экспорт пишется во временный каталог и переименовывается целиком,
+    поэтому параллельный процесс не увидит недописанный файл весов. Рабочие
+    процессы InferenceService запускаются через forkserver/spawn и читают
+    артефакты, которые родитель подготовил через export().
+    """
+    
+    def __init__(self, artifact_dir: Optional[str] = None, share_memory: bool = False):
+        """
+        Args:
+            artifact_dir (Optional[str]): Каталог локальных артефактов моделей (safetensors)
+            share_memory (bool): Переносить веса в разделяемую память torch, чтобы их можно
+                было передавать процессам, запущенным через spawn (нужен достаточный /dev/shm)
+        """
+        self.artifact_dir = artifact_dir
+        self.share_memory = share_memory
+        self._models: Dict[Tuple, Any] = {}
+        self._sources: Dict[Tuple, str] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(task: str, model_name: str, options: Dict[str, Any]) -> Tuple:
+        return (task, model_name, tuple(sorted(options.items())))
+    
+    def get(self, task: str, model_name: str, **options) -> Any:
+        """
+        Возвращает модель, загружая ее при первом обращении
+        
+        Args:
+            task (str): Задача pipeline ("text-classification", "token-classification")
+                или "tokenizer"
+            model_name (str): Имя модели
+            **options: Дополнительные параметры pipeline
+            
+        Returns:
+            Any: Pipeline или токенизатор
+        """
+        key = self._key(task, model_name, options)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._load(task, model_name, options)
+                    self._models[key] = model
+        return model
+    
+    def _artifact_path(self, model_name: str) -> Optional[str]:
+        """Локальный каталог модели в artifact_dir"""
+        if not self.artifact_dir:
+            return None
+        return os.path.join(self.artifact_dir, model_name.replace("/", "--"))
+    
+    @staticmethod
+    def _has_artifact(path: Optional[str], pattern: str) -> bool:
+        return bool(path and glob.glob(os.path.join(path, pattern)))
+    
+    @classmethod
+    def _save_artifact(cls, path: str, pattern: str, *objects: Any):
+        """
+        Сохраняет модель и токенизатор атомарно: во временный каталог рядом с path,
+        затем os.replace. Если другой процесс уже экспортировал модель, его копия остается
+        """
+        parent = os.path.dirname(path) or "."
+        os.makedirs(parent, exist_ok=True)
+        temporary = tempfile.mkdtemp(prefix=os.path.basename(path) + ".tmp-", dir=parent)
+        try:
+            for obj in objects:
+                obj.save_pretrained(temporary)
+            if os.path.isdir(path) and not cls._has_artifact(path, pattern):
+                # Пустой каталог или остатки прерванного неатомарного экспорта
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(temporary, path)
+            except OSError:
+                # Каталог уже заполнил другой процесс
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+    
+    def export(self, specs: Iterable[ModelSpec]):
+        """
+        Готовит локальные артефакты моделей в artifact_dir, не оставляя модели в памяти.
+        Вызывается до запуска рабочих процессов, чтобы они не экспортировали одну модель одновременно
+        
+        Args:
+            specs (Iterable[ModelSpec]): Описания моделей
+        """
+        if not self.artifact_dir:
+            return
+        for task, model_name, options in specs:
+            if task == "tokenizer":
+                continue
+            if options.get("backend") == "onnx":
+                exported = self._has_artifact(self._artifact_path(model_name + "-onnx"), "*.onnx")
+            else:
+                exported = self._has_artifact(self._artifact_path(model_name), "*.safetensors")
+            if not exported:
+                self._load(task, model_name, dict(options))
+    
+    def _load(self, task: str, model_name: str, options: Dict[str, Any]) -> Any:
+        """Загружает модель (тяжелые зависимости импортируются здесь)"""
+        key = self._key(task, model_name, options)
+        options = dict(options)
+        backend = options.pop("backend", "torch")
+        path = self._artifact_path(model_name)
+        local = self._has_artifact(path, "*.safetensors")
+        source = path if local else model_name
+        self._sources[key] = "safetensors" if local else "hub"
+        
+        if task == "tokenizer":
+            from transformers import AutoTokenizer
+            return AutoTokenizer.from_pretrained(source)
+        
+        if backend == "onnx":
+            return self._load_onnx(task, model_name, source, options, key)
+        if backend not in ("torch", "int8"):
+            raise ValueError(f"Неизвестный бэкенд инференса: {backend}")
+        
+        import torch
+        from transformers import pipeline
+        model = pipeline(
+            task,
+            model=source,
+            device=0 if torch.cuda.is_available() else -1,
+            **options
+        )
+        
+        if path and not local:
+            # Экспортируем, чтобы следующие процессы читали веса локально через mmap
+            self._save_artifact(path, "*.safetensors", model.model, model.tokenizer)
+        if backend == "int8":
+            # Динамическая квантизация линейных слоев: веса int8, активации квантуются на лету (только CPU)
+            model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.share_memory:
+            model.model.share_memory()
+        return model
+    
+    def _load_onnx(self, task: str, model_name: str, source: str, options: Dict[str, Any], key: Tuple) -> Any:
+        """Загружает модель, экспортированную в ONNX, для onnxruntime на CPU"""
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification, ORTModelForTokenClassification
+        except ImportError as e:
+            raise ImportError("Для бэкенда onnx нужен пакет optimum[onnxruntime]") from e
+        from transformers import AutoTokenizer, pipeline
+        
+        model_classes = {
+            "text-classification": ORTModelForSequenceClassification,
+            "token-classification": ORTModelForTokenClassification,
+        }
+        if task not in model_classes:
+            raise ValueError(f"Бэкенд onnx не поддерживает задачу {task}")
+        
+        onnx_path = self._artifact_path(model_name + "-onnx")
+        exported = self._has_artifact(onnx_path, "*.onnx")
+        if exported:
+            self._sources[key] = "onnx"
+            ort_model = model_classes[task].from_pretrained(onnx_path)
+            tokenizer = AutoTokenizer.from_pretrained(onnx_path)
+        else:
+            ort_model = model_classes[task].from_pretrained(source, export=True)
+            tokenizer = AutoTokenizer.from_pretrained(source)
+            if onnx_path:
+                self._save_artifact(onnx_path, "*.onnx", ort_model, tokenizer)
+        
+        return pipeline(task, model=ort_model, tokenizer=tokenizer, **options)
+    
+    def warm(self, specs: Iterable[ModelSpec]):
+        """
+        Заранее загружает модели (например, при старте процесса)
+        
+        Args:
+            specs (Iterable[ModelSpec]): Описания моделей
+        """
+        for task, model_name, options in specs:
+            self.get(task, model_name, **options)
+    
+    def is_loaded(self, task: str, model_name: str, **options) -> bool:
+        """Проверяет, загружена ли модель"""
+        return self._key(task, model_name, options) in self._models
+    
+    def loaded(self) -> List[Tuple]:
+        """Список ключей загруженных моделей"""
+        return list(self._models)
+    
+    def clear(self):
+        """Выгружает все модели"""
+        with self._lock:
+            self._models.clear()
+            self._sources.clear()
+    
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Память, занятая моделями
+        
+        Returns:
+            Dict[str, Any]: Для каждой модели - объем весов и буферов в байтах, источник
+                и признак разделяемой памяти; для процесса - RSS и его разделяемая часть
+        """
+        models = {}
+        for key, model in list(self._models.items()):
+            task, model_name, _ = key
+            entry = {"source": self._sources.get(key, "unknown")}
+            module = getattr(model, "model", None)
+            if hasattr(module, "parameters"):
+                tensors = list(module.parameters()) + list(module.buffers())
+                entry["weights_bytes"] = sum(t.numel() * t.element_size() for t in tensors)
+                entry["shared_memory"] = all(t.is_shared() for t in tensors) if tensors else False
+            models[f"{task}:{model_name}"] = entry
+        return {"models": models, "process": _process_memory()}
+
+
+def _process_memory() -> Dict[str, int]:
+    """RSS текущего процесса и его разделяемая часть (Linux, /proc/self/status)"""
+    fields = {"VmRSS": "rss_bytes", "RssFile": "rss_file_bytes", "RssShmem": "rss_shmem_bytes"}
+    memory = {}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as status:
+            for line in status:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    memory[fields[name]] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+# Реестр по умолчанию, общий для всего процесса
+registry = ModelRegistry(artifact_dir=os.getenv("PARSER_MODEL_DIR"))
+
 
 class ProductClassifier:
-    def __init__(self, language: str = "ru"):
+    # Модели классификации по языкам
+    CLASSIFIER_MODELS = {
+        "uk": "xlm-roberta-base",  # Используем многоязычную модель
+    }
+    DEFAULT_CLASSIFIER_MODEL = "cointegrated/rubert-tiny2"
+    # Модель для извлечения характеристик
+    NER_MODEL = "xlm-roberta-large"
+    # Версия моделей и постобработки; увеличивается при их изменении и сбрасывает кэш
+    MODEL_VERSION = "2"
+    
+    def __init__(self, language: str = "ru", model_registry: Optional[ModelRegistry] = None,
+                 backend: str = "torch",
+                 cascade: Optional[InferenceCascade] = None, cache: Optional[InferenceCache] = None,
+                 service: Optional["InferenceService"] = None, chunking: Optional[ChunkingConfig] = None,
+                 category_index: Optional["CategoryIndex"] = None):
         """
-        Инициализация классификатора
+        Инициализация классификатора. Модели не загружаются: они берутся из
+        реестра при первом обращении к classifier, ner или tokenizer.
         
         Args:
             language (str): Язык для классификации ("ru" или "uk")
+            model_registry (Optional[ModelRegistry]): Реестр моделей; по умолчанию общий для процесса
+            backend (str): Бэкенд инференса моделей: "torch" (fp32), "int8" (динамическая
+                квантизация torch) или "onnx" (onnxruntime через optimum)
+            cascade (Optional[InferenceCascade]): Каскад, решающий, нужен ли NER в analyze_product;
+                чтобы всегда запускать NER, передайте InferenceCascade(CascadeConfig(enabled=False))
+            cache (Optional[InferenceCache]): Кэш результатов analyze_product и classify_product;
+                None - без кэша
+            service (Optional[InferenceService]): Пул процессов с моделями для analyze_async;
+                None - analyze_async выполняется в потоке текущего процесса
+            chunking (Optional[ChunkingConfig]): Очистка и нарезка длинных описаний перед NER
+            category_index (Optional[CategoryIndex]): Индекс центроидов категорий; определяет
+                категорию описаний, для которых не нашлось ключевых слов
         """
         self.language = language
+        self.registry = model_registry or registry
         
         # Выбор модели в зависимости от языка
-        if language == "uk":
-            model_name = "xlm-roberta-base"  # Используем многоязычную модель
-        else:
-            model_name = "cointegrated/rubert-tiny2"
-            
-        # Инициализация модели для классификации
-        self.classifier = pipeline(
-            "text-classification",
-            model=model_name,
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
-        # Инициализация модели для извлечения характеристик
-        self.ner = pipeline(
-            "token-classification",
-            model="xlm-roberta-large",
-            aggregation_strategy="simple",
-            device=0 if torch.cuda.is_available() else -1
+        self.model_name = self.CLASSIFIER_MODELS.get(language, self.DEFAULT_CLASSIFIER_MODEL)
+        self.backend = backend
+        self._classifier_spec: ModelSpec = ("text-classification", self.model_name, {"backend": backend})
+        self._ner_spec: ModelSpec = (
+            "token-classification", self.NER_MODEL, {"aggregation_strategy": "simple", "backend": backend}
         )
-        
-        # Загрузка токенизатора для работы с текстом
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self._tokenizer_spec: ModelSpec = ("tokenizer", self.model_name, {})
         
         # Инициализация дополнительных компонентов
+        self.cascade = cascade or InferenceCascade()
+        self.cache = cache
+        self.service = service
+        self.chunking = chunking or ChunkingConfig()
+        self.category_index = category_index
         self.category_matcher = CategoryMatcher()
         self.feature_extractor = FeatureExtractor(language)
     
+    def model_specs(self) -> List[ModelSpec]:
+        """Модели, которые использует классификатор"""
+        return [self._classifier_spec, self._ner_spec, self._tokenizer_spec]
+    
+    def warm_up(self) -> "ProductClassifier":
+        """Загружает все модели классификатора заранее, чтобы первый запрос не ждал"""
+        self.registry.warm(self.model_specs())
+        return self
+    
+    @property
+    def classifier(self):
+        """Модель для классификации"""
+        task, model_name, options = self._classifier_spec
+        return self.registry.get(task, model_name, **options)
+    
+    @property
+    def ner(self):
+        """Модель для извлечения характеристик"""
+        task, model_name, options = self._ner_spec
+        return self.registry.get(task, model_name, **options)
+    
+    @property
+    def tokenizer(self):
+        """Токенизатор для работы с текстом"""
+        task, model_name, options = self._tokenizer_spec
+        return self.registry.get(task, model_name, **options)
+    
+    def _cache_identity(self, *parts: Any) -> str:
+        """Идентичность модели для кэша: язык, версия и описания используемых моделей"""
+        return "|".join([self.language, self.MODEL_VERSION, *map(repr, parts)])
+    
+    def _analyze_identity(self, backend: str, cascade_config: Any, chunking: ChunkingConfig,
+                          category_index: Optional["CategoryIndex"]) -> str:
+        """
+        Идентичность результатов analyze_*: одна функция для analyze_batch и для
+        analyze_async через сервис, чтобы оба пути читали и писали одни записи кэша,
+        когда их настройки совпадают
+        """
+        task, model_name, options = self._ner_spec
+        return self._cache_identity(
+            (task, model_name, {**options, "backend": backend}),
+            cascade_config,
+            chunking,
+            category_index.fingerprint() if category_index is not None else None
+        )
+    
+    def _cached(self, scope: str, identity: str, texts: List[str],
+                compute: Callable[[List[str]], List[Tuple[Any, bool]]]) -> List[Any]:
+        """
+        Берет результаты из кэша и вычисляет только промахи
+        
+        Args:
+            scope (str): Метод ("analyze", "classify")
+            identity (str): Идентичность модели
+            texts (List[str]): Тексты
+            compute (Callable): Вычисляет пары (результат, можно_кэшировать) для списка текстов
+            
+        Returns:
+            List[Any]: Результаты в порядке текстов
+        """
+        if self.cache is None:
+            return [value for value, _ in compute(texts)]
+        
+        scope = f"{scope}:{self.language}"
+        results = self.cache.get_many(scope, identity, texts)
+        # Одинаковые (после нормализации) описания вычисляем один раз
+        missing: Dict[str, List[int]] = {}
+        for index, value in enumerate(results):
+            if value is None:
+                missing.setdefault(text_key(texts[index]), []).append(index)
+        if metrics.enabled:
+            misses = sum(map(len, missing.values()))
+            metrics.inc(EVENTS_METRIC, len(texts) - misses, event="inference_cache_hit", scope=scope)
+            metrics.inc(EVENTS_METRIC, misses, event="inference_cache_miss", scope=scope)
+        if missing:
+            groups = list(missing.values())
+            computed = compute([texts[indices[0]] for indices in groups])
+            cacheable_texts, cacheable_values = [], []
+            for indices, (value, cacheable) in zip(groups, computed):
+                for position, index in enumerate(indices):
+                    results[index] = value if position == 0 else copy.deepcopy(value)
+                # Ошибки инференса не кэшируем, иначе они переживут перезапуск
+                if cacheable:
+                    cacheable_texts.append(texts[indices[0]])
+                    cacheable_values.append(value)
+            self.cache.put_many(scope, identity, cacheable_texts, cacheable_values)
+        
+        return results
+    
+    @staticmethod
+    def _length_buckets(texts: List[str], batch_size: int,
+                        lengths: Optional[List[int]] = None) -> List[List[int]]:
+        """
+        Группирует индексы текстов в батчи близкой длины, чтобы паддинг внутри
+        батча был минимальным. Без известных длин в токенах берется длина в символах:
+        она почти пропорциональна длине в токенах, а токенизировать тексты до
+        pipeline - значит делать это дважды
+        
+        Args:
+            texts (List[str]): Тексты
+            batch_size (int): Размер батча
+            lengths (Optional[List[int]]): Длины текстов в токенах, если уже известны
+            
+        Returns:
+            List[List[int]]: Индексы исходных текстов по батчам
+        """
+        if len(texts) <= batch_size:
+            return [list(range(len(texts)))]
+        
+        lengths = lengths or [len(text) for text in texts]
+        order = sorted(range(len(texts)), key=lambda index: lengths[index])
+        return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+    
+    def _run_batched(self, model, texts: List[str], batch_size: int, error_message: str,
+                     lengths: Optional[List[int]] = None) -> List[Optional[Any]]:
+        """
+        Прогоняет тексты через pipeline батчами по длине и возвращает
+        результаты в порядке входных текстов. Если батч завершился ошибкой,
+        его тексты прогоняются по одному, чтобы один плохой текст не отнял
+        результаты у остальных
+        
+        Args:
+            model: Pipeline transformers
+            texts (List[str]): Тексты
+            batch_size (int): Размер батча
+            error_message (str): Сообщение об ошибке
+            lengths (Optional[List[int]]): Длины текстов в токенах для группировки, если уже известны
+            
+        Returns:
+            List[Optional[Any]]: Результаты pipeline по одному на текст;
+                None для текстов, на которых pipeline завершился ошибкой
+        """
+        results: List[Optional[Any]] = [None] * len(texts)
+        if not texts:
+            return results
+        
+        task = getattr(model, "task", None)
+        for indices in self._length_buckets(texts, batch_size, lengths):
+            try:
+                with metrics.span("inference", model=task):
+                    outputs = model([texts[index] for index in indices], batch_size=len(indices))
+                for index, output in zip(indices, outputs):
+                    results[index] = output
+                continue
+            except Exception as e:
+                if len(indices) == 1:
+                    logger.error(f"{error_message}: {e}")
+                    continue
+                logger.warning(f"{error_message} в батче из {len(indices)} текстов, обрабатываем по одному: {e}")
+            
+            for index in indices:
+                try:
+                    with metrics.span("inference", model=task):
+                        results[index] = model([texts[index]], batch_size=1)[0]
+                except Exception as e:
+                    logger.error(f"{error_message}: {e}")
+        
+        return results
+    
+    @staticmethod
+    def _entity_features(entities: List[Dict]) -> List[Dict]:
+        """Приводит сущности NER к формату результата"""
+        return [
+            {
+                "text": entity["word"],
+                "type": entity["entity_group"],
+                "score": round(entity["score"], 3)
+            }
+            for entity in entities
+        ]
+    
+    @staticmethod
+    def _feature_result(features: List[ProductFeature]) -> List[Dict]:
+        """Приводит характеристики FeatureExtractor к формату результата"""
+        return [
+            {
+                "name": f.name,
+                "value": f.value,
+                "unit": f.unit,
+                "confidence": f.confidence
+            }
+            for f in features
+        ]
+    
     def analyze_product(self, product_description: str) -> Dict:
         """
         Полный анализ товара: категория, характеристики, сущности
@@ -52,42 +515,110 @@ class ProductClassifier:
         Returns:
             Dict: Результаты анализа
         """
-        # Определяем категорию
-        category = self.category_matcher.match_category(product_description, self.language)
+        return self.analyze_batch([product_description])[0]
+    
+    def analyze_batch(self, product_descriptions: List[str], batch_size: int = 16) -> List[Dict]:
+        """
+        Полный анализ списка товаров. Сначала работают правила; NER запускается
+        батчами только для описаний, которым каскад не доверил результат правил.
+        Если задан кэш, анализируются только описания, которых в нем нет.
+        
+        Args:
+            product_descriptions (List[str]): Описания товаров
+            batch_size (int): Размер батча для NER
+            
+        Returns:
+            List[Dict]: Результаты анализа в порядке входных описаний
+        """
+        identity = self._analyze_identity(self.backend, self.cascade.config, self.chunking, self.category_index)
+        return self._cached(
+            "analyze",
+            identity,
+            product_descriptions,
+            lambda texts: self._analyze_uncached(texts, batch_size)
+        )
+    
+    def _categories(self, product_descriptions: List[str]) -> List[ProductCategory]:
+        """Категории по ключевым словам; описания без ключевых слов - по индексу центроидов"""
+        with metrics.span("categorize_rules"):
+            categories = self.category_matcher.match_batch(product_descriptions, self.language)
+        if self.category_index is None:
+            return categories
         
-        # Извлекаем характеристики
-        features = self.feature_extractor.extract_features(product_description)
+        unknown = [index for index, category in enumerate(categories) if category == ProductCategory.UNKNOWN]
+        if unknown:
+            known_values = {category.value for category in ProductCategory}
+            with metrics.span("categorize_index"):
+                predictions = self.category_index.predict([product_descriptions[index] for index in unknown])
+            for index, (label, _) in zip(unknown, predictions):
+                if label in known_values:
+                    categories[index] = ProductCategory(label)
+        return categories
+    
+    def _analyze_uncached(self, product_descriptions: List[str], batch_size: int) -> List[Tuple[Dict, bool]]:
+        """Анализ без кэша; возвращает пары (результат, NER не упал)"""
+        results = []
+        ner_indices = []
+        # Определяем категории
+        categories = self._categories(product_descriptions)
+        for index, (description, category) in enumerate(zip(product_descriptions, categories)):
+            
+            # Извлекаем характеристики
+            with metrics.span("feature_extract"):
+                features = self.feature_extractor.extract_features(description)
+            
+            # Решаем, нужна ли NER-модель
+            decision = self.cascade.decide(description, category, features)
+            if decision.run_ner:
+                ner_indices.append(index)
+            
+            # Формируем результат
+            results.append(({
+                "category": category.value,
+                "features": self._feature_result(features),
+                "entities": [],
+                "cascade": decision.to_dict()
+            }, True))
         
         # Получаем дополнительные сущности через NER
-        try:
-            entities = self.ner(product_description)
-            ner_features = [
-                {
-                    "text": entity["word"],
-                    "type": entity["entity_group"],
-                    "score": round(entity["score"], 3)
-                }
-                for entity in entities
-            ]
-        except Exception as e:
-            print(f"Ошибка при извлечении сущностей: {e}")
-            ner_features = []
-        
-        # Формируем результат
-        result = {
-            "category": category.value,
-            "features": [
-                {
-                    "name": f.name,
-                    "value": f.value,
-                    "unit": f.unit,
-                    "confidence": f.confidence
-                }
-                for f in features
-            ],
-            "entities": ner_features
-        }
+        if ner_indices:
+            outputs = self._ner_outputs([product_descriptions[index] for index in ner_indices], batch_size)
+            for index, entities in zip(ner_indices, outputs):
+                if entities is None:
+                    results[index] = (results[index][0], False)
+                else:
+                    results[index][0]["entities"] = self._entity_features(entities)
+        
+        return results
+
+    async def analyze_async(self, product_description: str) -> Dict:
+        """
+        Асинхронный анализ товара, не блокирующий цикл событий краулера
+        
+        Args:
+            product_description (str): Описание товара
+            
+        Returns:
+            Dict: Результаты анализа (как у analyze_product)
+        """
+        if self.service is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.analyze_product, product_description)
         
+        # Кэш проверяем до очереди: неизмененные описания не занимают процессы.
+        # Идентичность описывает настройки рабочих процессов сервиса - результат считают они
+        scope = f"analyze:{self.language}"
+        service = self.service
+        identity = self._analyze_identity(service.backend, service.cascade_config, service.chunking,
+                                          service.category_index)
+        if self.cache is not None:
+            cached = self.cache.get_many(scope, identity, [product_description])[0]
+            if cached is not None:
+                return cached
+        
+        result, cacheable = await self.service.submit(product_description)
+        if self.cache is not None and cacheable:
+            self.cache.put_many(scope, identity, [product_description], [result])
         return result
 
     def classify_product(self, product_description: str) -> Dict[str, float]:
@@ -100,12 +631,89 @@ class ProductClassifier:
         Returns:
             Dict[str, float]: Словарь с вероятностями категорий
         """
-        try:
-            result = self.classifier(product_description)
-            return result[0]
-        except Exception as e:
-            print(f"Ошибка при классификации: {e}")
-            return {"label": "unknown", "score": 0.0}
+        return self.classify_batch([product_description])[0]
+    
+    def classify_batch(self, product_descriptions: List[str], batch_size: int = 32) -> List[Dict[str, float]]:
+        """
+        Классифицирует список товаров батчами, сгруппированными по длине.
+        Если задан кэш, модель получает только описания, которых в нем нет.
+        
+        Args:
+            product_descriptions (List[str]): Описания товаров
+            batch_size (int): Размер батча
+            
+        Returns:
+            List[Dict[str, float]]: Метка и вероятность для каждого описания по порядку
+        """
+        def compute(texts: List[str]) -> List[Tuple[Dict[str, float], bool]]:
+            outputs = self._run_batched(self.classifier, texts, batch_size, "Ошибка при классификации")
+            return [
+                (output, True) if output is not None else ({"label": "unknown", "score": 0.0}, False)
+                for output in outputs
+            ]
+        
+        return self._cached("classify", self._cache_identity(self._classifier_spec), product_descriptions, compute)
+    
+    def _ner_outputs(self, product_descriptions: List[str], batch_size: int) -> List[Optional[List[Dict]]]:
+        """
+        Сырые сущности NER по описаниям; None - ошибка инференса.
+        
+        Описания очищаются от шаблонных фраз и режутся на перекрывающиеся фрагменты
+        в пределах бюджета токенов; фрагменты всех описаний идут в общие батчи,
+        а сущности собираются обратно с дедупликацией по смещениям.
+        """
+        ner = self.ner
+        tokenizer = getattr(ner, "tokenizer", None)
+        
+        # None - описание не удалось подготовить (например, токенизатор без offset_mapping)
+        grouped: List[Optional[List[Tuple[int, List[Dict]]]]] = [[] for _ in product_descriptions]
+        owners: List[int] = []
+        chunks: List[Chunk] = []
+        for index, description in enumerate(product_descriptions):
+            try:
+                text = strip_boilerplate(description) if self.chunking.strip_boilerplate else description
+                item_chunks = chunk_text(text, tokenizer, self.chunking)
+            except Exception as e:
+                logger.error(f"Ошибка при подготовке описания к извлечению сущностей: {e}")
+                grouped[index] = None
+                continue
+            owners.extend([index] * len(item_chunks))
+            chunks.extend(item_chunks)
+        
+        outputs = self._run_batched(
+            ner,
+            [chunk.text for chunk in chunks],
+            batch_size,
+            "Ошибка при извлечении сущностей",
+            # Длины в токенах уже посчитаны при нарезке
+            lengths=[chunk.tokens for chunk in chunks] if tokenizer is not None else None
+        )
+        
+        for owner, chunk, entities in zip(owners, chunks, outputs):
+            if grouped[owner] is None:
+                continue
+            if entities is None:
+                grouped[owner] = None
+            else:
+                grouped[owner].append((chunk.offset, entities))
+        
+        return [merge_entities(parts) if parts is not None else None for parts in grouped]
+    
+    def ner_batch(self, product_descriptions: List[str], batch_size: int = 16) -> List[List[Dict]]:
+        """
+        Извлекает сущности NER из списка описаний батчами, сгруппированными по длине
+        
+        Args:
+            product_descriptions (List[str]): Описания товаров
+            batch_size (int): Размер батча
+            
+        Returns:
+            List[List[Dict]]: Сущности (text, type, score) для каждого описания по порядку
+        """
+        return [
+            self._entity_features(entities) if entities is not None else []
+            for entities in self._ner_outputs(product_descriptions, batch_size)
+        ]
 
     def extract_features(self, product_description: str) -> List[Dict[str, str]]:
         """
@@ -117,33 +725,16 @@ class ProductClassifier:
         Returns:
             List[Dict[str, str]]: Список характеристик с их типами
         """
-        try:
-            # Токенизация текста
-            tokens = self.tokenizer(product_description, return_tensors="pt")
-            
-            # Извлечение сущностей
-            entities = self.ner(product_description)
-            
-            # Обработка результатов
-            features = []
-            for entity in entities:
-                feature = {
-                    "text": entity["word"],
-                    "type": entity["entity_group"],
-                    "score": round(entity["score"], 3)
-                }
+        features = []
+        for feature in self.ner_batch([product_description])[0]:
+            # Дополнительная обработка для специфических характеристик
+            if "ГБ" in feature["text"] or "GB" in feature["text"]:
+                feature["type"] = "memory"
+            elif "дюйм" in feature["text"] or "inch" in feature["text"]:
+                feature["type"] = "screen_size"
+            elif "камера" in feature["text"] or "camera" in feature["text"]:
+                feature["type"] = "camera"
                 
-                # Дополнительная обработка для специфических характеристик
-                if "ГБ" in feature["text"] or "GB" in feature["text"]:
-                    feature["type"] = "memory"
-                elif "дюйм" in feature["text"] or "inch" in feature["text"]:
-                    feature["type"] = "screen_size"
-                elif "камера" in feature["text"] or "camera" in feature["text"]:
-                    feature["type"] = "camera"
-                    
-                features.append(feature)
-                
-            return features
-        except Exception as e:
-            print(f"Ошибка при извлечении характеристик: {e}")
-            return [] 
\ No newline at end of file
+            features.append(feature)
+            
+        return features
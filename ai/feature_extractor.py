@@ -1,5 +1,6 @@
 import re
-from typing import Dict, List, Optional
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 
 @dataclass
@@ -51,6 +52,29 @@ class FeatureExtractor:
             "мАч": "mAh",
             "дюйм": "inch",
         }
+        
+        self._compile()
+    
+    def _compile(self):
+        """
+        Компилирует шаблоны один раз на экземпляр.
+        Вызывается в конструкторе; после изменения patterns его нужно вызвать снова.
+        
+        Каждый шаблон ищется отдельно: совпадения разных шаблонов могут перекрываться
+        ("8 на 128 ГБ" - это и память, и разрешение), а общая альтернатива
+        отдала бы каждый фрагмент текста только одному шаблону. Общий сканер из
+        опережающих проверок перекрытия сохраняет, но в re он не быстрее отдельных проходов
+        """
+        self._compiled: List[Tuple[str, "re.Pattern"]] = [
+            (feature_type, re.compile(pattern, re.IGNORECASE))
+            for feature_type, patterns in self.patterns.items()
+            for pattern in patterns
+        ]
+        
+        # IGNORECASE возвращает единицы в регистре текста ("гб", "Mah"),
+        # поэтому ищем нормализацию без учета регистра
+        self._units = {unit.casefold(): unit for unit in self.unit_normalizers.values()}
+        self._units.update({unit.casefold(): normalized for unit, normalized in self.unit_normalizers.items()})
     
     def extract_features(self, text: str) -> List[ProductFeature]:
         """
@@ -65,25 +89,42 @@ class FeatureExtractor:
         features = []
         
         # Ищем все характеристики по шаблонам
-        for feature_type, patterns in self.patterns.items():
-            for pattern in patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    if feature_type == "resolution":
-                        value = f"{match.group(1)}x{match.group(2)}"
-                        unit = "pixels"
-                    else:
-                        value = match.group(1)
-                        unit = match.group(2) if len(match.groups()) > 1 else None
-                        
-                    # Нормализуем единицы измерения
-                    if unit in self.unit_normalizers:
-                        unit = self.unit_normalizers[unit]
-                        
-                    features.append(ProductFeature(
-                        name=feature_type,
-                        value=value,
-                        unit=unit
-                    ))
+        for feature_type, pattern in self._compiled:
+            for match in pattern.finditer(text):
+                if feature_type == "resolution":
+                    value = f"{match.group(1)}x{match.group(2)}"
+                    unit = "pixels"
+                else:
+                    value = match.group(1)
+                    unit = match.group(2) if len(match.groups()) > 1 else None
+                    
+                # Нормализуем единицы измерения
+                if unit is not None:
+                    unit = self._units.get(unit.casefold(), unit)
+                    
+                features.append(ProductFeature(
+                    name=feature_type,
+                    value=value,
+                    unit=unit
+                ))
+        
+        return features
+    
+    def extract_batch(self, texts: List[str], processes: Optional[int] = None,
+                      chunksize: int = 1000) -> List[List[ProductFeature]]:
+        """
+        Извлекает характеристики из списка описаний
+        
+        Args:
+            texts (List[str]): Описания товаров
+            processes (Optional[int]): Количество процессов; None - в текущем процессе
+            chunksize (int): Сколько описаний отправлять процессу за раз
+            
+        Returns:
+            List[List[ProductFeature]]: Характеристики для каждого описания по порядку
+        """
+        if not processes or processes < 2 or len(texts) <= chunksize:
+            return [self.extract_features(text) for text in texts]
         
-        return features 
\ No newline at end of file
+        with Pool(processes) as pool:
+            return pool.map(self.extract_features, texts, chunksize)
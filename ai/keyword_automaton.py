@@ -0,0 +1,161 @@
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Iterator, List, NamedTuple
+
+
+class KeywordMatch(NamedTuple):
+    """Найденное ключевое слово"""
+    start: int
+    end: int
+    keyword: str
+    value: Any
+    weight: float
+
+
+class KeywordAutomaton:
+    """
+    Автомат Ахо-Корасик: находит все вхождения набора ключевых слов за один проход по тексту,
+    время поиска не зависит от количества слов.
+
+    Совпадение засчитывается, только если слово начинается на границе слова текста.
+    Слово, добавленное с prefix=False, должно и заканчиваться на границе; с prefix=True
+    оно может быть началом более длинного слова (словоформы: "смартфон" -> "смартфона").
+    iter_matches() отдает все вхождения, longest_matches() - только самые длинные
+    из перекрывающихся ("smart tv" без вложенного "tv").
+    """
+
+    def __init__(self):
+        # Переходы, ссылки неудач и выходы по состояниям; состояние 0 - корень
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        # Ключевые слова: (слово, значение, вес, можно ли продолжение слова)
+        self._keywords: List[tuple] = []
+        self._built = True
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def add(self, keyword: str, value: Any, weight: float = 1.0, prefix: bool = False):
+        """
+        Добавляет ключевое слово
+
+        Args:
+            keyword (str): Ключевое слово (ищется без учета регистра)
+            value (Any): Значение, которое вернется при совпадении (например, категория)
+            weight (float): Вес совпадения
+            prefix (bool): Разрешить совпадение с началом более длинного слова
+        """
+        keyword = keyword.casefold()
+        if not keyword:
+            return
+
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+
+        self._output[state].append(len(self._keywords))
+        self._keywords.append((keyword, value, weight, prefix))
+        self._built = False
+
+    def build(self):
+        """Строит ссылки неудач обходом в ширину; вызывается автоматически перед поиском"""
+        # Выходы пересобираются с нуля, поэтому сначала оставляем только собственные слова состояний
+        own = [[] for _ in self._goto]
+        for index, (keyword, _, _, _) in enumerate(self._keywords):
+            state = 0
+            for char in keyword:
+                state = self._goto[state][char]
+            own[state].append(index)
+        self._output = own
+
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # Слова, оканчивающиеся в состоянии-суффиксе, тоже заканчиваются здесь
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+                queue.append(next_state)
+
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[KeywordMatch]:
+        """
+        Находит все вхождения ключевых слов на границах слов
+
+        Args:
+            text (str): Текст; регистр приводится внутри
+
+        Returns:
+            Iterator[KeywordMatch]: Совпадения в порядке их окончания в тексте
+        """
+        if not self._built:
+            self.build()
+
+        text = text.casefold()
+        goto, fail, output, keywords = self._goto, self._fail, self._output, self._keywords
+        length = len(text)
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+
+            end = position + 1
+            for index in output[state]:
+                keyword, value, weight, prefix = keywords[index]
+                start = end - len(keyword)
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not prefix and end < length and text[end].isalnum():
+                    continue
+                yield KeywordMatch(start, end, keyword, value, weight)
+
+    def longest_matches(self, text: str) -> List[KeywordMatch]:
+        """
+        Находит вхождения ключевых слов без перекрытий: из перекрывающихся
+        остается самое длинное (при равной длине - то, что левее). Одно и то же
+        слово с разными значениями возвращается для каждого значения
+
+        Args:
+            text (str): Текст; регистр приводится внутри
+
+        Returns:
+            List[KeywordMatch]: Совпадения в порядке их начала в тексте
+        """
+        matches = sorted(self.iter_matches(text), key=lambda match: (match.start - match.end, match.start))
+        # Начала и концы выбранных совпадений, упорядоченные по началу
+        starts: List[int] = []
+        ends: List[int] = []
+        chosen: List[KeywordMatch] = []
+        for match in matches:
+            index = bisect_right(starts, match.start)
+            if index and starts[index - 1] == match.start and ends[index - 1] == match.end:
+                chosen.append(match)
+                continue
+            if index and ends[index - 1] > match.start:
+                continue
+            if index < len(starts) and starts[index] < match.end:
+                continue
+            starts.insert(index, match.start)
+            ends.insert(index, match.end)
+            chosen.append(match)
+        chosen.sort(key=lambda match: match.start)
+        return chosen
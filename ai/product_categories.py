@@ -1,5 +1,11 @@
+import re
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .keyword_automaton import KeywordAutomaton
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 class ProductCategory(Enum):
     SMARTPHONE = "smartphone"
@@ -10,6 +16,10 @@ class ProductCategory(Enum):
     UNKNOWN = "unknown"
 
 class CategoryMatcher:
+    # Ключевые слова не короче этого могут быть началом словоформы ("смартфона", "laptops");
+    # короткие ("tv", "ipad") засчитываются только целым словом
+    PREFIX_MIN_LENGTH = 5
+    
     def __init__(self):
         self.category_keywords = {
             ProductCategory.SMARTPHONE: [
@@ -51,6 +61,82 @@ class CategoryMatcher:
                 "навушники", "гарнітура"
             ]
         }
+        
+        # Вес совпадения; по умолчанию - количество слов в ключевом слове
+        # (словосочетание "galaxy tab" надежнее одиночного слова)
+        self.keyword_weights: Dict[str, float] = {
+            # Встречается и в описаниях планшетов, и в описаниях смартфонов
+            "android": 0.5,
+        }
+        
+        self._compile()
+    
+    def _compile(self):
+        """
+        Строит автомат по ключевым словам всех языков.
+        Вызывается в конструкторе; после изменения словарей его нужно вызвать снова.
+        """
+        self._automaton = KeywordAutomaton()
+        # Порядок категорий разрешает ничьи так же, как раньше порядок перебора словаря
+        self._order: Dict[ProductCategory, int] = {}
+        # Общие для языков слова ("смартфон") добавляем один раз, иначе они весят вдвое больше
+        self._added = set()
+        for keywords in (self.category_keywords, self.uk_category_keywords):
+            for category, words in keywords.items():
+                self._order.setdefault(category, len(self._order))
+                for word in words:
+                    self._add_keyword(category, word)
+        self._automaton.build()
+    
+    def _add_keyword(self, category: ProductCategory, word: str) -> bool:
+        """Добавляет слово в автомат; False, если оно уже есть у категории"""
+        word = _WHITESPACE_RE.sub(' ', word.casefold()).strip()
+        if not word or (category, word) in self._added:
+            return False
+        self._added.add((category, word))
+        weight = self.keyword_weights.get(word, float(len(word.split())))
+        self._automaton.add(word, category, weight, prefix=len(word) >= self.PREFIX_MIN_LENGTH)
+        return True
+    
+    def add_keywords(self, category: ProductCategory, keywords: List[str], weight: Optional[float] = None):
+        """
+        Добавляет ключевые слова категории без перестройки всего словаря
+        
+        Args:
+            category (ProductCategory): Категория
+            keywords (List[str]): Ключевые слова
+            weight (Optional[float]): Вес совпадения; None - по количеству слов
+        """
+        self.category_keywords.setdefault(category, [])
+        self._order.setdefault(category, len(self._order))
+        for word in keywords:
+            if weight is not None:
+                self.keyword_weights[_WHITESPACE_RE.sub(' ', word.casefold()).strip()] = weight
+            if self._add_keyword(category, word):
+                self.category_keywords[category].append(word)
+    
+    def score_categories(self, text: str) -> Dict[ProductCategory, float]:
+        """
+        Считает взвешенные совпадения ключевых слов по категориям за один проход.
+        Из перекрывающихся слов засчитывается самое длинное: "smart tv" не считается
+        еще раз как "tv", и составные слова не удваивают вес категории
+        
+        Args:
+            text (str): Описание товара
+            
+        Returns:
+            Dict[ProductCategory, float]: Сумма весов совпадений для каждой найденной категории,
+                от лучшей к худшей
+        """
+        scores: Dict[ProductCategory, float] = {}
+        first_seen: Dict[ProductCategory, int] = {}
+        for match in self._automaton.longest_matches(_WHITESPACE_RE.sub(' ', text or "")):
+            scores[match.value] = scores.get(match.value, 0.0) + match.weight
+            first_seen.setdefault(match.value, match.start)
+        
+        # При равных весах выигрывает категория, упомянутая раньше
+        ranked = sorted(scores, key=lambda category: (-scores[category], first_seen[category], self._order[category]))
+        return {category: scores[category] for category in ranked}
     
     def match_category(self, text: str, language: str = "ru") -> ProductCategory:
         """
@@ -58,19 +144,24 @@ class CategoryMatcher:
         
         Args:
             text (str): Описание товара
-            language (str): Язык описания ("ru" или "uk")
+            language (str): Язык описания ("ru" или "uk"); автомат знает слова всех языков,
+                параметр оставлен для совместимости
             
         Returns:
             ProductCategory: Категория товара
         """
-        text = text.lower()
-        
-        # Выбираем словарь ключевых слов в зависимости от языка
-        keywords = self.uk_category_keywords if language == "uk" else self.category_keywords
+        scores = self.score_categories(text)
+        return next(iter(scores), ProductCategory.UNKNOWN)
+    
+    def match_batch(self, texts: List[str], language: str = "ru") -> List[ProductCategory]:
+        """
+        Определяет категории для списка описаний
         
-        # Ищем совпадения с ключевыми словами
-        for category, words in keywords.items():
-            if any(word in text for word in words):
-                return category
-                
-        return ProductCategory.UNKNOWN 
\ No newline at end of file
+        Args:
+            texts (List[str]): Описания товаров
+            language (str): Язык описаний (для совместимости с match_category)
+            
+        Returns:
+            List[ProductCategory]: Категории по порядку
+        """
+        return [self.match_category(text, language) for text in texts]
@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .cascade import CascadeConfig, InferenceCascade
+from .chunking import ChunkingConfig
+from .classifier import ProductClassifier
+
+if TYPE_CHECKING:
+    from .category_index import CategoryIndex
+
+logger = logging.getLogger('parser')
+
+# Классификатор рабочего процесса (создается инициализатором пула)
+_worker_classifier: Optional[ProductClassifier] = None
+
+
+def _init_worker(language: str, backend: str, cascade_config: Optional[CascadeConfig],
+                 category_index: Optional["CategoryIndex"] = None, chunking: Optional[ChunkingConfig] = None):
+    """
+    Инициализатор рабочего процесса: загружает модели один раз на процесс.
+    Процесс запущен через forkserver или spawn и читает артефакты, подготовленные родителем
+    (ModelRegistry.export), а не копию памяти родителя с его потоками и циклом событий.
+    """
+    global _worker_classifier
+    _worker_classifier = ProductClassifier(
+        language=language,
+        backend=backend,
+        cascade=InferenceCascade(cascade_config),
+        chunking=chunking,
+        category_index=category_index
+    ).warm_up()
+
+
+def _analyze_batch(texts: List[str], batch_size: int) -> List[Tuple[Dict, bool]]:
+    """Анализ батча в рабочем процессе"""
+    return _worker_classifier._analyze_uncached(texts, batch_size)
+
+
+class InferenceService:
+    """
+    Асинхронный фронтенд к пулу процессов с моделями.
+
+    Запросы, пришедшие почти одновременно, собираются в микро-батчи
+    (до max_batch штук или max_wait секунд). Очередь ограничена max_queue:
+    когда она заполнена, analyze() ждет, и вызывающий код замедляется,
+    вместо того чтобы копить запросы в памяти.
+    """
+
+    def __init__(self, language: str = "ru", workers: int = 2, max_batch: int = 16,
+                 max_wait: float = 0.01, max_queue: int = 256, backend: str = "torch",
+                 cascade_config: Optional[CascadeConfig] = None, preload: bool = True,
+                 start_method: Optional[str] = None, category_index: Optional["CategoryIndex"] = None,
+                 chunking: Optional[ChunkingConfig] = None):
+        """
+        Args:
+            language (str): Язык описаний
+            workers (int): Количество рабочих процессов
+            max_batch (int): Максимальный размер микро-батча
+            max_wait (float): Сколько ждать добора батча после первого запроса, секунды
+            max_queue (int): Размер очереди запросов
+            backend (str): Бэкенд инференса моделей ("torch", "int8", "onnx")
+            cascade_config (Optional[CascadeConfig]): Настройки каскада в рабочих процессах
+            preload (bool): До запуска пула экспортировать модели в artifact_dir реестра
+                (PARSER_MODEL_DIR) в родительском процессе: процессы читают готовые
+                safetensors через mmap, а не экспортируют одну модель одновременно
+            start_method (Optional[str]): Способ запуска процессов multiprocessing;
+                по умолчанию "forkserver", где он есть, иначе "spawn". fork не подходит:
+                родитель к этому моменту работает с циклом событий, потоками и torch
+            category_index (Optional[CategoryIndex]): Индекс центроидов категорий для рабочих процессов;
+                должен совпадать с индексом классификатора, который отправляет запросы. Процессы
+                получают копию индекса при start(): чтобы они увидели partial_fit, сервис
+                перезапускают (stop() и start())
+            chunking (Optional[ChunkingConfig]): Очистка и нарезка описаний перед NER в рабочих процессах
+        """
+        self.language = language
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.backend = backend
+        self.cascade_config = cascade_config or CascadeConfig()
+        self.preload = preload
+        self.start_method = start_method or (
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        )
+        self.category_index = category_index
+        self.chunking = chunking or ChunkingConfig()
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batches = set()
+
+        self._latencies = deque(maxlen=1000)
+        self._counters = {"requests": 0, "completed": 0, "failed": 0, "batches": 0, "batched_items": 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def start(self):
+        """Запускает пул процессов и диспетчер"""
+        if self._dispatcher is not None:
+            return
+        if self.preload:
+            # Один экспорт в родителе вместо одновременного экспорта в каждом процессе
+            classifier = ProductClassifier(self.language, backend=self.backend)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, classifier.registry.export, classifier.model_specs())
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self.language, self.backend, self.cascade_config, self.category_index, self.chunking)
+        )
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # Не больше одного батча на процесс: пока процессы заняты, батчи в очереди растут
+        self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Дожидается текущих батчей и останавливает процессы"""
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._fail(pending, RuntimeError("Сервис инференса остановлен"))
+        self._executor.shutdown(wait=True)
+        self._dispatcher = None
+        self._executor = None
+
+    async def submit(self, text: str) -> Tuple[Dict, bool]:
+        """
+        Ставит описание в очередь и ждет результат
+
+        Args:
+            text (str): Описание товара
+
+        Returns:
+            Tuple[Dict, bool]: Результат analyze_product и признак, что инференс прошел без ошибок
+        """
+        if self._dispatcher is None:
+            raise RuntimeError("Сервис инференса не запущен")
+        future = asyncio.get_running_loop().create_future()
+        self._counters["requests"] += 1
+        # При полной очереди ждем здесь - это и есть обратное давление
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def analyze(self, text: str) -> Dict:
+        """
+        Асинхронный аналог ProductClassifier.analyze_product
+
+        Args:
+            text (str): Описание товара
+
+        Returns:
+            Dict: Результаты анализа
+        """
+        result, _ = await self.submit(text)
+        return result
+
+    async def _dispatch(self):
+        """Собирает микро-батчи из очереди и отправляет их в пул"""
+        loop = asyncio.get_running_loop()
+        # Собираемый батч: его запросы уже вынуты из очереди, и stop() их не увидит
+        batch: List[Tuple[str, asyncio.Future, float]] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                await self._slots.acquire()
+                # Добираем то, что накопилось, пока ждали свободный процесс
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                task = asyncio.create_task(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+                batch = []
+        except asyncio.CancelledError:
+            self._fail(batch, RuntimeError("Сервис инференса остановлен"))
+            raise
+
+    @staticmethod
+    def _fail(items: List[Tuple[str, asyncio.Future, float]], error: Exception):
+        """Завершает ошибкой запросы, которые уже не будут выполнены"""
+        for _, future, _ in items:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        """Выполняет батч в рабочем процессе и раздает результаты"""
+        loop = asyncio.get_running_loop()
+        try:
+            # Запросы, которые уже отменил вызывающий код, не считаем
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                return
+            texts = [text for text, _, _ in batch]
+            self._counters["batches"] += 1
+            self._counters["batched_items"] += len(batch)
+            try:
+                results = await loop.run_in_executor(self._executor, _analyze_batch, texts, self.max_batch)
+            except Exception as e:
+                logger.error(f"Ошибка в процессе инференса: {e}")
+                self._counters["failed"] += len(batch)
+                self._fail(batch, e)
+                return
+
+            now = time.perf_counter()
+            for (_, future, started), result in zip(batch, results):
+                self._latencies.append(now - started)
+                self._counters["completed"] += 1
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def metrics(self) -> Dict:
+        """
+        Снимок метрик сервиса
+
+        Returns:
+            Dict: Глубина очереди, батчи, счетчики и перцентили задержки в секундах
+        """
+        latencies = sorted(self._latencies)
+
+        def percentile(value: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(value * len(latencies)))], 4)
+
+        batches = self._counters["batches"]
+        return {
+            **self._counters,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_limit": self.max_queue,
+            "in_flight_batches": len(self._batches),
+            "avg_batch_size": round(self._counters["batched_items"] / batches, 2) if batches else 0.0,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_p99": percentile(0.99),
+        }
@@ -0,0 +1,3 @@
+"""
+Микробенчмарки горячих путей извлечения на сохраненных страницах магазинов
+"""
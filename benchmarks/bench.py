@@ -0,0 +1,361 @@
+"""
+Микробенчмарки горячих путей извлечения на сохраненных страницах магазинов.
+
+Для каждого случая измеряются операции в секунду (лучший из нескольких
+повторов, число вызовов в повторе подбирается автоматически) и память одного
+вызова через tracemalloc: пик и то, что осталось занятым после вызова.
+Результаты сравниваются с базовыми значениями (baselines.json): если
+скорость упала или пик памяти вырос больше порога, бенчмарк завершается
+с кодом 1. Дополнительно проверяется, что бэкенды DOM bs4 и lxml извлекают
+со страницы LUGI одно и то же.
+
+Пример:
+    python -m benchmarks.bench
+    python -m benchmarks.bench -k smart --repeat 7
+    python -m benchmarks.bench --save-baseline
+
+Базовые значения зависят от машины: после смены окружения их нужно
+перезаписать через --save-baseline.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DESCRIPTIONS_PATH = "data/benchmark_descriptions.json"
+STORES = ("lugi", "rozetka", "amazon", "aliexpress")
+
+# Случаи: имя -> функция подготовки, возвращающая измеряемый вызов без аргументов
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    """Регистрирует случай бенчмарка"""
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        CASES[name] = setup
+        return setup
+    return decorator
+
+
+def fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _descriptions() -> List[str]:
+    with open(DESCRIPTIONS_PATH, encoding="utf-8") as f:
+        return [item["text"] for item in json.load(f)]
+
+
+def _run_async(coroutine_function: Callable[[], object]) -> Callable[[], object]:
+    """Синхронная обертка над корутиной на одном цикле событий (без затрат на asyncio.run)"""
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(coroutine_function())
+
+
+def _lugi_parser(backend: str):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    parser_class = type(f"LUGIParser_{backend}", (LUGIParser,), {"DOM_BACKEND": backend})
+    return parser_class()
+
+
+for _backend in ("bs4", "lxml"):
+    @case(f"lugi._standard_parse[{_backend}]")
+    def _lugi_standard_parse(backend=_backend):
+        parser = _lugi_parser(backend)
+        html = fixture("lugi_product.html")
+        return _run_async(lambda: parser._standard_parse(html))
+
+
+def _smart_parser(storage_path: Optional[str] = None):
+    from parsers.smart_parser import SmartParser
+
+    storage_path = storage_path or os.path.join(tempfile.mkdtemp(prefix="bench-patterns-"), "patterns.json")
+    return SmartParser(storage_path=storage_path)
+
+
+for _store in STORES:
+    @case(f"smart.discover_patterns[{_store}]")
+    def _smart_discover(store=_store):
+        parser = _smart_parser()
+        html = fixture(f"{store}_product.html")
+        return lambda: parser.discover_patterns(html)
+
+    @case(f"smart.extract_data[{_store}]")
+    def _smart_extract(store=_store):
+        parser = _smart_parser()
+        html = fixture(f"{store}_product.html")
+        # Паттерны, выученные на этой же странице: извлечение проходит по всем полям
+        for field, patterns in parser.discover_patterns(html).items():
+            parser.patterns[field].extend(patterns)
+        return lambda: parser.extract_data(html)
+
+
+@case("smart.learn[lugi]")
+def _smart_learn():
+    parser = _smart_parser()
+    html = fixture("lugi_product.html")
+    return lambda: parser.learn(html, {})
+
+
+@case("smart.get_selector_path[lugi]")
+def _smart_selector_path():
+    from bs4 import BeautifulSoup
+
+    parser = _smart_parser()
+    soup = BeautifulSoup(fixture("lugi_product.html"), "html.parser")
+    elements = soup.find_all(["td", "li", "img", "span", "p"])
+    return lambda: [parser.get_selector_path(element) for element in elements]
+
+
+@case("base.extract_price")
+def _extract_price():
+    from parsers.base_parser import BaseParser
+
+    with open(os.path.join(FIXTURES_DIR, "prices.json"), encoding="utf-8") as f:
+        prices = json.load(f)
+    return lambda: [BaseParser.extract_price(price, "UAH") for price in prices]
+
+
+@case("base.extract_price[uncached]")
+def _extract_price_uncached():
+    from parsers.normalize import parse_price
+
+    with open(os.path.join(FIXTURES_DIR, "prices.json"), encoding="utf-8") as f:
+        prices = json.load(f)
+
+    def run():
+        parse_price.cache_clear()
+        return [parse_price(price, "UAH") for price in prices]
+    return run
+
+
+@case("base.clean_text")
+def _clean_text():
+    from parsers.base_parser import BaseParser
+
+    texts = [text + "\n\t  " + text for text in _descriptions()]
+    return lambda: [BaseParser.clean_text(text) for text in texts]
+
+
+@case("ai.extract_features")
+def _extract_features():
+    from ai.feature_extractor import FeatureExtractor
+
+    extractor = FeatureExtractor()
+    texts = _descriptions()
+    return lambda: [extractor.extract_features(text) for text in texts]
+
+
+@case("ai.match_category")
+def _match_category():
+    from ai.product_categories import CategoryMatcher
+
+    matcher = CategoryMatcher()
+    texts = _descriptions()
+    return lambda: [matcher.match_category(text) for text in texts]
+
+
+def _replayed_parser(parser_class, url: str, html: str):
+    """Парсер, получающий страницу из хранилища parsers.replay вместо сети"""
+    from parsers.replay import RECORD, NetworkSession, NetworkStore
+
+    store = NetworkStore(tempfile.mkdtemp(prefix="bench-network-"), RECORD)
+    store.record("GET", url, 200, [("Content-Type", "text/html; charset=utf-8")], html.encode("utf-8"))
+    parser = parser_class()
+    # Как в режиме replay: лимит домена не нужен, записанные ответы не нагружают магазин
+    parser.RATE_LIMIT = None
+    # Сессия без настоящего aiohttp только воспроизводит записанное
+    parser.session = NetworkSession(store)
+    parser._entered = True
+
+    async def parse():
+        store.rewind()
+        return await parser.parse_product_page(url)
+    return _run_async(parse)
+
+
+@case("amazon.parse_product_page[replay]")
+def _amazon_product():
+    from parsers.store_specific.amazon_parser import AmazonParser
+
+    return _replayed_parser(AmazonParser, "https://www.amazon.com/dp/B09XS7JWHH", fixture("amazon_product.html"))
+
+
+@case("aliexpress.parse_product_page[replay]")
+def _aliexpress_product():
+    from parsers.store_specific.aliexpress_parser import AliExpressParser
+
+    return _replayed_parser(AliExpressParser, "https://aliexpress.ru/item/1005006203.html",
+                            fixture("aliexpress_product.html"))
+
+
+@dataclass
+class Result:
+    name: str
+    ops_per_sec: float
+    peak_kib: float
+    retained_kib: float
+    error: Optional[str] = None
+
+
+def measure(name: str, min_time: float = 0.2, repeat: int = 5) -> Result:
+    """
+    Измеряет один случай
+
+    Args:
+        name (str): Имя случая из CASES
+        min_time (float): Минимальная длительность одного повтора, секунды
+        repeat (int): Количество повторов (берется лучший)
+
+    Returns:
+        Result: Операции в секунду и память одного вызова
+    """
+    try:
+        function = CASES[name]()
+        function()  # прогрев: ленивые импорты, компиляция шаблонов, кэши
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            # Остаток считается после сборки циклов: деревья bs4 освобождаются только сборщиком
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        timer = timeit.Timer(function)
+        number, elapsed = timer.autorange()
+        if elapsed < min_time:
+            number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+        best = min(timer.repeat(repeat=repeat, number=number))
+        return Result(name, round(number / best, 2), round((peak - before) / 1024, 1),
+                      round((current - before) / 1024, 1))
+    except Exception as e:
+        return Result(name, 0.0, 0.0, 0.0, error=f"{type(e).__name__}: {e}")
+
+
+def compare(results: List[Result], baselines: Dict[str, Dict], threshold: float) -> List[str]:
+    """
+    Сравнивает результаты с базовыми значениями
+
+    Args:
+        results (List[Result]): Результаты замеров
+        baselines (Dict[str, Dict]): Базовые значения по именам случаев
+        threshold (float): Допустимое ухудшение (0.3 - на 30%)
+
+    Returns:
+        List[str]: Описания регрессий
+    """
+    regressions = []
+    for result in results:
+        if result.error:
+            regressions.append(f"{result.name}: {result.error}")
+            continue
+        baseline = baselines.get(result.name)
+        if not baseline:
+            continue
+        if result.ops_per_sec < baseline["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{result.name}: {result.ops_per_sec:.1f} оп/с, база {baseline['ops_per_sec']:.1f}")
+        # Небольшой абсолютный допуск: пик в несколько КиБ шумит от запуска к запуску
+        if result.peak_kib > baseline["peak_kib"] * (1 + threshold) + 16:
+            regressions.append(f"{result.name}: пик памяти {result.peak_kib:.1f} КиБ, база {baseline['peak_kib']:.1f}")
+    return regressions
+
+
+def check_backends_equivalent() -> Optional[str]:
+    """
+    Проверяет, что LUGI-парсер с бэкендами bs4 и lxml извлекает одинаковые данные
+
+    Returns:
+        Optional[str]: Описание расхождения или None
+    """
+    html = fixture("lugi_product.html")
+    loop = asyncio.new_event_loop()
+    try:
+        results = {backend: loop.run_until_complete(_lugi_parser(backend)._standard_parse(html))
+                   for backend in ("bs4", "lxml")}
+    except Exception as e:
+        return f"бэкенды DOM: {type(e).__name__}: {e}"
+    finally:
+        loop.close()
+    if results["bs4"] != results["lxml"]:
+        fields = sorted(key for key in results["bs4"].keys() | results["lxml"].keys()
+                        if results["bs4"].get(key) != results["lxml"].get(key))
+        return f"бэкенды DOM bs4 и lxml расходятся в полях: {', '.join(fields)}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки извлечения данных")
+    parser.add_argument("-k", "--filter", help="Запускать только случаи, имя которых содержит подстроку")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Минимальная длительность повтора, секунды")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.3, help="Допустимое ухудшение относительно базы")
+    parser.add_argument("--baseline", default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Записать результаты как базовые")
+    parser.add_argument("--json", action="store_true", help="Вывести результаты в JSON")
+    args = parser.parse_args()
+
+    # Сообщения INFO парсеров (например, learn) не должны попадать в замеры
+    logging.disable(logging.INFO)
+
+    names = [name for name in CASES if not args.filter or args.filter in name]
+    results = [measure(name, args.min_time, args.repeat) for name in names]
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], ensure_ascii=False, indent=2))
+    else:
+        print(f"{'случай':<44} {'оп/с':>12} {'база':>12} {'пик КиБ':>9} {'остаток КиБ':>12}")
+        for result in results:
+            if result.error:
+                print(f"{result.name:<44} ошибка: {result.error}")
+                continue
+            base = baselines.get(result.name, {}).get("ops_per_sec")
+            print(f"{result.name:<44} {result.ops_per_sec:>12.1f} {base if base is not None else '-':>12} "
+                  f"{result.peak_kib:>9.1f} {result.retained_kib:>12.1f}")
+
+    if args.save_baseline:
+        baselines.update({
+            result.name: {"ops_per_sec": result.ops_per_sec, "peak_kib": result.peak_kib}
+            for result in results if not result.error
+        })
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        return
+
+    problems = compare(results, baselines, args.threshold)
+    if not args.filter or "lugi" in args.filter:
+        mismatch = check_backends_equivalent()
+        if mismatch:
+            problems.append(mismatch)
+    if problems:
+        print("\nРегрессии:", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Нагрузочный прогон полного конвейера на синтетическом магазине (benchmarks.mock_store).
+
+Парсеры LUGI и Rozetka направляются на локальный магазин и обходят его через
+ParserRouter: запуск браузера, пул контекстов, загрузка страниц, извлечение,
+обучение SmartParser и запись результатов (JSON Lines). Магазин по умолчанию
+запускается отдельным процессом, чтобы его работа не попадала в замер.
+
+Отчет: страницы в секунду, задержки (p50/p90/p99), процессорное время всего
+дерева процессов краулера (Python + Chromium) и пик его резидентной памяти,
+а также производные для расчета парка: страниц в секунду на ядро и на ГБ.
+Процессы читаются из /proc, поэтому прогон рассчитан на Linux.
+
+Пример:
+    python -m benchmarks.load_test --pages 200 --concurrency 2 --per-store 4 \\
+        --latency-ms 80 --page-size-kb 150 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from parsers.registry import StoreEntry, register
+from parsers.router import ParserRouter
+from parsers.store_specific.lugi_parser import LUGIParser
+from parsers.store_specific.rozetka_parser import RozetkaParser
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+class MockLUGIParser(LUGIParser):
+    """LUGIParser, направленный на синтетический магазин (см. point_parsers)"""
+
+    def __init__(self):
+        super().__init__()
+        # Обучение SmartParser идет как обычно, но не портит data/patterns.json
+        self.smart_parser.storage_path = os.path.join(tempfile.gettempdir(), "load-test-patterns.json")
+
+
+class MockRozetkaParser(RozetkaParser):
+    """RozetkaParser, направленный на синтетический магазин (см. point_parsers)"""
+
+
+def point_parsers(base_url: str):
+    """
+    Направляет парсеры на синтетический магазин и регистрирует их в реестре по шаблонам URL
+
+    Args:
+        base_url (str): Базовый URL магазина (http://127.0.0.1:8080)
+    """
+    MockLUGIParser.BASE_URL = f"{base_url}/lugi"
+    MockLUGIParser.SEARCH_URL = f"{base_url}/lugi/search/"
+    MockRozetkaParser.BASE_URL = f"{base_url}/rozetka"
+    MockRozetkaParser.API_URL = f"{base_url}/rozetka/api/product-api/v4/goods/get-main"
+
+    prefix = re.escape(base_url)
+    register(StoreEntry("lugi-mock", __name__, "MockLUGIParser", (), (f"^{prefix}/lugi/",)))
+    register(StoreEntry("rozetka-mock", __name__, "MockRozetkaParser", (), (f"^{prefix}/rozetka/",)))
+
+
+def product_urls(base_url: str, pages: int, stores: List[str], products: int = 10000) -> List[str]:
+    """
+    URL товаров синтетического магазина, по очереди из каждого магазина
+
+    Args:
+        base_url (str): Базовый URL магазина
+        pages (int): Сколько URL
+        stores (List[str]): "lugi" и/или "rozetka"
+        products (int): Размер каталога магазина
+
+    Returns:
+        List[str]: URL (без повторов, пока pages не больше products)
+    """
+    urls = []
+    for index in range(pages):
+        product_id = index * 7919 % products + 1
+        store = stores[index % len(stores)]
+        if store == "lugi":
+            urls.append(f"{base_url}/lugi/product/{product_id}/")
+        else:
+            urls.append(f"{base_url}/rozetka/ua/{product_id}/p{product_id}/")
+    return urls
+
+
+class ProcessTreeSampler:
+    """
+    Периодически читает /proc: процессорное время и RSS процесса и всех его потомков
+    (Chromium запускается дочерними процессами). Время процессов, завершившихся
+    между замерами, учитывается по последнему замеру.
+    """
+
+    def __init__(self, root_pid: Optional[int] = None, exclude: Optional[Set[int]] = None, interval: float = 0.5):
+        """
+        Args:
+            root_pid (Optional[int]): Корень дерева; по умолчанию текущий процесс
+            exclude (Optional[Set[int]]): Процессы, поддеревья которых не учитываются (сервер магазина)
+            interval (float): Период замера, секунды
+        """
+        self.root_pid = root_pid or os.getpid()
+        self.exclude = exclude or set()
+        self.interval = interval
+        self.cpu_ticks: Dict[int, int] = {}
+        self.peak_rss_mb = 0.0
+        self.peak_processes = 0
+        self._baseline: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _read_stat(pid: int):
+        with open(f"/proc/{pid}/stat", encoding="ascii", errors="ignore") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # После имени процесса: state ppid ... utime (12-е) stime (13-е)
+        return int(fields[1]), int(fields[11]) + int(fields[12])
+
+    def _tree(self) -> Dict[int, int]:
+        """Процессы дерева и их процессорное время в тиках"""
+        children: Dict[int, List[int]] = {}
+        ticks: Dict[int, int] = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            try:
+                parent, used = self._read_stat(int(name))
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(name))
+            ticks[int(name)] = used
+
+        tree = {}
+        stack = [self.root_pid]
+        while stack:
+            pid = stack.pop()
+            if pid in self.exclude or pid not in ticks:
+                continue
+            tree[pid] = ticks[pid]
+            stack.extend(children.get(pid, ()))
+        return tree
+
+    def sample(self):
+        tree = self._tree()
+        rss_pages = 0
+        for pid, used in tree.items():
+            self.cpu_ticks[pid] = max(used, self.cpu_ticks.get(pid, 0))
+            try:
+                with open(f"/proc/{pid}/statm", encoding="ascii") as f:
+                    rss_pages += int(f.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_pages * _PAGE_SIZE / (1024 * 1024))
+        self.peak_processes = max(self.peak_processes, len(tree))
+
+    @property
+    def cpu_seconds(self) -> float:
+        return sum(self.cpu_ticks.values()) / _CLOCK_TICKS
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.sample()
+        # Время, набранное до прогона (импорты), не относится к нагрузке
+        self._baseline = dict(self.cpu_ticks)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+        for pid, used in self._baseline.items():
+            self.cpu_ticks[pid] = self.cpu_ticks.get(pid, used) - used
+
+
+class TimedRouter(ParserRouter):
+    """ParserRouter, замеряющий задержку каждой страницы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+
+    async def _parse_one(self, parser, entry, url):
+        started = time.perf_counter()
+        try:
+            return await super()._parse_one(parser, entry, url)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Процентиль q (0..100) методом ближайшего ранга"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def run_load(base_url: str, urls: List[str], concurrency: int = 2, per_store: int = 4,
+                   searches: int = 0, output: str = os.devnull, exclude_pids: Optional[Set[int]] = None,
+                   headless: bool = True) -> Dict[str, Any]:
+    """
+    Обходит синтетический магазин и собирает показатели
+
+    Args:
+        base_url (str): Базовый URL магазина
+        urls (List[str]): URL товаров
+        concurrency (int): Сколько магазинов обрабатывать одновременно
+        per_store (int): Сколько страниц магазина загружать одновременно
+        searches (int): Сколько поисковых запросов выполнить в каждом магазине
+        output (str): Файл для результатов (JSON Lines)
+        exclude_pids (Optional[Set[int]]): Процессы, не относящиеся к краулеру
+        headless (bool): Браузер без окна
+
+    Returns:
+        Dict[str, Any]: Отчет
+    """
+    point_parsers(base_url)
+    sampler = ProcessTreeSampler(exclude=exclude_pids)
+    sampler.start()
+    started = time.perf_counter()
+
+    async with TimedRouter(max_concurrency=concurrency, per_store_concurrency=per_store,
+                           headless=headless) as router:
+        results = await router.parse_urls(urls)
+
+        search_latencies = []
+        for entry in router.group(urls):
+            if entry is None:
+                continue
+            parser = await router.get_parser(entry)
+            for index in range(searches):
+                search_started = time.perf_counter()
+                await parser.search_products(f"товар {index}")
+                search_latencies.append(time.perf_counter() - search_started)
+
+        pool_stats = router.context_pool.stats()
+        watchdog = router.watchdog.metrics() if router.watchdog is not None else {}
+
+    with open(output, "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+
+    elapsed = time.perf_counter() - started
+    await sampler.stop()
+
+    ok = sum(1 for result in results if "product" in result)
+    cpu_seconds = sampler.cpu_seconds
+    pages_per_sec = len(results) / elapsed if elapsed else 0.0
+    latencies = router.latencies
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "pages": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "searches": len(search_latencies),
+        "elapsed_s": round(elapsed, 2),
+        "pages_per_sec": round(pages_per_sec, 2),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p90": ms(percentile(latencies, 90)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(max(latencies) if latencies else None),
+        },
+        "search_latency_ms_p50": ms(percentile(search_latencies, 50)),
+        "cpu_seconds": round(cpu_seconds, 2),
+        "cores_busy": round(cpu_seconds / elapsed, 2) if elapsed else None,
+        "pages_per_core_sec": round(len(results) / cpu_seconds, 2) if cpu_seconds else None,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "pages_per_sec_per_gb": round(pages_per_sec / (sampler.peak_rss_mb / 1024), 2) if sampler.peak_rss_mb else None,
+        "peak_processes": sampler.peak_processes,
+        "context_pool": pool_stats,
+        "watchdog": {key: value for key, value in watchdog.items() if key != "contexts"},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_store_process(args) -> Tuple[subprocess.Popen, str]:
+    """Запускает синтетический магазин отдельным процессом и ждет готовности; возвращает процесс и URL"""
+    port = args.port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_store", "--port", str(port),
+         "--latency-ms", str(args.latency_ms), "--latency-jitter-ms", str(args.latency_jitter_ms),
+         "--page-size-kb", str(args.page_size_kb), "--error-rate", str(args.error_rate),
+         "--products", str(args.products), "--seed", str(args.seed)],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    if not line:
+        process.kill()
+        raise RuntimeError("Синтетический магазин не запустился")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон парсеров на синтетическом магазине")
+    parser.add_argument("--pages", type=int, default=100, help="Сколько страниц товаров обойти")
+    parser.add_argument("--stores", nargs="+", default=["lugi", "rozetka"], choices=["lugi", "rozetka"])
+    parser.add_argument("--concurrency", type=int, default=2, help="Сколько магазинов обрабатывать одновременно")
+    parser.add_argument("--per-store", type=int, default=4, help="Сколько страниц магазина загружать одновременно")
+    parser.add_argument("--searches", type=int, default=0, help="Поисковых запросов на магазин")
+    parser.add_argument("--output", default=os.devnull, help="Куда писать результаты (JSON Lines)")
+    parser.add_argument("--server-url", help="Использовать уже запущенный магазин вместо своего")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--page-size-kb", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--headed", action="store_true", help="Показывать окно браузера")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    server = None
+    base_url = args.server_url
+    if base_url is None:
+        server, base_url = start_store_process(args)
+    try:
+        urls = product_urls(base_url, args.pages, args.stores, args.products)
+        report = asyncio.run(run_load(
+            base_url, urls, args.concurrency, args.per_store, args.searches, args.output,
+            exclude_pids={server.pid} if server else None, headless=not args.headed
+        ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Локальный синтетический магазин для нагрузочных прогонов без внешней сети.
+
+Отдает страницы в разметке LUGI и Rozetka (товар и поиск) и JSON API поиска
+в формате Rozetka. Данные товара детерминированно генерируются по его номеру,
+поэтому повторные прогоны видят одни и те же страницы. Задержка ответа, размер
+страницы и доля ошибок настраиваются.
+
+Маршруты:
+    /lugi/product/{id}/                          страница товара LUGI
+    /lugi/search/?search=...                     выдача поиска LUGI
+    /rozetka/ua/{id}/p{id}/                      страница товара Rozetka
+    /rozetka/api/product-api/v4/goods/get-main   JSON API поиска Rozetka
+    /image/...                                   картинки (1x1 GIF)
+
+Пример:
+    python -m benchmarks.mock_store --port 8080 --latency-ms 80 --page-size-kb 150 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import html
+import json
+import random
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Прозрачный GIF 1x1
+PIXEL_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+BRANDS = ["Apple", "Samsung", "Xiaomi", "Lenovo", "Asus", "Sony", "LG", "Huawei", "Motorola", "Acer"]
+KINDS = [
+    ("Смартфон", "smartphone"),
+    ("Ноутбук", "laptop"),
+    ("Телевізор", "tv"),
+    ("Планшет", "tablet"),
+    ("Навушники", "headphones"),
+]
+COLORS = ["чорний", "білий", "синій", "сірий", "зелений"]
+
+
+@dataclass
+class MockStoreConfig:
+    """Параметры синтетического магазина"""
+    # Средняя задержка ответа и ее разброс (равномерный), миллисекунды
+    latency_ms: float = 50.0
+    latency_jitter_ms: float = 20.0
+    # Примерный размер HTML-страницы: недостающее добирается блоком похожих товаров
+    page_size_kb: int = 100
+    # Доля ответов 503 (страницы и API)
+    error_rate: float = 0.0
+    # Сколько товаров в каталоге (номера 1..products)
+    products: int = 10000
+    seed: int = 0
+
+
+class MockStore:
+    """
+    Синтетический магазин на aiohttp.web.
+
+    Пример:
+        store = MockStore(MockStoreConfig(latency_ms=100))
+        base_url = await store.start()
+        ...
+        await store.stop()
+    """
+
+    def __init__(self, config: Optional[MockStoreConfig] = None):
+        """
+        Args:
+            config (Optional[MockStoreConfig]): Параметры; по умолчанию MockStoreConfig()
+        """
+        self.config = config or MockStoreConfig()
+        self.stats = Counter()
+        self._random = random.Random(self.config.seed)
+        self._runner = None
+        self.base_url: Optional[str] = None
+
+    def app(self):
+        """Приложение aiohttp.web со всеми маршрутами"""
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/lugi/product/{id:\\d+}/", self.lugi_product)
+        app.router.add_get("/lugi/search/", self.lugi_search)
+        app.router.add_get("/rozetka/ua/{id:\\d+}/p{pid:\\d+}/", self.rozetka_product)
+        app.router.add_get("/rozetka/api/product-api/v4/goods/get-main", self.rozetka_api)
+        app.router.add_get("/image/{path:.*}", self.image)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запускает сервер в текущем цикле событий
+
+        Args:
+            host (str): Адрес
+            port (int): Порт; 0 - любой свободный
+
+        Returns:
+            str: Базовый URL сервера
+        """
+        from aiohttp import web
+
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # Общая часть ответов
+
+    async def _delay(self) -> bool:
+        """Задержка ответа; True, если запрос должен завершиться ошибкой"""
+        config = self.config
+        delay = config.latency_ms + self._random.uniform(-config.latency_jitter_ms, config.latency_jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        return self._random.random() < config.error_rate
+
+    def _error(self):
+        from aiohttp import web
+
+        self.stats["errors"] += 1
+        return web.Response(status=503, text="<html><body><h1>503 Service Unavailable</h1></body></html>",
+                            content_type="text/html")
+
+    def _html(self, body: str):
+        from aiohttp import web
+
+        self.stats["pages"] += 1
+        self.stats["bytes"] += len(body)
+        return web.Response(text=body, content_type="text/html", charset="utf-8")
+
+    def product(self, product_id: int) -> Dict[str, Any]:
+        """
+        Данные товара по номеру (одинаковые при каждом обращении)
+
+        Args:
+            product_id (int): Номер товара
+
+        Returns:
+            Dict[str, Any]: Название, цена, характеристики и т.д.
+        """
+        rnd = random.Random(self.config.seed * 1_000_003 + product_id)
+        kind, category = KINDS[product_id % len(KINDS)]
+        brand = rnd.choice(BRANDS)
+        memory = rnd.choice([64, 128, 256, 512])
+        ram = rnd.choice([4, 6, 8, 12, 16])
+        model = f"{brand[:2].upper()}-{product_id:05d}"
+        return {
+            "id": product_id,
+            "category": category,
+            "title": f"{kind} {brand} {model} {ram}/{memory}GB",
+            "brand": brand,
+            "model": model,
+            "price": rnd.randrange(1999, 89999, 10),
+            "old_price": rnd.randrange(90000, 99999, 10) if rnd.random() < 0.3 else None,
+            "available": rnd.random() > 0.15,
+            "description": (
+                f"{kind} {brand} {model} з екраном {rnd.choice(['6.1', '6.7', '14.0', '15.6', '55'])} дюйма, "
+                f"{ram} ГБ оперативної пам'яті та {memory} ГБ вбудованої пам'яті. "
+                f"Камера {rnd.choice([12, 48, 50, 108])} Мп, акумулятор {rnd.randrange(3000, 6000, 100)} мАч. "
+                f"Колір: {rnd.choice(COLORS)}."
+            ),
+            "specifications": {
+                "Оперативна пам'ять": f"{ram} ГБ",
+                "Вбудована пам'ять": f"{memory} ГБ",
+                "Виробник": brand,
+                "Модель": model,
+                "Гарантія": f"{rnd.choice([12, 24])} місяців",
+            },
+            "images": [f"/image/catalog/{product_id}-{i}.jpg" for i in range(rnd.randint(2, 6))],
+        }
+
+    def _related(self, product_id: int, size: int, template: str) -> str:
+        """Блок похожих товаров, добивающий страницу до заданного размера"""
+        parts = []
+        total = 0
+        offset = 1
+        while total < size:
+            related = self.product((product_id + offset) % self.config.products + 1)
+            price = f"{related['price']:,}".replace(",", " ")
+            part = template.format(id=related["id"], title=html.escape(related["title"]), price=price)
+            parts.append(part)
+            total += len(part)
+            offset += 1
+        return "\n".join(parts)
+
+    def _padding(self, page: str, product_id: int, template: str) -> str:
+        missing = self.config.page_size_kb * 1024 - len(page.encode("utf-8"))
+        return self._related(product_id, missing, template) if missing > 0 else ""
+
+    # LUGI
+
+    async def lugi_product(self, request):
+        if await self._delay():
+            return self._error()
+        product = self.product(int(request.match_info["id"]))
+        price = f"{product['price']:,}".replace(",", " ")
+        specs = "\n".join(f"<tr><td>{html.escape(name)}</td><td>{html.escape(value)}</td></tr>"
+                          for name, value in product["specifications"].items())
+        images = "\n".join(f'<img src="{src}" data-additional-hover="{src}">' for src in product["images"][1:])
+        page = f"""<!DOCTYPE html>
+<html lang="uk"><head><meta charset="UTF-8"><title>{html.escape(product['title'])} — LUGI</title></head>
+<body class="product-product-{product['id']}">
+<header><div id="logo"><a href="/lugi/">LUGI</a></div><div id="cart">0 товарів - 0 грн</div></header>
+<div class="container">
+  <div class="row">
+    <div class="image"><a href="{product['images'][0]}"><img src="{product['images'][0]}"></a></div>
+    <div class="additional-images">{images}</div>
+    <h1 class="product-name">{html.escape(product['title'])}</h1>
+    <ul class="list-unstyled"><li>Модель: {product['model']}</li><li>Виробник: {product['brand']}</li></ul>
+    <div class="price"><span class="autocalc-product-price">{price} грн</span></div>
+    <div class="stock-status">{'В наявності' if product['available'] else 'Немає в наявності'}</div>
+    <div id="product">
+      <input type="hidden" name="product_id" value="{product['id']}">
+      <button type="button" id="button-cart" class="btn{'' if product['available'] else ' disabled'}">Купити</button>
+    </div>
+  </div>
+  <div id="tab-description"><p>{html.escape(product['description'])}</p></div>
+  <div id="tab-specification"><table>{specs}</table></div>
+  <div class="row related">
+{{related}}
+  </div>
+</div>
+<footer><p>LUGI © 2024</p></footer>
+</body></html>
+"""
+        related = self._padding(page, product["id"], (
+            '<div class="product-thumb"><div class="image"><a href="/lugi/product/{id}/">'
+            '<img src="/image/cache/{id}.jpg"></a></div><div class="caption"><h4>'
+            '<a href="/lugi/product/{id}/">{title}</a></h4><p class="price">{price} грн</p></div></div>'
+        ))
+        return self._html(page.replace("{related}", related))
+
+    async def lugi_search(self, request):
+        if await self._delay():
+            return self._error()
+        query = request.query.get("search", "")
+        start = sum(map(ord, query)) % self.config.products
+        cards = []
+        for offset in range(20):
+            product = self.product((start + offset) % self.config.products + 1)
+            cards.append(
+                f'<div class="product-layout"><div class="image"><a href="/lugi/product/{product["id"]}/">'
+                f'<img src="{product["images"][0]}"></a></div><div class="product-name">'
+                f'<a href="/lugi/product/{product["id"]}/">{html.escape(product["title"])}</a></div>'
+                f'<p class="price">{product["price"]} грн</p></div>'
+            )
+        return self._html(
+            f'<!DOCTYPE html><html lang="uk"><head><meta charset="UTF-8"><title>Пошук - {html.escape(query)}</title>'
+            f'</head><body><div id="content">{"".join(cards)}</div></body></html>'
+        )
+
+    # Rozetka
+
+    async def rozetka_product(self, request):
+        if await self._delay():
+            return self._error()
+        product = self.product(int(request.match_info["id"]))
+        price = f"{product['price']:,}".replace(",", "&nbsp;")
+        specs = "\n".join(
+            f'<li class="characteristics-full__item"><dt class="characteristics-full__name">{html.escape(name)}</dt>'
+            f'<dd class="characteristics-full__value">{html.escape(value)}</dd></li>'
+            for name, value in product["specifications"].items()
+        )
+        images = "".join(f'<img src="{self.base_url or ""}{src}">' for src in product["images"])
+        status = ('<p class="product-status--available">Є в наявності</p>' if product["available"]
+                  else '<p class="product-status--unavailable">Немає в наявності</p>')
+        page = f"""<!DOCTYPE html>
+<html lang="uk"><head><meta charset="utf-8"><title>{html.escape(product['title'])} | ROZETKA</title></head>
+<body>
+<header class="header"><a href="/rozetka/">ROZETKA</a></header>
+<main class="product">
+  <h1 class="product__title">{html.escape(product['title'])}</h1>
+  <div class="product-photo"><picture class="product-photo__picture">{images}</picture></div>
+  <p class="product-price__big">{price}<span class="product-price__symbol">₴</span></p>
+  {status}
+  <div class="product-about__description"><p>{html.escape(product['description'])}</p></div>
+  <section class="characteristics-full"><ul>{specs}</ul></section>
+  <section class="offers"><ul>
+{{related}}
+  </ul></section>
+</main>
+</body></html>
+"""
+        related = self._padding(page, product["id"], (
+            '<li class="offers-item"><a class="offers-item__title" href="/rozetka/ua/{id}/p{id}/">{title}</a>'
+            '<span class="offers-item__price">{price}&nbsp;₴</span></li>'
+        ))
+        return self._html(page.replace("{related}", related))
+
+    async def rozetka_api(self, request):
+        from aiohttp import web
+
+        if await self._delay():
+            return self._error()
+        query = request.query.get("text", "")
+        try:
+            per_page = max(1, min(int(request.query.get("per_page", 10)), 100))
+        except ValueError:
+            per_page = 10
+        start = sum(map(ord, query)) % self.config.products
+        goods: List[Dict[str, Any]] = []
+        for offset in range(per_page):
+            product = self.product((start + offset) % self.config.products + 1)
+            goods.append({
+                "id": product["id"],
+                "title": product["title"],
+                "price": product["price"],
+                "href": f"{self.base_url or ''}/rozetka/ua/{product['id']}/p{product['id']}/",
+                "main_image": f"{self.base_url or ''}{product['images'][0]}",
+                "sell_status": "available" if product["available"] else "unavailable",
+            })
+        self.stats["api"] += 1
+        return web.json_response({"data": {"goods": goods, "total_goods": self.config.products}},
+                                 dumps=lambda data: json.dumps(data, ensure_ascii=False))
+
+    async def image(self, request):
+        from aiohttp import web
+
+        self.stats["images"] += 1
+        return web.Response(body=PIXEL_GIF, content_type="image/gif")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический магазин для нагрузочных прогонов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--page-size-kb", type=int, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockStoreConfig(args.latency_ms, args.latency_jitter_ms, args.page_size_kb,
+                             args.error_rate, args.products, args.seed)
+
+    async def serve():
+        store = MockStore(config)
+        base_url = await store.start(args.host, args.port)
+        print(f"Синтетический магазин: {base_url}", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await store.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
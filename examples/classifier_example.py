@@ -9,7 +9,7 @@ def analyze_product(description: str, language: str = "ru"):
         description (str): Описание товара
         language (str): Язык описания ("ru" или "uk")
     """
-    # Создаем экземпляр классификатора
+    # Создаем экземпляр классификатора (модели берутся из общего реестра процесса)
     classifier = ProductClassifier(language=language)
     
     print(f"\nАнализ товара ({language.upper()}):")
@@ -22,6 +22,7 @@ def analyze_product(description: str, language: str = "ru"):
     
     # Выводим результаты
     print(f"Категория: {result['category']}")
+    print(f"Этапы: {', '.join(result['cascade']['stages'])} ({result['cascade']['reason']})")
     print("-" * 50)
     
     print("Характеристики:")
@@ -37,6 +38,10 @@ def analyze_product(description: str, language: str = "ru"):
         print(f"- {entity['text']} ({entity['type']}, уверенность: {entity['score']:.2%})")
 
 def main():
+    # Загружаем модели один раз при старте, а не при первом описании
+    for language in ("ru", "uk"):
+        ProductClassifier(language=language).warm_up()
+    
     # Пример на русском языке
     ru_description = """
     Смартфон Samsung Galaxy S21 с экраном 6.2 дюйма, 
@@ -1,49 +1,91 @@
+"""
+Парсинг страниц товаров по URL.
+
+Пример:
+    python main.py https://lugi.com.ua/... https://rozetka.com.ua/...
+    python main.py --list
+    python main.py --metrics metrics.prom https://lugi.com.ua/...
+
+Импортируются только парсеры магазинов из переданных URL; браузер и
+HTTP-клиент загружаются, когда парсер начинает работу. Браузер один на все
+магазины, парсер и контекст браузера - один на магазин.
+"""
+import argparse
 import asyncio
-from LUGIParser import LUGIParser
+import json
 import logging
+import sys
+from typing import Dict, List, Optional
+
+from parsers.registry import stores
+from parsers.resilience import Resilience
+from parsers.router import ParserRouter
+from utils.metrics import metrics
+from utils.slow_pages import SlowPageCapture
+
+
+async def parse_urls(urls: List[str], max_concurrency: int = 4, per_store_concurrency: int = 8,
+                     slow_pages: Optional[SlowPageCapture] = None,
+                     url_timeout: Optional[float] = 180.0) -> List[Dict]:
+    """
+    Парсит страницы товаров: URL группируются по магазинам, на магазин - один парсер,
+    на все магазины - один браузер
+
+    Args:
+        urls (List[str]): URL страниц товаров
+        max_concurrency (int): Сколько магазинов обрабатывать одновременно
+        per_store_concurrency (int): Сколько страниц одного магазина загружать одновременно (не больше)
+        slow_pages (Optional[SlowPageCapture]): Захват пакетов для медленных страниц
+        url_timeout (Optional[float]): Срок на URL со всеми повторами, секунды; None - без срока
+
+    Returns:
+        List[Dict]: Результаты по порядку URL ({"url", "store", "product"} или {"url", "store", "error"})
+    """
+    async with ParserRouter(max_concurrency=max_concurrency, per_store_concurrency=per_store_concurrency,
+                            slow_pages=slow_pages, resilience=Resilience(url_timeout=url_timeout)) as router:
+        return await router.parse_urls(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Парсинг страниц товаров интернет-магазинов")
+    parser.add_argument("urls", nargs="*", help="URL страниц товаров")
+    parser.add_argument("--list", action="store_true", help="Показать поддерживаемые магазины")
+    parser.add_argument("--concurrency", type=int, default=4, help="Сколько магазинов обрабатывать одновременно")
+    parser.add_argument("--per-store", type=int, default=8,
+                        help="Сколько страниц одного магазина загружать одновременно (не больше; "
+                             "нагрузку подстраивает адаптивный лимит домена), по умолчанию 8")
+    parser.add_argument("--url-timeout", type=float, default=180.0,
+                        help="Срок на URL со всеми повторами, секунды; 0 - без срока")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Записать замеры этапов: *.prom - формат Prometheus, иначе JSON")
+    parser.add_argument("--slow-pages", metavar="DIR",
+                        help="Сохранять диагностические пакеты страниц дольше --slow-seconds")
+    parser.add_argument("--slow-seconds", type=float, default=10.0, help="Порог медленной страницы, секунды")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Подробное логирование")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if args.list:
+        for entry in stores():
+            print(f"{entry.name}: {', '.join(entry.domains)}")
+        return
+    if not args.urls:
+        parser.error("Укажите хотя бы один URL")
+
+    if args.metrics:
+        metrics.enable()
+    slow_pages = SlowPageCapture(args.slow_pages, latency_seconds=args.slow_seconds) if args.slow_pages else None
+    results = asyncio.run(parse_urls(args.urls, args.concurrency, args.per_store, slow_pages,
+                                    args.url_timeout or None))
+    if args.metrics:
+        metrics.write(args.metrics)
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    print()
 
-# Настраиваем логирование
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-
-async def main():
-    parser = LUGIParser()
-    search_query = "LUGI"
-    products = await parser.search_products(search_query)
-    
-    print(f"Найдено {len(products)} товаров:")
-    for product in products:
-        print(f"Название: {product['name']}")
-        print(f"URL: {product['url']}")
-        print(f"Цена: {product['price']}")
-        print("-" * 50)
-    
-    # Парсим первый продукт для примера
-    if products:
-        url = products[0]['url']
-        print(f"\nПарсим информацию о продукте: {url}")
-        product = await parser.parse_product_page(url)
-        
-        # Логируем весь объект product
-        logging.info("Полная информация о продукте:")
-        logging.info(product)
-        
-        print("\nПодробная информация о продукте:")
-        print(f"Название: {product['name']}")
-        print(f"Цена: {product['price']}")
-        print(f"Описание: {product['description']}")
-        print(f"Характеристики: {product['specifications']}")
-        print(f"Изображения: {product['images']}")
-        print(f"Доступность: {product['availability']}")
-        print(f"Артикул: {product['sku']}")
-        print(f"Категория: {product['category']}")
-        print(f"Бренд: {product['brand']}")
-        print(f"Рейтинг: {product['rating']}")
-        print(f"Количество отзывов: {product['reviews_count']}")
-        print(f"URL: {product['url']}")
-        print(f"Дополнительная информация: {product['additional_info']}")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    main()
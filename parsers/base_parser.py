@@ -1,13 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
-import aiohttp
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 import asyncio
-from bs4 import BeautifulSoup
+import contextvars
+import logging
+import random
 import re
+from contextlib import AsyncExitStack, asynccontextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from fake_useragent import UserAgent
-from playwright.async_api import async_playwright, Page, Browser, BrowserContext
+
+from parsers.browser_pool import DEFAULT_FINGERPRINTS, ContextPool, Fingerprint, create_context
+from parsers.dom import DomNode, parse_html
+from parsers.normalize import clean_text, parse_price
+from parsers.rate_control import RateConfig, RateLimitedSession, Slot, is_block_page, rate_controller
+from parsers.replay import REPLAY, create_session, network_mode
+from parsers.resilience import classify_error, record_failure
+from utils.metrics import metrics
+from utils.slow_pages import current_capture
+
+logger = logging.getLogger('parser')
+
+# Разрешение домена для страницы, открытой в текущей задаче (_page(url)); в него _goto пишет ошибку навигации
+_page_slot: contextvars.ContextVar[Optional[Slot]] = contextvars.ContextVar("parser_page_slot", default=None)
 
 @dataclass
 class ProductPrice:
@@ -26,79 +40,285 @@ class ProductInfo:
     specifications: Dict[str, str] = None
 
 class BaseParser(ABC):
+    # DOM-бэкенд для разбора страниц: "bs4" или "lxml" (см. parsers/dom.py)
+    DOM_BACKEND = "bs4"
+    # Парсер BeautifulSoup для бэкенда "bs4"
+    HTML_FEATURES = "lxml"
+    # Регионы страницы товара (простые селекторы), которые нужны экстрактору;
+    # None - разбирать страницу целиком
+    PRODUCT_REGIONS: Optional[Tuple[str, ...]] = None
+    # Нужен ли парсеру браузер (False - только HTTP); по нему ParserRouter решает, прогревать ли контексты
+    USES_BROWSER = True
+    # Имя магазина в метриках (utils.metrics); None - имя класса без "Parser".
+    # ParserRouter подставляет имя из реестра магазинов
+    STORE_NAME: Optional[str] = None
+    # Адаптивный предел одновременных запросов к домену магазина (parsers.rate_control); None - без ограничения
+    RATE_LIMIT: Optional[RateConfig] = RateConfig()
+
+    # Аргументы запуска Chromium, если парсер запускает браузер сам
+    BROWSER_ARGS = [
+        '--disable-blink-features=AutomationControlled',  # Отключаем определение автоматизации
+        '--disable-dev-shm-usage',  # Исправляем проблемы с памятью в Docker
+        '--no-sandbox',  # Отключаем песочницу для производительности
+        '--disable-setuid-sandbox',
+        '--disable-gpu',  # Отключаем GPU для стабильности
+        '--disable-infobars',  # Отключаем информационные сообщения
+        '--window-size=1920,1080',  # Устанавливаем размер окна
+        '--start-maximized',  # Максимизируем окно
+        '--ignore-certificate-errors',  # Игнорируем ошибки сертификатов
+    ]
+
     def __init__(self):
-        self.ua = UserAgent()
+        self._ua = None
         self.session = None
         self.browser = None
         self.context = None
         self.playwright = None
+        # Внешний источник браузера (ParserRouter): корутина, возвращающая общий Browser
+        self._browser_provider: Optional[Callable[[], Awaitable[Any]]] = None
+        # Общий пул готовых контекстов: страницы берутся из него вместо собственного контекста
+        self.context_pool: Optional[ContextPool] = None
+        # Профиль собственного контекста; None - один из DEFAULT_FINGERPRINTS
+        self.fingerprint: Optional[Fingerprint] = None
+        self._entered = False
+        self._context_lock: Optional[asyncio.Lock] = None
+        self.store_name = self.STORE_NAME or re.sub(r"parser$", "", type(self).__name__.lower())
+        # Пределы по доменам; общие для всех парсеров процесса
+        self.rate_controller = rate_controller
     
-    async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
-        self.playwright = await async_playwright().start()
-        
-        # Запускаем браузер с дополнительными параметрами
-        self.browser = await self.playwright.chromium.launch(
-            headless=True,  # Запускаем в headless режиме
-            args=[
-                '--disable-blink-features=AutomationControlled',  # Отключаем определение автоматизации
-                '--disable-dev-shm-usage',  # Исправляем проблемы с памятью в Docker
-                '--no-sandbox',  # Отключаем песочницу для производительности
-                '--disable-setuid-sandbox',
-                '--disable-gpu',  # Отключаем GPU для стабильности
-                '--disable-infobars',  # Отключаем информационные сообщения
-                '--window-size=1920,1080',  # Устанавливаем размер окна
-                '--start-maximized',  # Максимизируем окно
-                '--ignore-certificate-errors',  # Игнорируем ошибки сертификатов
-            ]
-        )
-        
-        # Создаем контекст с дополнительными параметрами
-        self.context = await self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            user_agent=self.ua.random,
-            ignore_https_errors=True,
-            java_script_enabled=True,
-            bypass_csp=True,  # Отключаем CSP для обхода некоторых ограничений
-            extra_http_headers={
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0'
-            }
-        )
-        
-        # Устанавливаем параметры геолокации для Украины (Киев)
-        await self.context.set_geolocation({"latitude": 50.4501, "longitude": 30.5234})
-        
-        # Устанавливаем разрешения
-        await self.context.grant_permissions(['geolocation'])
-        
-        # Эмулируем устройство
-        await self.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
+    @property
+    def ua(self):
+        """
+        Генератор User-Agent. fake_useragent читает свою базу при создании,
+        поэтому он создается при первом обращении, а не в конструкторе.
+        """
+        if self._ua is None:
+            from fake_useragent import UserAgent
+            self._ua = UserAgent()
+        return self._ua
+    
+    def use_browser(self, provider: Callable[[], Awaitable[Any]]):
+        """
+        Брать браузер у внешнего владельца вместо запуска своего.
+        Парсер создаст в нем только собственный контекст и закроет только его.
+        
+        Args:
+            provider (Callable[[], Awaitable[Browser]]): Корутина, возвращающая запущенный браузер
+        """
+        self._browser_provider = provider
+    
+    def use_context_pool(self, pool: ContextPool):
+        """
+        Брать страницы из пула заранее настроенных контекстов
         
+        Args:
+            pool (ContextPool): Пул контекстов
+        """
+        self.context_pool = pool
+    
+    async def __aenter__(self):
+        # Браузер и HTTP-сессия создаются при первом обращении (_page, _http_session):
+        # парсер, работающий только через HTTP, браузер не запускает
+        self._entered = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def close(self):
+        """Закрывает HTTP-сессию, контекст и (если парсер запускал его сам) браузер"""
+        self._entered = False
         if self.session:
             await self.session.close()
+            self.session = None
         if self.context:
             await self.context.close()
+            self.context = None
         if self.browser:
             await self.browser.close()
+            self.browser = None
         if self.playwright:
             await self.playwright.stop()
+            self.playwright = None
+    
+    async def _get_browser(self):
+        """Общий браузер от внешнего владельца или собственный, запускаемый при первом обращении"""
+        if self._browser_provider is not None:
+            return await self._browser_provider()
+        if self.browser is None:
+            with self._stage("browser_launch"):
+                from playwright.async_api import async_playwright
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(
+                    headless=True,  # Запускаем в headless режиме
+                    args=self.BROWSER_ARGS
+                )
+        return self.browser
+    
+    async def _new_context(self, browser):
+        """Создает контекст браузера с профилем парсера"""
+        with self._stage("context_create"):
+            return await create_context(browser, self.fingerprint or random.choice(DEFAULT_FINGERPRINTS))
+    
+    async def _ensure_context(self):
+        """Контекст браузера парсера; создается при первом обращении и переиспользуется"""
+        if self.context is None:
+            if self._context_lock is None:
+                self._context_lock = asyncio.Lock()
+            async with self._context_lock:
+                if self.context is None:
+                    self.context = await self._new_context(await self._get_browser())
+        return self.context
+    
+    @property
+    def _rate_limited(self) -> bool:
+        # Записанные ответы (PARSER_NETWORK_MODE=replay) не говорят о нагрузке на магазин
+        return self.RATE_LIMIT is not None and network_mode() != REPLAY
+    
+    @asynccontextmanager
+    async def _page(self, url: Optional[str] = None):
+        """
+        Новая страница в контексте парсера; закрывается после блока.
+        С пулом контекстов страница открывается в контексте, взятом из пула на время блока.
+        Вне async with парсер поднимает браузер на время блока и затем закрывает его.
+        
+        Args:
+            url (Optional[str]): URL, который будет загружен на странице. С ним страница
+                открывается в пределах лимита домена (RATE_LIMIT), а статус навигации,
+                ошибки навигации (_goto) и редирект на капчу подстраивают этот лимит
+        """
+        if url is None or not self._rate_limited:
+            async with self._open_page() as page:
+                yield page
+            return
+        
+        limiter = self.rate_controller.limiter(url, self.RATE_LIMIT)
+        slot = await limiter.acquire()
+        token = _page_slot.set(slot)
+        try:
+            async with self._open_page() as page:
+                slot.watch(page)
+                yield page
+                if is_block_page(page.url):
+                    slot.blocked = True
+        except asyncio.CancelledError as e:
+            # Отмененная страница не считается ни успехом, ни перегрузкой
+            if slot.error is None:
+                slot.fail(e)
+            raise
+        finally:
+            _page_slot.reset(token)
+            # Исключение из блока (например, таймаут wait_for_selector) предел не снижает -
+            # только ошибка, записанная при навигации
+            limiter.release(slot, slot.error)
+    
+    async def _goto(self, page, url: str, **kwargs):
+        """
+        page.goto, ошибка которого (таймаут, обрыв соединения) учитывается в лимите домена
+        и в повторах (parsers.resilience). Ошибки после навигации так не учитываются
+        
+        Args:
+            page: Страница из _page(url)
+            url (str): URL
+            **kwargs: Параметры page.goto (wait_until, timeout, ...)
+            
+        Returns:
+            Ответ навигации playwright
+        """
+        try:
+            return await page.goto(url, **kwargs)
+        except Exception as e:
+            slot = _page_slot.get()
+            if slot is not None:
+                # Лимит домена снизит предел и отметит ошибку в попытке при освобождении
+                slot.fail(e)
+            else:
+                kind = classify_error(e)
+                if kind is not None:
+                    record_failure(kind)
+            raise
+    
+    @asynccontextmanager
+    async def _open_page(self):
+        if self.context_pool is not None:
+            async with AsyncExitStack() as stack:
+                # Ожидание свободного контекста в пуле - отдельный этап
+                with self._stage("page_open"):
+                    page = await stack.enter_async_context(self.context_pool.page())
+                async with self._captured(page):
+                    yield page
+            return
+        
+        if not self._entered:
+            async with self:
+                async with self._open_page() as page:
+                    yield page
+            return
+        
+        context = await self._ensure_context()
+        with self._stage("page_open"):
+            page = await context.new_page()
+        try:
+            async with self._captured(page):
+                yield page
+        finally:
+            await page.close()
+    
+    @asynccontextmanager
+    async def _captured(self, page):
+        """
+        При захвате медленных страниц (utils.slow_pages) пишет запросы страницы в журнал,
+        а после блока сохраняет ее HTML, если парсер не разбирал HTML сам
+        """
+        capture = current_capture()
+        if capture is None:
+            yield
+            return
+        capture.watch(page)
+        try:
+            yield
+        finally:
+            if capture.html is None:
+                try:
+                    capture.html = await page.content()
+                except Exception:
+                    pass
+    
+    @asynccontextmanager
+    async def _http_session(self):
+        """
+        HTTP-сессия парсера с заголовками self.headers (если они заданы).
+        Внутри async with сессия (и ее пул соединений) общая для всех запросов парсера,
+        вне его создается на время блока. В режимах record/replay (PARSER_NETWORK_MODE)
+        это сессия parsers.replay с тем же интерфейсом. Запросы идут в пределах
+        адаптивного лимита домена (RATE_LIMIT, parsers.rate_control).
+        """
+        if not self._entered:
+            async with create_session(getattr(self, "headers", None)) as session:
+                yield self._limited_session(session)
+            return
+        
+        if self.session is None:
+            self.session = create_session(getattr(self, "headers", None))
+        yield self._limited_session(self.session)
+    
+    def _limited_session(self, session):
+        """Сессия, запросы которой идут в пределах лимита домена (RATE_LIMIT)"""
+        if not self._rate_limited:
+            return session
+        return RateLimitedSession(session, self.rate_controller, self.RATE_LIMIT)
+    
+    def _report_block(self, url: str):
+        """
+        Сообщает, что магазин вернул страницу блокировки (капчу) на запрос к url:
+        лимит домена снижается, новые запросы ждут паузы
+        
+        Args:
+            url (str): URL запроса
+        """
+        logger.warning(f"Страница блокировки: {url}")
+        if self.RATE_LIMIT is not None:
+            self.rate_controller.limiter(url, self.RATE_LIMIT).penalize("blocked")
     
     @abstractmethod
     async def parse_product_page(self, url: str) -> ProductInfo:
@@ -127,39 +347,69 @@ class BaseParser(ABC):
         """
         pass
     
-    async def _get_page(self, url: str) -> Optional[BeautifulSoup]:
+    def parse_dom(self, html: str, regions: Optional[Sequence[str]] = None) -> DomNode:
+        """
+        Разбирает HTML DOM-бэкендом, заданным в конфигурации магазина
+        
+        Args:
+            html (str): HTML страницы
+            regions (Optional[Sequence[str]]): Регионы, которыми ограничить разбор
+                (обычно PRODUCT_REGIONS); None - вся страница
+            
+        Returns:
+            DomNode: Корень документа
+        """
+        capture = current_capture()
+        if capture is not None:
+            capture.html = html
+        with self._stage("dom_parse"):
+            return parse_html(html, self.DOM_BACKEND, self.HTML_FEATURES, regions)
+    
+    def _stage(self, stage: str):
+        """
+        Замер этапа обработки с меткой магазина (utils.metrics); работает и вокруг await.
+        Пока метрики выключены, возвращает общий пустой контекстный менеджер
+        
+        Args:
+            stage (str): Этап (goto, content, dom_parse, ...)
+        """
+        return metrics.span(stage, store=self.store_name)
+    
+    async def _get_page(self, url: str) -> Optional[DomNode]:
         """
-        Загружает страницу и создает объект BeautifulSoup
+        Загружает страницу и разбирает ее DOM-бэкендом магазина
         
         Args:
             url (str): URL страницы
             
         Returns:
-            Optional[BeautifulSoup]: Объект BeautifulSoup или None в случае ошибки
+            Optional[DomNode]: Корень документа или None в случае ошибки
         """
         try:
-            page = await self.context.new_page()
-            
-            # Устанавливаем обработчики для диалоговых окон
-            page.on("dialog", lambda dialog: asyncio.create_task(dialog.dismiss()))
-            
-            # Отключаем загрузку изображений и стилей для ускорения
-            await page.route("**/*.{png,jpg,jpeg,gif,svg,css,woff,woff2}", lambda route: route.abort())
-            
-            # Загружаем страницу с таймаутом
-            await page.goto(url, wait_until='networkidle', timeout=30000)
-            
-            # Прокручиваем страницу для загрузки динамического контента
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(2)
-            
-            # Получаем HTML
-            html = await page.content()
-            await page.close()
+            async with self._page(url) as page:
+                # Устанавливаем обработчики для диалоговых окон
+                page.on("dialog", lambda dialog: asyncio.create_task(dialog.dismiss()))
+                
+                # Отключаем загрузку изображений и стилей для ускорения
+                await page.route("**/*.{png,jpg,jpeg,gif,svg,css,woff,woff2}", lambda route: route.abort())
+                
+                # Загружаем страницу с таймаутом
+                with self._stage("goto"):
+                    await self._goto(page, url, wait_until='networkidle', timeout=30000)
+                
+                # Прокручиваем страницу для загрузки динамического контента
+                with self._stage("settle"):
+                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                    await asyncio.sleep(2)
+                
+                # Получаем HTML
+                with self._stage("content"):
+                    html = await page.content()
             
-            return BeautifulSoup(html, 'lxml')
+            return self.parse_dom(html)
         except Exception as e:
-            print(f"Ошибка при загрузке страницы {url}: {e}")
+            # Таймауты и обрывы уже отмечены в попытке (_page), их повторит parsers.resilience
+            logger.error(f"Ошибка при загрузке страницы {url}: {e}")
             return None
     
     @staticmethod
@@ -173,51 +423,21 @@ class BaseParser(ABC):
         Returns:
             str: Очищенный текст
         """
-        if not text:
-            return ""
-        return re.sub(r'\s+', ' ', text.strip())
+        return clean_text(text)
     
     @staticmethod
-    def extract_price(text: str) -> Optional[ProductPrice]:
+    def extract_price(text: str, default_currency: str = "") -> Optional[ProductPrice]:
         """
-        Извлекает цену из текста
+        Извлекает цену из текста (см. parsers.normalize.parse_price)
         
         Args:
             text (str): Текст с ценой
+            default_currency (str): Валюта, если в тексте ее нет
             
         Returns:
             Optional[ProductPrice]: Объект с ценой или None
         """
-        if not text:
+        price = parse_price(text, default_currency)
+        if price is None:
             return None
-            
-        # Ищем число с разделителем тысяч и копеек
-        price_match = re.search(r'([\d\s.,]+)\s*(₴|грн|₽|руб|$|€|UAH|RUB|USD|EUR)', text)
-        if price_match:
-            # Очищаем число от пробелов и правильно обрабатываем разделители
-            price_str = re.sub(r'[^\d.,]', '', price_match.group(1))
-            price_str = price_str.replace(',', '.')
-            
-            # Конвертируем в число
-            try:
-                price = float(price_str)
-                currency = price_match.group(2)
-                
-                # Нормализуем валюту
-                currency_map = {
-                    '₴': 'UAH',
-                    'грн': 'UAH',
-                    '₽': 'RUB',
-                    'руб': 'RUB',
-                    '$': 'USD',
-                    '€': 'EUR'
-                }
-                
-                return ProductPrice(
-                    value=price,
-                    currency=currency_map.get(currency, currency)
-                )
-            except ValueError:
-                return None
-                
-        return None 
\ No newline at end of file
+        return ProductPrice(value=price[0], currency=price[1]) 
\ No newline at end of file
@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from parsers.replay import attach_to_context
+from utils.metrics import EVENTS_METRIC, metrics
+
+logger = logging.getLogger('parser')
+
+# Скрывает признак автоматизации в navigator
+HIDE_WEBDRIVER_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+"""
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0'
+}
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Согласованный набор настроек контекста браузера: один и тот же профиль переиспользуется"""
+    user_agent: str
+    locale: Optional[str] = "uk-UA"
+    accept_language: str = "uk-UA,uk;q=0.9,ru;q=0.8,en-US;q=0.6,en;q=0.5"
+    timezone_id: Optional[str] = "Europe/Kyiv"
+    # Киев
+    geolocation: Optional[Tuple[float, float]] = (50.4501, 30.5234)
+    viewport: Tuple[int, int] = (1920, 1080)
+    headers: Tuple[Tuple[str, str], ...] = tuple(DEFAULT_HEADERS.items())
+    init_scripts: Tuple[str, ...] = (HIDE_WEBDRIVER_SCRIPT,)
+
+    def context_options(self) -> Dict[str, Any]:
+        """Параметры browser.new_context()"""
+        options = {
+            "viewport": {"width": self.viewport[0], "height": self.viewport[1]},
+            "user_agent": self.user_agent,
+            "ignore_https_errors": True,
+            "java_script_enabled": True,
+            "bypass_csp": True,  # Отключаем CSP для обхода некоторых ограничений
+            "extra_http_headers": {**dict(self.headers), "Accept-Language": self.accept_language},
+        }
+        if self.locale:
+            options["locale"] = self.locale
+        if self.timezone_id:
+            options["timezone_id"] = self.timezone_id
+        if self.geolocation:
+            latitude, longitude = self.geolocation
+            options["geolocation"] = {"latitude": latitude, "longitude": longitude}
+            options["permissions"] = ["geolocation"]
+        return options
+
+
+DEFAULT_FINGERPRINTS: Tuple[Fingerprint, ...] = (
+    Fingerprint("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/124.0.0.0 Safari/537.36"),
+    Fingerprint("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/124.0.0.0 Safari/537.36", viewport=(1680, 1050)),
+    Fingerprint("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/124.0.0.0 Safari/537.36", viewport=(1600, 900)),
+)
+
+
+async def create_context(browser, fingerprint: Fingerprint):
+    """
+    Создает полностью настроенный контекст: геолокация и разрешения передаются
+    параметрами new_context, поэтому отдельные вызовы остаются только для init-скриптов.
+    В режимах record/replay (PARSER_NETWORK_MODE) сеть контекста перехватывается parsers.replay
+
+    Args:
+        browser: Браузер playwright
+        fingerprint (Fingerprint): Профиль контекста
+
+    Returns:
+        BrowserContext: Контекст
+    """
+    context = await browser.new_context(**fingerprint.context_options())
+    for script in fingerprint.init_scripts:
+        await context.add_init_script(script)
+    await attach_to_context(context)
+    return context
+
+
+@dataclass(eq=False)
+class PooledContext:
+    """Контекст пула и его счетчики"""
+    context: Any
+    fingerprint: Fingerprint
+    # Браузер, в котором создан контекст (для пересоздания браузера целиком)
+    browser: Any = None
+    created_at: float = field(default_factory=time.monotonic)
+    pages_served: int = 0
+    js_heap_mb: Optional[float] = None
+    # Причина вывода из пула; контекст закрывается после возврата
+    retire_reason: Optional[str] = None
+
+
+class ContextPool:
+    """
+    Пул заранее настроенных контекстов браузера.
+
+    Пул держит size контекстов (свободных и выданных); недостающие строятся
+    в фоне, поэтому получение контекста не ждет new_context и init-скриптов,
+    а когда все контексты выданы - ждет возврата одного из них. Контекст выдается
+    в монопольное пользование (lease) и после возврата проверяется: отслужив
+    max_pages страниц или превысив max_js_heap_mb, он закрывается в фоне,
+    а на его место строится новый.
+    """
+
+    def __init__(self, browser_provider: Callable[[], Awaitable[Any]], size: int = 2,
+                 max_pages: int = 50, max_js_heap_mb: Optional[float] = 512.0, heap_sample_every: int = 5,
+                 fingerprints: Sequence[Fingerprint] = DEFAULT_FINGERPRINTS):
+        """
+        Args:
+            browser_provider (Callable[[], Awaitable[Browser]]): Корутина, возвращающая браузер
+            size (int): Сколько контекстов держит пул (обычно равно числу одновременных страниц)
+            max_pages (int): После скольких страниц контекст пересоздается
+            max_js_heap_mb (Optional[float]): Порог JS-кучи страницы, МБ; None - не проверять
+            heap_sample_every (int): Проверять кучу на каждой N-й странице контекста
+            fingerprints (Sequence[Fingerprint]): Профили, по кругу назначаемые новым контекстам
+        """
+        if not fingerprints:
+            raise ValueError("Нужен хотя бы один профиль контекста")
+        self.browser_provider = browser_provider
+        self.size = size
+        self.max_pages = max_pages
+        self.max_js_heap_mb = max_js_heap_mb
+        self.heap_sample_every = max(1, heap_sample_every)
+        self.fingerprints = list(fingerprints)
+
+        self._idle: List[PooledContext] = []
+        self._leased: set = set()
+        self._available = asyncio.Condition()
+        self._building = 0
+        self._build_error: Optional[BaseException] = None
+        self._next_fingerprint = 0
+        self._tasks: set = set()
+        self._closed = False
+        self._stats = Counter()
+
+    async def start(self) -> "ContextPool":
+        """Запускает фоновое построение контекстов (не дожидаясь их)"""
+        self._fill()
+        return self
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _spawn(self, coroutine: Awaitable):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _fill(self):
+        """Достраивает контексты до size (с учетом выданных и строящихся)"""
+        while not self._closed and len(self._idle) + len(self._leased) + self._building < self.size:
+            self._building += 1
+            self._spawn(self._build())
+
+    async def _build(self):
+        try:
+            fingerprint = self.fingerprints[self._next_fingerprint % len(self.fingerprints)]
+            self._next_fingerprint += 1
+            started = time.perf_counter()
+            browser = await self.browser_provider()
+            with metrics.span("context_create"):
+                context = await create_context(browser, fingerprint)
+            self._stats["created"] += 1
+            self._stats["build_ms_total"] += int((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            logger.error(f"Не удалось создать контекст браузера: {e}")
+            self._stats["build_errors"] += 1
+            async with self._available:
+                self._building -= 1
+                self._build_error = e
+                self._available.notify_all()
+            return
+
+        async with self._available:
+            self._building -= 1
+            if self._closed:
+                self._spawn(context.close())
+                return
+            self._idle.append(PooledContext(context, fingerprint, browser))
+            self._available.notify()
+
+    async def acquire(self) -> PooledContext:
+        """
+        Берет свободный контекст в монопольное пользование; ждет, если все заняты
+
+        Returns:
+            PooledContext: Контекст пула (вернуть через release)
+        """
+        async with self._available:
+            while not self._idle:
+                if self._closed:
+                    raise RuntimeError("Пул контекстов закрыт")
+                self._fill()
+                self._stats["waits"] += 1
+                await self._available.wait()
+                if not self._idle and self._build_error is not None:
+                    error, self._build_error = self._build_error, None
+                    raise error
+            # LIFO: чаще выдается недавно использованный контекст с теплым кэшем и cookies
+            pooled = self._idle.pop()
+            self._leased.add(pooled)
+            self._stats["leases"] += 1
+        return pooled
+
+    async def release(self, pooled: PooledContext):
+        """
+        Возвращает контекст в пул или отправляет на пересоздание
+
+        Args:
+            pooled (PooledContext): Контекст, полученный через acquire
+        """
+        await self._close_pages(pooled)
+        async with self._available:
+            self._leased.discard(pooled)
+            if pooled.retire_reason is None and not self._closed:
+                self._idle.append(pooled)
+                self._available.notify()
+                return
+        self.retire(pooled, pooled.retire_reason or "closed")
+
+    def retire(self, pooled: PooledContext, reason: str):
+        """Закрывает контекст в фоне и строит замену"""
+        pooled.retire_reason = reason
+        self._stats[f"retired:{reason}"] += 1
+        metrics.inc(EVENTS_METRIC, event="context_retired", reason=reason)
+        self._spawn(self._close_context(pooled))
+        self._fill()
+
+    def drain(self, pooled: PooledContext, reason: str):
+        """
+        Выводит контекст из пула, не прерывая работу с ним: свободный закрывается сразу,
+        выданный - когда его вернут
+
+        Args:
+            pooled (PooledContext): Контекст пула
+            reason (str): Причина (попадает в счетчики retired:<reason>)
+        """
+        if pooled in self._idle:
+            self._idle.remove(pooled)
+            self.retire(pooled, reason)
+        elif pooled in self._leased and pooled.retire_reason is None:
+            pooled.retire_reason = reason
+
+    def contexts(self) -> List[PooledContext]:
+        """Все живые контексты пула: свободные и выданные"""
+        return [*self._idle, *self._leased]
+
+    async def _close_pages(self, pooled: PooledContext):
+        """Закрывает страницы, которые забыли закрыть за время аренды"""
+        try:
+            pages = list(pooled.context.pages)
+        except Exception:
+            return
+        for page in pages:
+            self._stats["leaked_pages"] += 1
+            try:
+                await page.close()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии страницы: {e}")
+
+    async def _close_context(self, pooled: PooledContext):
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии контекста браузера: {e}")
+
+    @asynccontextmanager
+    async def lease(self):
+        """Контекст на время блока (например, на одну задачу обхода)"""
+        pooled = await self.acquire()
+        try:
+            yield pooled
+        finally:
+            await self.release(pooled)
+
+    @asynccontextmanager
+    async def page(self):
+        """Страница в контексте пула; страница закрывается, контекст возвращается в пул"""
+        async with self.lease() as pooled:
+            page = await pooled.context.new_page()
+            try:
+                yield page
+            finally:
+                await self._page_done(pooled, page)
+                try:
+                    await page.close()
+                except Exception as e:
+                    logger.warning(f"Ошибка при закрытии страницы: {e}")
+
+    async def _page_done(self, pooled: PooledContext, page):
+        """Обновляет счетчики контекста и решает, пора ли его пересоздать"""
+        pooled.pages_served += 1
+        self._stats["pages"] += 1
+        if pooled.pages_served >= self.max_pages:
+            pooled.retire_reason = "pages"
+            return
+        if self.max_js_heap_mb and pooled.pages_served % self.heap_sample_every == 0:
+            pooled.js_heap_mb = await js_heap_mb(page)
+            if pooled.js_heap_mb is not None and pooled.js_heap_mb > self.max_js_heap_mb:
+                pooled.retire_reason = "memory"
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние пула и счетчики"""
+        return {
+            **self._stats,
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "building": self._building,
+        }
+
+    async def close(self):
+        """Закрывает все контексты пула; выданные закроются при возврате"""
+        async with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for pooled in idle:
+            await self._close_context(pooled)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+async def js_heap_mb(page) -> Optional[float]:
+    """
+    Занятая JS-куча страницы в МБ (performance.memory, только Chromium)
+
+    Args:
+        page: Страница playwright
+
+    Returns:
+        Optional[float]: Размер кучи или None, если измерить не удалось
+    """
+    try:
+        used = await page.evaluate("() => performance.memory ? performance.memory.usedJSHeapSize : null")
+    except Exception:
+        return None
+    return used / (1024 * 1024) if used else None
@@ -0,0 +1,282 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+# bs4 и lxml импортируются в функциях бэкендов: модуль загружает только тот бэкенд, который используется
+if TYPE_CHECKING:
+    from bs4 import SoupStrainer
+    from lxml.cssselect import CSSSelector
+
+# Теги, текст которых не попадает в get_text() у BeautifulSoup
+_SKIP_TEXT_TAGS = {"script", "style", "template"}
+# Теги, внутри которых BeautifulSoup не сворачивает пробельные строки
+_PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+_ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+
+# Простой селектор региона: tag, #id, .class и их сочетания (div#product, span.a.b)
+_REGION_RE = re.compile(r'^([a-zA-Z][\w-]*)?((?:[#.][\w-]+)*)$')
+
+
+class DomNode(ABC):
+    """
+    Тонкая обертка над элементом DOM-дерева.
+
+    Парсеры магазинов работают только через этот интерфейс, поэтому
+    бэкенд разбора (BeautifulSoup или lxml) выбирается конфигурацией.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def select_one(self, selector: str) -> Optional["DomNode"]:
+        """Первый потомок, подходящий под CSS-селектор, или None"""
+        pass
+
+    @abstractmethod
+    def select(self, selector: str) -> List["DomNode"]:
+        """Все потомки, подходящие под CSS-селектор"""
+        pass
+
+    @abstractmethod
+    def text(self, strip: bool = True) -> str:
+        """
+        Текст элемента без скриптов, стилей и комментариев
+
+        Args:
+            strip (bool): Обрезать каждый текстовый фрагмент и склеить без
+                разделителя (get_text(strip=True)); иначе вернуть текст как есть (.text)
+        """
+        pass
+
+    @abstractmethod
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Значение атрибута; многозначные атрибуты (class) склеиваются через пробел"""
+        pass
+
+
+class SoupNode(DomNode):
+    """Бэкенд на BeautifulSoup"""
+
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        self.element = element
+
+    def select_one(self, selector: str) -> Optional[DomNode]:
+        element = self.element.select_one(selector)
+        return SoupNode(element) if element is not None else None
+
+    def select(self, selector: str) -> List[DomNode]:
+        return [SoupNode(element) for element in self.element.select(selector)]
+
+    def text(self, strip: bool = True) -> str:
+        return self.element.get_text(strip=strip)
+
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.element.get(name)
+        if value is None:
+            return default
+        if isinstance(value, list):
+            return " ".join(value)
+        return value
+
+
+@lru_cache(maxsize=None)
+def compile_selector(selector: str) -> "CSSSelector":
+    """
+    Компилирует CSS-селектор в XPath один раз на процесс
+
+    Args:
+        selector (str): CSS-селектор
+
+    Returns:
+        CSSSelector: Скомпилированный селектор lxml
+    """
+    from lxml.cssselect import CSSSelector
+    return CSSSelector(selector, translator="html")
+
+
+def _bs4_string(text: str, preserve: bool) -> str:
+    """Фрагмент текста так, как его сохраняет BeautifulSoup: строка из одних пробелов сворачивается"""
+    if preserve or text.strip(_ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _lxml_text(element, parts: List[str], preserve: bool = False):
+    """Собирает текст так же, как BeautifulSoup: без комментариев, скриптов и стилей"""
+    if isinstance(element.tag, str) and element.tag not in _SKIP_TEXT_TAGS:
+        inner = preserve or element.tag in _PRESERVE_WHITESPACE_TAGS
+        if element.text:
+            parts.append(_bs4_string(element.text, inner))
+        for child in element:
+            _lxml_text(child, parts, inner)
+            if child.tail:
+                parts.append(_bs4_string(child.tail, inner))
+
+
+class LxmlNode(DomNode):
+    """Бэкенд на lxml.html с предкомпилированными селекторами cssselect"""
+
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        self.element = element
+
+    def _matches(self, selector: str):
+        # CSSSelector ищет по descendant-or-self, а BeautifulSoup - только среди потомков
+        return (element for element in compile_selector(selector)(self.element)
+                if element is not self.element)
+
+    def select_one(self, selector: str) -> Optional[DomNode]:
+        for element in self._matches(selector):
+            return LxmlNode(element)
+        return None
+
+    def select(self, selector: str) -> List[DomNode]:
+        return [LxmlNode(element) for element in self._matches(selector)]
+
+    def text(self, strip: bool = True) -> str:
+        parts = []
+        _lxml_text(self.element, parts)
+        if strip:
+            return "".join(part.strip() for part in parts if part.strip())
+        return "".join(parts)
+
+    def attr(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.element.get(name)
+        if value is None:
+            return default
+        if name == "class":
+            return " ".join(value.split())
+        return value
+
+
+@lru_cache(maxsize=None)
+def _parse_region(selector: str) -> Tuple[Optional[str], Optional[str], Tuple[str, ...]]:
+    """Разбирает простой селектор региона на (тег, id, классы)"""
+    match = _REGION_RE.match(selector.strip())
+    if not match:
+        raise ValueError(f"Регион должен быть простым селектором (tag, #id, .class): {selector}")
+    tag, rest = match.groups()
+    element_id = None
+    classes = []
+    for part in re.findall(r'[#.][\w-]+', rest):
+        if part[0] == "#":
+            element_id = part[1:]
+        else:
+            classes.append(part[1:])
+    return (tag.lower() if tag else None), element_id, tuple(classes)
+
+
+def region_strainer(regions: Sequence[str]) -> "SoupStrainer":
+    """
+    Строит SoupStrainer, который оставляет в дереве только заданные регионы.
+    Работает с beautifulsoup4 до и после 4.13 (см. _region_strainer_class;
+    обе линейки проверяет tests/test_region_strainer.py)
+
+    Args:
+        regions (Sequence[str]): Простые селекторы регионов ("#product", ".stock-status", "h1")
+
+    Returns:
+        SoupStrainer: Фильтр для параметра parse_only
+    """
+    parsed = [_parse_region(region) for region in regions]
+
+    def match(name: str, attrs: Dict) -> bool:
+        for tag, element_id, classes in parsed:
+            if tag and tag != name:
+                continue
+            if element_id and attrs.get("id") != element_id:
+                continue
+            if classes:
+                value = attrs.get("class") or ""
+                present = value.split() if isinstance(value, str) else value
+                if not all(cls in present for cls in classes):
+                    continue
+            return True
+        return False
+
+    return _region_strainer_class()(match)
+
+
+@lru_cache(maxsize=None)
+def _region_strainer_class():
+    """Класс фильтра регионов; строится при первом вызове, чтобы bs4 импортировался только с этим бэкендом"""
+    from bs4 import SoupStrainer
+
+    class RegionStrainer(SoupStrainer):
+        """
+        SoupStrainer с функцией match(name, attrs). До beautifulsoup4 4.13 такую функцию
+        вызывает сам SoupStrainer; начиная с 4.13 она получает только имя тега,
+        поэтому решение о создании тега принимается здесь, где доступны атрибуты
+        """
+
+        def __init__(self, match):
+            super().__init__(match)
+            self._match = match
+
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return self._match(name, attrs or {})
+
+    return RegionStrainer
+
+
+def _lxml_regions(document, regions: Sequence[str]):
+    """
+    Переносит в новый корень только элементы регионов (без вложенных повторов).
+    Документ к этому моменту уже разобран целиком, поэтому время разбора регионы
+    на lxml не сокращают: отбор - дополнительный проход селектора, нужный, чтобы
+    селекторы видели то же, что и на бэкенде bs4
+    """
+    from lxml import etree
+    root = etree.Element("document")
+    selected = compile_selector(", ".join(regions))(document)
+    chosen = set(selected)
+    for element in selected:
+        if any(ancestor in chosen for ancestor in element.iterancestors()):
+            continue
+        element.tail = None
+        root.append(element)
+    return root
+
+
+def parse_html(html: str, backend: str = "bs4", features: str = "html.parser",
+               regions: Optional[Sequence[str]] = None) -> DomNode:
+    """
+    Разбирает HTML выбранным бэкендом
+
+    Args:
+        html (str): HTML страницы
+        backend (str): "bs4" или "lxml"
+        features (str): Парсер BeautifulSoup (только для бэкенда "bs4")
+        regions (Optional[Sequence[str]]): Простые селекторы регионов. Если заданы,
+            в дереве остаются только эти поддеревья; шапка, меню, подвал и попапы
+            отбрасываются. Для "bs4" дерево для остальной страницы вообще не строится;
+            "lxml" разбирает страницу целиком и потом отбирает регионы.
+
+    Returns:
+        DomNode: Корень документа
+    """
+    if backend == "bs4":
+        from bs4 import BeautifulSoup
+        parse_only = region_strainer(regions) if regions else None
+        return SoupNode(BeautifulSoup(html, features, parse_only=parse_only))
+    if backend == "lxml":
+        import lxml.html
+        from lxml import etree
+        # Оборачиваем в корень-документ, чтобы селекторы находили и сам <html>
+        root = etree.Element("document")
+        if html and html.strip():
+            try:
+                document = lxml.html.document_fromstring(html)
+            except ValueError:
+                # Строка с XML-декларацией кодировки не принимается как str
+                document = lxml.html.document_fromstring(html.encode("utf-8"))
+            if regions:
+                # Остаток страницы освобождается вместе с исходным деревом
+                return LxmlNode(_lxml_regions(document, regions))
+            root.append(document)
+        return LxmlNode(root)
+    raise ValueError(f"Неизвестный DOM-бэкенд: {backend}")
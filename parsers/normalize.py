@@ -0,0 +1,187 @@
+"""
+Нормализация цен и текста, общая для всех парсеров.
+
+Шаблоны компилируются один раз при импорте. Скалярные функции кэшируют
+результаты (в каталогах одни и те же строки цен повторяются постоянно),
+пакетные сначала выделяют уникальные значения и разбирают только их.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Код валюты и шаблон ее обозначений (без учета регистра)
+CURRENCY_PATTERNS = [
+    ("UAH", r"₴|грн\.?|гривн\w*|гривен\w*|uah"),
+    ("RUB", r"₽|руб\w*\.?|rub"),
+    ("USD", r"usd|us\s?\$|\$"),
+    ("EUR", r"€|euro?"),
+]
+
+_CURRENCY = "|".join(f"(?:{pattern})" for _, pattern in CURRENCY_PATTERNS)
+_CURRENCY_CODES = [(code, re.compile(pattern, re.IGNORECASE)) for code, pattern in CURRENCY_PATTERNS]
+
+# Пробелы, которыми магазины разделяют тысячи: обычный, неразрывный, узкий неразрывный, тонкий
+_GROUP_SEPARATORS = " \u00a0\u202f\u2009'’"
+
+_NUMBER = (
+    # 1 299 / 1 299,50 / 1 299.50 - тысячи через пробел
+    rf"(?P<spaced>\d{{1,3}}(?:[{_GROUP_SEPARATORS}]\d{{3}})+(?:[.,]\d+)?)"
+    # 1,299 / 1,299.50 - тысячи через запятую
+    r"|(?P<comma>\d{1,3}(?:,\d{3})+(?:\.\d+)?)"
+    # 1.299 / 1.299,50 - тысячи через точку
+    r"|(?P<dot>\d{1,3}(?:\.\d{3})+(?:,\d+)?)"
+    # 1299 / 1299,50 / 1299.50
+    r"|(?P<plain>\d+(?:[.,]\d+)?)"
+)
+
+_PRICE_RE = re.compile(
+    rf"(?:(?<![^\W\d_])(?P<before>{_CURRENCY})\s*)?"
+    rf"(?<![\d.,])(?:{_NUMBER})(?!\d)"
+    rf"(?:\s*(?P<after>{_CURRENCY})(?![^\W\d_]))?",
+    re.IGNORECASE
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def clean_text(text: str) -> str:
+    """
+    Очищает текст от лишних пробелов и переносов строк
+
+    Args:
+        text (str): Исходный текст
+
+    Returns:
+        str: Очищенный текст
+    """
+    if not text:
+        return ""
+    return _WHITESPACE_RE.sub(" ", text.strip())
+
+
+def clean_texts(values: Iterable[str]) -> List[str]:
+    """
+    Пакетная версия clean_text
+
+    Args:
+        values (Iterable[str]): Тексты
+
+    Returns:
+        List[str]: Очищенные тексты по порядку
+    """
+    return [clean_text(value) for value in values]
+
+
+@lru_cache(maxsize=256)
+def currency_code(token: str) -> Optional[str]:
+    """
+    Код валюты по ее обозначению ("грн" -> "UAH", "$" -> "USD")
+
+    Args:
+        token (str): Обозначение валюты
+
+    Returns:
+        Optional[str]: Код ISO 4217 или None для неизвестного обозначения
+    """
+    token = token.strip()
+    for code, pattern in _CURRENCY_CODES:
+        if pattern.fullmatch(token):
+            return code
+    return None
+
+
+def _amount(match: re.Match) -> float:
+    """Число из совпадения _PRICE_RE с учетом того, какой разделитель отделяет тысячи"""
+    if match.group("spaced") is not None:
+        number = match.group("spaced")
+        for separator in _GROUP_SEPARATORS:
+            number = number.replace(separator, "")
+        return float(number.replace(",", "."))
+    if match.group("comma") is not None:
+        return float(match.group("comma").replace(",", ""))
+    if match.group("dot") is not None:
+        return float(match.group("dot").replace(".", "").replace(",", "."))
+    return float(match.group("plain").replace(",", "."))
+
+
+@lru_cache(maxsize=65536)
+def parse_price(text: str, default_currency: Optional[str] = None) -> Optional[Tuple[float, Optional[str]]]:
+    """
+    Разбирает цену с учетом местных форматов: "1 299,50 грн" -> (1299.5, "UAH"),
+    "US $1,299.99" -> (1299.99, "USD"), "1.299 ₴" -> (1299.0, "UAH").
+
+    Если в тексте несколько чисел, берется первое, рядом с которым указана валюта,
+    а если валюты нет нигде - первое число.
+
+    Args:
+        text (str): Текст с ценой
+        default_currency (Optional[str]): Валюта, если в тексте ее нет
+
+    Returns:
+        Optional[Tuple[float, Optional[str]]]: Сумма и код валюты или None, если числа нет
+    """
+    if not text:
+        return None
+
+    first = None
+    for match in _PRICE_RE.finditer(text):
+        token = match.group("before") or match.group("after")
+        if token:
+            return _amount(match), currency_code(token) or default_currency
+        if first is None:
+            first = match
+
+    if first is None:
+        return None
+    return _amount(first), default_currency
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Сумма из текста с ценой без валюты
+
+    Args:
+        text (str): Текст с ценой
+
+    Returns:
+        Optional[float]: Сумма или None, если числа нет
+    """
+    price = parse_price(text) if isinstance(text, str) else None
+    return price[0] if price else None
+
+
+def parse_prices(values: Any, default_currency: Optional[str] = None):
+    """
+    Пакетный разбор цен: список, массив NumPy или pandas.Series строк.
+
+    Каждое уникальное значение разбирается один раз, результат раскладывается
+    по позициям индексами, поэтому стоимость зависит от числа разных строк,
+    а не от размера выборки.
+
+    Args:
+        values: Строки цен (None и NaN допускаются)
+        default_currency (Optional[str]): Валюта, если в строке ее нет
+
+    Returns:
+        Для pandas.Series - DataFrame с колонками amount и currency и тем же индексом;
+        иначе - пара массивов NumPy (суммы float64 с NaN, валюты object с None)
+    """
+    import numpy as np
+    import pandas as pd
+
+    series = values if isinstance(values, pd.Series) else None
+    codes, uniques = pd.factorize(series if series is not None else np.asarray(values, dtype=object))
+
+    unique_amounts = np.full(len(uniques) + 1, np.nan, dtype=np.float64)
+    unique_currencies = np.full(len(uniques) + 1, None, dtype=object)
+    for position, value in enumerate(uniques):
+        price = parse_price(value, default_currency) if isinstance(value, str) else None
+        if price is not None:
+            unique_amounts[position], unique_currencies[position] = price
+
+    # Отсутствующие значения factorize кодирует -1: это последний элемент с NaN/None
+    amounts = unique_amounts[codes]
+    currencies = unique_currencies[codes]
+    if series is not None:
+        return pd.DataFrame({"amount": amounts, "currency": currencies}, index=series.index)
+    return amounts, currencies
@@ -0,0 +1,439 @@
+"""
+Адаптивное ограничение одновременных запросов к доменам магазинов (AIMD).
+
+На каждый домен - свой предел одновременных запросов. Он начинается с
+небольшого значения и растет примерно на increase за "окно" успешных ответов
+(как окно перегрузки TCP), пока задержка не выросла больше чем в
+latency_tolerance раз относительно лучшей наблюдавшейся. На 429/503, таймауты,
+обрывы соединения и страницы блокировки (капча) предел умножается на decrease,
+а новые запросы к домену ждут Retry-After (или cooldown).
+
+Через RateController проходят оба пути загрузки BaseParser: навигации
+страниц браузера (_page(url)) и запросы HTTP-сессии (_http_session).
+У страниц браузера предел снижают только ошибки самой навигации (BaseParser._goto):
+таймаут ожидания селектора или ошибка разбора - не признак перегрузки магазина.
+Текущие пределы видны в utils.metrics (parser_rate_limit, parser_rate_in_flight)
+и в RateController.stats().
+
+Пример:
+    async with rate_controller.slot(url) as slot:
+        response = await session.get(url)
+        slot.observe(response.status, response.headers, str(response.url))
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from parsers.resilience import BLOCKED, OVERLOAD, SERVER_ERROR, classify_error, record_failure
+from utils.metrics import EVENTS_METRIC, RATE_IN_FLIGHT_METRIC, RATE_LIMIT_METRIC, metrics
+
+logger = logging.getLogger('parser')
+
+# Статусы перегрузки: сервер просит снизить нагрузку
+OVERLOAD_STATUSES = frozenset({429, 503})
+# Признаки страницы блокировки в URL ответа (редирект на капчу / проверку робота)
+BLOCK_URL_MARKERS = ("captcha", "/challenge", "robot-check", "/blocked", "/punish")
+# Признаки страницы блокировки в HTML; просто "captcha" не подходит - reCAPTCHA бывает и на обычных страницах
+BLOCK_PAGE_MARKERS = (
+    "robot check",
+    "are you a robot",
+    "enter the characters you see below",
+    "unusual traffic",
+    "slide to verify",
+    "access denied",
+)
+# Страницы блокировки короткие; страницы товаров больше и по HTML не проверяются
+BLOCK_PAGE_MAX_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class RateConfig:
+    """Параметры AIMD для домена"""
+    # Начальный предел одновременных запросов
+    initial: float = 2.0
+    minimum: float = 1.0
+    maximum: float = 16.0
+    # Прирост предела за окно успешных ответов (окно = текущий предел)
+    increase: float = 1.0
+    # Множитель предела при перегрузке
+    decrease: float = 0.5
+    # Во сколько раз задержка может превысить лучшую, чтобы предел еще рос
+    latency_tolerance: float = 2.0
+    # Пауза после перегрузки без Retry-After, секунды
+    cooldown: float = 5.0
+    # Верхняя граница ожидания по Retry-After, секунды
+    max_retry_after: float = 300.0
+
+
+def domain_of(url: str) -> str:
+    """Домен URL без www."""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _header(headers: Any, name: str) -> Optional[str]:
+    """Заголовок без учета регистра (aiohttp, playwright и StoredResponse хранят их по-разному)"""
+    if not headers:
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает Retry-After: число секунд или HTTP-дату
+
+    Args:
+        value (Optional[str]): Значение заголовка
+
+    Returns:
+        Optional[float]: Секунды ожидания или None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def is_block_page(url: Optional[str] = None, html: Optional[str] = None) -> bool:
+    """
+    Похоже ли на страницу блокировки: редирект на капчу или текст проверки робота
+
+    Args:
+        url (Optional[str]): Итоговый URL ответа
+        html (Optional[str]): HTML страницы (проверяются только страницы до BLOCK_PAGE_MAX_SIZE)
+
+    Returns:
+        bool: True, если магазин нас блокирует
+    """
+    if url and any(marker in url.lower() for marker in BLOCK_URL_MARKERS):
+        return True
+    if html and len(html) <= BLOCK_PAGE_MAX_SIZE:
+        text = html.lower()
+        return any(marker in text for marker in BLOCK_PAGE_MARKERS)
+    return False
+
+
+class Slot:
+    """Разрешение на один запрос к домену; в него записывается результат ответа"""
+
+    __slots__ = ("limiter", "started", "status", "retry_after", "blocked", "error")
+
+    def __init__(self, limiter: "DomainLimiter"):
+        self.limiter = limiter
+        self.started = time.perf_counter()
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.blocked = False
+        # Ошибка навигации или сети (см. fail)
+        self.error: Optional[BaseException] = None
+
+    def observe(self, status: Optional[int], headers: Any = None, url: Optional[str] = None):
+        """
+        Записывает ответ: статус, Retry-After и признак блокировки по URL
+
+        Args:
+            status (Optional[int]): HTTP-статус
+            headers: Заголовки ответа
+            url (Optional[str]): Итоговый URL (после редиректов)
+        """
+        self.status = status
+        self.retry_after = retry_after_seconds(_header(headers, "Retry-After"))
+        if is_block_page(url):
+            self.blocked = True
+
+    def fail(self, error: BaseException):
+        """
+        Записывает ошибку навигации страницы (page.goto): для страниц браузера только она,
+        а не любое исключение из блока, подстраивает предел при освобождении
+
+        Args:
+            error (BaseException): Исключение навигации
+        """
+        self.error = error
+
+    def watch(self, page):
+        """
+        Берет статус из ответа на навигацию основного фрейма страницы playwright
+
+        Args:
+            page: Страница playwright
+        """
+        def on_response(response):
+            try:
+                if response.request.is_navigation_request() and response.frame == page.main_frame:
+                    self.observe(response.status, response.headers, response.url)
+            except Exception:
+                pass
+
+        page.on("response", on_response)
+
+
+class DomainLimiter:
+    """AIMD-предел одновременных запросов к одному домену"""
+
+    def __init__(self, domain: str, config: RateConfig):
+        self.domain = domain
+        self.config = config
+        self.limit = config.initial
+        self.in_flight = 0
+        self._window_successes = 0.0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._waiters: List[asyncio.Future] = []
+        self.stats: Dict[str, int] = {"requests": 0, "waits": 0, "backoffs": 0}
+        self._publish()
+
+    async def acquire(self) -> Slot:
+        """Ждет свободного места в пределе и окончания паузы после перегрузки"""
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            pause = self._blocked_until - time.monotonic()
+            if pause > 0:
+                waited = True
+                await asyncio.sleep(pause)
+                continue
+            if self.in_flight < max(1, int(self.limit)):
+                break
+            waited = True
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Разбуженный, но отмененный запрос передает место следующему
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake()
+                raise
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.in_flight += 1
+        self.stats["requests"] += 1
+        if waited:
+            self.stats["waits"] += 1
+        self._publish()
+        return Slot(self)
+
+    def release(self, slot: Slot, error: Optional[BaseException] = None):
+        """
+        Освобождает место и подстраивает предел по результату запроса
+
+        Args:
+            slot (Slot): Разрешение из acquire
+            error (Optional[BaseException]): Исключение, которым закончился запрос
+        """
+        self.in_flight -= 1
+        seconds = time.perf_counter() - slot.started
+        failure = None
+        if error is not None:
+            # Таймауты и обрывы соединения - перегрузка, ошибки разбора - нет
+            failure = classify_error(error)
+            if failure is not None:
+                self._back_off(type(error).__name__)
+        elif slot.blocked:
+            failure = BLOCKED
+            self._back_off("blocked", slot.retry_after)
+        elif slot.status in OVERLOAD_STATUSES:
+            failure = OVERLOAD
+            self._back_off(str(slot.status), slot.retry_after)
+        elif slot.status is None or slot.status < 500:
+            self._succeeded(seconds)
+        else:
+            failure = SERVER_ERROR
+        self._publish()
+        self._wake()
+        # Исход попытки для повторов (parsers.resilience)
+        if failure is not None:
+            record_failure(failure, slot.retry_after)
+
+    def penalize(self, reason: str, retry_after: Optional[float] = None):
+        """
+        Снижает предел по признаку, замеченному уже после ответа (например, страница блокировки в HTML)
+
+        Args:
+            reason (str): Причина (метка reason в parser_events_total)
+            retry_after (Optional[float]): Пауза для домена, секунды; None - cooldown
+        """
+        self._back_off(reason, retry_after)
+        self._publish()
+        record_failure(BLOCKED if reason == "blocked" else OVERLOAD, retry_after)
+
+    def _succeeded(self, seconds: float):
+        config = self.config
+        self._latency = seconds if self._latency is None else 0.8 * self._latency + 0.2 * seconds
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+        # Задержка растет - сервер уже на пределе, окно не увеличиваем
+        if self._latency > self._best_latency * config.latency_tolerance:
+            return
+        self._window_successes += 1
+        if self._window_successes >= self.limit and self.limit < config.maximum:
+            self._window_successes = 0.0
+            self.limit = min(config.maximum, self.limit + config.increase)
+
+    def _back_off(self, reason: str, retry_after: Optional[float] = None):
+        config = self.config
+        now = time.monotonic()
+        pause = min(config.max_retry_after, retry_after if retry_after is not None else config.cooldown)
+        self._blocked_until = max(self._blocked_until, now + pause)
+        self.stats["backoffs"] += 1
+        metrics.inc(EVENTS_METRIC, event="rate_backoff", domain=self.domain, reason=reason)
+        # Ответы запросов, отправленных до снижения, не снижают предел повторно
+        if now - self._last_decrease < max(pause, self._latency or 0.0):
+            return
+        self._last_decrease = now
+        self._window_successes = 0.0
+        previous = self.limit
+        self.limit = max(config.minimum, self.limit * config.decrease)
+        logger.warning(f"{self.domain}: {reason}, предел {previous:.1f} -> {self.limit:.1f}, пауза {pause:.0f} с")
+
+    def _wake(self):
+        free = max(1, int(self.limit)) - self.in_flight
+        for waiter in self._waiters[:max(0, free)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _publish(self):
+        if metrics.enabled:
+            metrics.set_gauge(RATE_LIMIT_METRIC, self.limit, domain=self.domain)
+            metrics.set_gauge(RATE_IN_FLIGHT_METRIC, self.in_flight, domain=self.domain)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "latency_ms": round(self._latency * 1000, 1) if self._latency is not None else None,
+            "best_latency_ms": round(self._best_latency * 1000, 1) if self._best_latency is not None else None,
+            "paused_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 1),
+            **self.stats,
+        }
+
+
+class RateController:
+    """Пределы по доменам; один на процесс (rate_controller), общий для всех парсеров"""
+
+    def __init__(self, default: RateConfig = RateConfig()):
+        self.default = default
+        self._limiters: Dict[str, DomainLimiter] = {}
+
+    def limiter(self, url: str, config: Optional[RateConfig] = None) -> DomainLimiter:
+        """
+        Предел домена URL; создается с config (или конфигурацией по умолчанию) при первом обращении
+
+        Args:
+            url (str): URL запроса
+            config (Optional[RateConfig]): Параметры для нового домена
+        """
+        domain = domain_of(url)
+        limiter = self._limiters.get(domain)
+        if limiter is None:
+            limiter = self._limiters[domain] = DomainLimiter(domain, config or self.default)
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, url: str, config: Optional[RateConfig] = None):
+        """
+        Запрос к домену URL в пределах его лимита. Результат ответа передается
+        через slot.observe(...); исключение из блока тоже учитывается
+
+        Args:
+            url (str): URL запроса
+            config (Optional[RateConfig]): Параметры для нового домена
+        """
+        limiter = self.limiter(url, config)
+        slot = await limiter.acquire()
+        try:
+            yield slot
+        except BaseException as e:
+            limiter.release(slot, e)
+            raise
+        limiter.release(slot)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Текущие пределы и счетчики по доменам"""
+        return {domain: limiter.snapshot() for domain, limiter in self._limiters.items()}
+
+    def reset(self):
+        self._limiters.clear()
+
+
+class _LimitedRequest:
+    """session.get(...) под пределом домена: поддерживает и await, и async with"""
+
+    def __init__(self, session: "RateLimitedSession", method: str, url: str, kwargs: Dict[str, Any]):
+        self._session = session
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._slot = None
+        self._response = None
+
+    async def __aenter__(self):
+        self._slot = self._session.controller.slot(self._url, self._session.config)
+        slot = await self._slot.__aenter__()
+        try:
+            self._response = await self._session.session.request(self._method, self._url, **self._kwargs)
+        except BaseException as e:
+            await self._slot.__aexit__(type(e), e, e.__traceback__)
+            raise
+        slot.observe(self._response.status, self._response.headers, str(getattr(self._response, "url", self._url)))
+        return self._response
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self._response.release()
+        finally:
+            await self._slot.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def _send(self):
+        # Без async with место освобождается после заголовков ответа
+        response = await self.__aenter__()
+        await self._slot.__aexit__(None, None, None)
+        return response
+
+    def __await__(self):
+        return self._send().__await__()
+
+
+class RateLimitedSession:
+    """Обертка HTTP-сессии (aiohttp или parsers.replay), пропускающая запросы через RateController"""
+
+    def __init__(self, session, controller: RateController, config: Optional[RateConfig] = None):
+        self.session = session
+        self.controller = controller
+        self.config = config
+
+    def request(self, method: str, url: str, **kwargs) -> _LimitedRequest:
+        return _LimitedRequest(self, method, str(url), kwargs)
+
+    def get(self, url: str, **kwargs) -> _LimitedRequest:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _LimitedRequest:
+        return self.request("POST", url, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.session, name)
+
+
+# Пределы процесса
+rate_controller = RateController()
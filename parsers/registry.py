@@ -0,0 +1,165 @@
+"""
+Реестр парсеров магазинов.
+
+Встроенные магазины описаны манифестом (модуль, класс, домены), поэтому поиск
+парсера по URL ничего не импортирует: модуль парсера загружается только при
+получении класса. Сторонние пакеты добавляют магазины через entry points группы
+"parser.stores", например в setup.py:
+
+    entry_points={"parser.stores": ["mystore = mypackage.stores:MANIFEST"]}
+
+Точка входа должна указывать на StoreEntry (легкий модуль без зависимостей)
+или прямо на класс парсера с атрибутом DOMAINS.
+"""
+import importlib
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('parser')
+
+ENTRY_POINT_GROUP = "parser.stores"
+
+
+@dataclass(frozen=True)
+class StoreEntry:
+    """Описание магазина в реестре"""
+    name: str
+    module: str
+    class_name: str
+    domains: Tuple[str, ...]
+    # Регулярные выражения URL, которые магазин обрабатывает помимо своих доменов
+    # (зеркала, партнерские ссылки)
+    patterns: Tuple[str, ...] = ()
+
+    def load(self) -> Type:
+        """Импортирует модуль парсера и возвращает класс"""
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+    def matches_host(self, host: str) -> bool:
+        """Подходит ли магазин для хоста (домен или его поддомен)"""
+        return any(host == domain or host.endswith("." + domain) for domain in self.domains)
+
+    def matches_url(self, url: str) -> bool:
+        """Подходит ли URL под один из шаблонов магазина"""
+        return any(_compile_pattern(pattern).search(url) for pattern in self.patterns)
+
+
+@lru_cache(maxsize=None)
+def _compile_pattern(pattern: str) -> "re.Pattern":
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# Встроенные магазины
+STORES: Dict[str, StoreEntry] = {
+    entry.name: entry
+    for entry in [
+        StoreEntry("lugi", "parsers.store_specific.lugi_parser", "LUGIParser", ("lugi.com.ua",)),
+        StoreEntry("rozetka", "parsers.store_specific.rozetka_parser", "RozetkaParser", ("rozetka.com.ua",)),
+        StoreEntry("amazon", "parsers.store_specific.amazon_parser", "AmazonParser", ("amazon.com",)),
+        StoreEntry("aliexpress", "parsers.store_specific.aliexpress_parser", "AliExpressParser",
+                   ("aliexpress.com", "aliexpress.ru", "aliexpress.us")),
+    ]
+}
+
+_plugins_loaded = False
+
+
+def _load_plugins():
+    """Добавляет в реестр магазины из entry points (один раз на процесс)"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+
+    from importlib.metadata import entry_points
+
+    try:
+        points = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:
+        # Python < 3.10: entry_points() возвращает словарь групп
+        points = entry_points().get(ENTRY_POINT_GROUP, [])
+
+    for point in points:
+        try:
+            target = point.load()
+            if isinstance(target, StoreEntry):
+                entry = target
+            else:
+                entry = StoreEntry(point.name, target.__module__, target.__name__, tuple(getattr(target, "DOMAINS", ())))
+            STORES.setdefault(entry.name, entry)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить плагин магазина {point.name}: {e}")
+
+
+def register(entry: StoreEntry):
+    """
+    Регистрирует магазин (замещает магазин с тем же именем)
+
+    Args:
+        entry (StoreEntry): Описание магазина
+    """
+    STORES[entry.name] = entry
+
+
+def stores() -> List[StoreEntry]:
+    """Все известные магазины, включая плагины"""
+    _load_plugins()
+    return list(STORES.values())
+
+
+def find_store(url: str) -> Optional[StoreEntry]:
+    """
+    Находит магазин по URL без импорта парсеров: сначала по домену, затем по шаблонам URL
+
+    Args:
+        url (str): URL страницы магазина
+
+    Returns:
+        Optional[StoreEntry]: Описание магазина или None
+    """
+    host = (urlsplit(url).hostname or "").lower()
+    if not host:
+        return None
+    entry = _match(url, host)
+    if entry is None and not _plugins_loaded:
+        _load_plugins()
+        entry = _match(url, host)
+    return entry
+
+
+def _match(url: str, host: str) -> Optional[StoreEntry]:
+    for entry in STORES.values():
+        if entry.matches_host(host):
+            return entry
+    for entry in STORES.values():
+        if entry.patterns and entry.matches_url(url):
+            return entry
+    return None
+
+
+def get_parser_class(name_or_url: str) -> Type:
+    """
+    Класс парсера по имени магазина или URL
+
+    Args:
+        name_or_url (str): Имя магазина ("lugi") или URL его страницы
+
+    Returns:
+        Type: Класс парсера
+
+    Raises:
+        KeyError: Если магазин не найден
+    """
+    entry = STORES.get(name_or_url)
+    if entry is None and "://" not in name_or_url:
+        _load_plugins()
+        entry = STORES.get(name_or_url)
+    if entry is None:
+        entry = find_store(name_or_url)
+    if entry is None:
+        raise KeyError(f"Нет парсера для {name_or_url}")
+    return entry.load()
@@ -0,0 +1,514 @@
+"""
+Запись и воспроизведение сетевого трафика парсеров.
+
+Режим задается переменной окружения PARSER_NETWORK_MODE:
+    live    - обычная работа с сетью (по умолчанию)
+    record  - запросы идут в сеть, каждый ответ сохраняется в хранилище
+    replay  - ответы берутся только из хранилища; чего в нем нет, считается
+              ошибкой сети, в интернет парсер не ходит
+
+Хранилище (PARSER_NETWORK_STORE, по умолчанию data/network) устроено как HAR,
+разложенный по файлам: entries.jsonl - по строке на запрос (метод, URL, статус,
+заголовки, ссылка на тело), bodies/ - тела ответов, названные по SHA-256
+(одинаковые ответы хранятся один раз). Записи дописываются по мере обхода,
+поэтому прерванная запись остается пригодной.
+
+Ответ ищется по странице, ради которой сделан запрос (page_scope), ключу запроса
+(метод, URL, хэш тела) и номеру повтора этого запроса в пределах страницы.
+Поэтому порядок, в котором параллельные страницы делают одинаковые запросы,
+на воспроизведение не влияет. Файлы хранилища читаются и пишутся в потоках
+(asyncio.to_thread), а не в цикле событий.
+
+Перехватываются оба пути загрузки: контексты браузера (create_context в
+parsers.browser_pool вешает route на весь контекст) и HTTP-сессии парсеров
+(BaseParser._http_session).
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from utils.slow_pages import current_capture
+
+logger = logging.getLogger('parser')
+
+LIVE, RECORD, REPLAY = "live", "record", "replay"
+DEFAULT_STORE = "data/network"
+
+# Заголовки, которые теряют смысл для уже распакованного тела
+_HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+# Страница, ради которой делаются запросы текущей задачи (см. page_scope)
+_current_scope: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("network_scope", default=None)
+
+
+@contextmanager
+def page_scope(url: str):
+    """
+    Относит HTTP-запросы текущей задачи к странице url: записанные ответы
+    ищутся среди ответов этой страницы (ParserRouter задает ее для каждого URL)
+
+    Args:
+        url (str): URL страницы товара
+    """
+    token = _current_scope.set(url)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def current_scope() -> Optional[str]:
+    """Страница текущей задачи (None вне page_scope)"""
+    return _current_scope.get()
+
+
+class ReplayMissError(ConnectionError):
+    """В хранилище нет ответа на запрос (в режиме replay это аналог недоступной сети)"""
+
+
+def network_mode() -> str:
+    """Текущий режим сети из PARSER_NETWORK_MODE"""
+    mode = os.getenv("PARSER_NETWORK_MODE", LIVE).strip().lower() or LIVE
+    if mode not in (LIVE, RECORD, REPLAY):
+        raise ValueError(f"Неизвестный режим сети PARSER_NETWORK_MODE={mode!r}")
+    return mode
+
+
+def active_store() -> Optional["NetworkStore"]:
+    """
+    Хранилище для текущего режима сети
+
+    Returns:
+        Optional[NetworkStore]: Хранилище или None в режиме live
+    """
+    mode = network_mode()
+    if mode == LIVE:
+        return None
+    return NetworkStore.open(os.getenv("PARSER_NETWORK_STORE", DEFAULT_STORE), mode)
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """
+    Ключ запроса: метод, URL без фрагмента с упорядоченными параметрами и хэш тела
+
+    Args:
+        method (str): HTTP-метод
+        url (str): URL запроса
+        body (Optional[bytes]): Тело запроса
+
+    Returns:
+        str: Ключ
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+    key = f"{method.upper()} {normalized}"
+    if body:
+        key += " " + hashlib.sha256(body).hexdigest()[:16]
+    return key
+
+
+class StoredResponse:
+    """
+    Ответ из хранилища. Повторяет ту часть интерфейса aiohttp.ClientResponse,
+    которой пользуются парсеры: status, headers, url, read(), text(), json()
+    """
+
+    def __init__(self, url: str, status: int, headers: List[Tuple[str, str]], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = {name: value for name, value in headers}
+        self.header_list = headers
+        self.body = body
+
+    @property
+    def charset(self) -> str:
+        content_type = next((value for name, value in self.header_list if name.lower() == "content-type"), "")
+        for part in content_type.split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "replace") -> str:
+        return self.body.decode(encoding or self.charset, errors=errors)
+
+    async def json(self, **kwargs) -> Any:
+        return json.loads(await self.text())
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise ConnectionError(f"HTTP {self.status}: {self.url}")
+
+    def release(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class NetworkStore:
+    """
+    Хранилище записанных ответов.
+
+    Для одного и того же запроса может быть записано несколько ответов (например,
+    страница менялась во время обхода). Каждый ответ запоминает страницу (scope)
+    и номер повтора запроса на ней; при воспроизведении ответы страницы выдаются
+    по номерам, последний повторяется. Записи без страницы (старые хранилища,
+    запросы вне page_scope) выдаются по порядку записи.
+
+    record() и lookup() работают с файлами и вызываются из потоков;
+    в корутинах используются record_async() и lookup_async().
+    """
+
+    def __init__(self, path: str, mode: str = REPLAY):
+        """
+        Args:
+            path (str): Каталог хранилища
+            mode (str): RECORD - дописывать ответы, REPLAY - только читать
+        """
+        self.path = Path(path)
+        self.mode = mode
+        # Все ответы по ключу запроса и ответы по (странице, ключу) в порядке номеров повтора
+        self._entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._scoped: Dict[Tuple[Optional[str], str], List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[Any, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def open(cls, path: str, mode: str) -> "NetworkStore":
+        """Хранилище, общее для всех парсеров процесса (одно на каталог и режим)"""
+        return cls(path, mode)
+
+    @property
+    def entries_path(self) -> Path:
+        return self.path / "entries.jsonl"
+
+    def _body_path(self, digest: str) -> Path:
+        return self.path / "bodies" / digest[:2] / digest
+
+    def _add(self, entry: Dict[str, Any]):
+        self._entries[entry["_key"]].append(entry)
+        self._scoped[(entry.get("_scope"), entry["_key"])].append(entry)
+
+    def _load(self):
+        """Читает entries.jsonl один раз (вызывается под self._lock)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.entries_path.exists():
+            if self.mode == REPLAY:
+                logger.warning(f"Хранилище сетевых ответов пусто: {self.path}")
+            return
+        with open(self.entries_path, encoding="utf-8") as entries:
+            for line in entries:
+                if line.strip():
+                    self._add(json.loads(line))
+
+    def record(self, method: str, url: str, status: int, headers: List[Tuple[str, str]], body: bytes,
+               request_body: Optional[bytes] = None, elapsed: Optional[float] = None, source: str = "http",
+               scope: Optional[str] = None):
+        """
+        Сохраняет ответ (синхронно; из корутин - record_async)
+
+        Args:
+            method (str): HTTP-метод
+            url (str): URL запроса
+            status (int): Код ответа
+            headers (List[Tuple[str, str]]): Заголовки ответа
+            body (bytes): Тело ответа (уже распакованное)
+            request_body (Optional[bytes]): Тело запроса
+            elapsed (Optional[float]): Время ответа, секунды
+            source (str): Путь загрузки: "browser" или "http"
+            scope (Optional[str]): Страница, ради которой сделан запрос
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not body_path.exists():
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            body_path.write_bytes(body)
+
+        key = request_key(method, url, request_body)
+        entry = {
+            "_key": key,
+            "_scope": scope,
+            "_source": source,
+            "startedDateTime": datetime.now(timezone.utc).isoformat(),
+            "time": round(elapsed * 1000, 1) if elapsed is not None else None,
+            "request": {"method": method.upper(), "url": url},
+            "response": {
+                "status": status,
+                "headers": [{"name": name, "value": value} for name, value in headers
+                            if name.lower() not in _HOP_HEADERS],
+                "content": {"size": len(body), "_sha256": digest},
+            },
+        }
+        with self._lock:
+            self._load()
+            # Номер и строка файла назначаются вместе, чтобы порядок в файле совпадал с номерами
+            entry["_occurrence"] = len(self._scoped[(scope, key)])
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.entries_path, "a", encoding="utf-8") as entries:
+                entries.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._add(entry)
+            self.recorded += 1
+
+    async def record_async(self, *args, **kwargs):
+        """record() в потоке; страница по умолчанию - из page_scope текущей задачи"""
+        kwargs.setdefault("scope", current_scope())
+        await asyncio.to_thread(self.record, *args, **kwargs)
+
+    def lookup(self, method: str, url: str, request_body: Optional[bytes] = None,
+               scope: Optional[str] = None) -> Optional[StoredResponse]:
+        """
+        Находит записанный ответ (синхронно; из корутин - lookup_async)
+
+        Args:
+            method (str): HTTP-метод
+            url (str): URL запроса
+            request_body (Optional[bytes]): Тело запроса
+            scope (Optional[str]): Страница, ради которой сделан запрос
+
+        Returns:
+            Optional[StoredResponse]: Ответ или None, если запрос не записывался
+        """
+        key = request_key(method, url, request_body)
+        with self._lock:
+            self._load()
+            # Сначала ответы той же страницы по номеру повтора, иначе - все ответы на запрос по порядку
+            cursor = (scope, key)
+            candidates = self._scoped.get(cursor)
+            if not candidates:
+                cursor = key
+                candidates = self._entries.get(key)
+            if not candidates:
+                self.misses += 1
+                return None
+            position = min(self._cursors[cursor], len(candidates) - 1)
+            self._cursors[cursor] += 1
+            self.hits += 1
+
+        response = candidates[position]["response"]
+        body = self._body_path(response["content"]["_sha256"]).read_bytes()
+        headers = [(header["name"], header["value"]) for header in response["headers"]]
+        return StoredResponse(url, response["status"], headers, body)
+
+    async def lookup_async(self, *args, **kwargs) -> Optional[StoredResponse]:
+        """lookup() в потоке; страница по умолчанию - из page_scope текущей задачи"""
+        kwargs.setdefault("scope", current_scope())
+        return await asyncio.to_thread(self.lookup, *args, **kwargs)
+
+    def rewind(self):
+        """Начинает воспроизведение сначала (для повторного прогона в том же процессе)"""
+        with self._lock:
+            self._cursors.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+def _with_params(url: str, params: Any) -> str:
+    if not params:
+        return url
+    items = params.items() if hasattr(params, "items") else params
+    separator = "&" if urlsplit(url).query else "?"
+    return url + separator + urlencode([(key, str(value)) for key, value in items])
+
+
+def _request_body(kwargs: Dict[str, Any]) -> Optional[bytes]:
+    if kwargs.get("json") is not None:
+        return json.dumps(kwargs["json"], sort_keys=True).encode("utf-8")
+    data = kwargs.get("data")
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if isinstance(data, dict):
+        return urlencode(sorted(data.items())).encode("utf-8")
+    return None
+
+
+class _PendingResponse:
+    """Результат session.get(...): поддерживает и await, и async with, как у aiohttp"""
+
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+
+    def __await__(self):
+        return self._coroutine.__await__()
+
+    async def __aenter__(self) -> StoredResponse:
+        return await self._coroutine
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class NetworkSession:
+    """
+    Замена aiohttp.ClientSession для режимов record и replay.
+
+    В режиме record запросы выполняет настоящая сессия, тело ответа читается
+    целиком, сохраняется и отдается как StoredResponse. В режиме replay
+    настоящей сессии нет, ответы берутся из хранилища.
+    """
+
+    def __init__(self, store: NetworkStore, session=None):
+        """
+        Args:
+            store (NetworkStore): Хранилище
+            session (Optional[aiohttp.ClientSession]): Настоящая сессия (только для record)
+        """
+        self.store = store
+        self.session = session
+
+    @property
+    def closed(self) -> bool:
+        return self.session.closed if self.session is not None else False
+
+    def request(self, method: str, url: str, **kwargs) -> _PendingResponse:
+        return _PendingResponse(self._request(method, str(url), **kwargs))
+
+    def get(self, url: str, **kwargs) -> _PendingResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _PendingResponse:
+        return self.request("POST", url, **kwargs)
+
+    async def _request(self, method: str, url: str, **kwargs) -> StoredResponse:
+        full_url = _with_params(url, kwargs.get("params"))
+        request_body = _request_body(kwargs)
+
+        if self.session is None:
+            response = await self.store.lookup_async(method, full_url, request_body)
+            if response is None:
+                raise ReplayMissError(f"Нет записанного ответа: {method} {full_url}")
+            capture = current_capture()
+            if capture is not None:
+                capture.log_request(method, full_url, "replay", response.status, len(response.body))
+            return response
+
+        started = time.perf_counter()
+        async with self.session.request(method, url, **kwargs) as response:
+            body = await response.read()
+            headers = list(response.headers.items())
+            status = response.status
+        await self.store.record_async(method, full_url, status, headers, body, request_body,
+                                      time.perf_counter() - started, source="http")
+        return StoredResponse(full_url, status, headers, body)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+def create_session(headers: Optional[Dict[str, str]] = None):
+    """
+    HTTP-сессия для текущего режима сети
+
+    Args:
+        headers (Optional[Dict[str, str]]): Заголовки по умолчанию
+
+    Returns:
+        aiohttp.ClientSession в режиме live, иначе NetworkSession
+    """
+    store = active_store()
+    if store is not None and store.mode == REPLAY:
+        return NetworkSession(store)
+
+    import aiohttp
+    from utils.slow_pages import capturing, http_trace_config
+
+    # Пока работает захват медленных страниц, запросы сессии пишутся в журнал страницы
+    session = aiohttp.ClientSession(headers=headers, trace_configs=[http_trace_config()] if capturing() else None)
+    return NetworkSession(store, session) if store is not None else session
+
+
+async def attach_to_context(context, store: Optional["NetworkStore"] = None):
+    """
+    Перехватывает все запросы контекста браузера: в режиме record сохраняет ответы,
+    в режиме replay отвечает из хранилища, а незаписанные запросы обрывает
+
+    Args:
+        context: Контекст браузера playwright
+        store (Optional[NetworkStore]): Хранилище; по умолчанию - для текущего режима сети
+    """
+    store = store or active_store()
+    if store is None:
+        return
+
+    # Страница браузера -> URL ее навигации (первый в цепочке редиректов): обработчик route
+    # выполняется вне задачи парсера, поэтому page_scope здесь не виден
+    navigations: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def scope_of(request) -> Optional[str]:
+        try:
+            frame = request.frame
+            page = frame.page
+            if request.is_navigation_request() and frame == page.main_frame:
+                origin = request
+                while origin.redirected_from is not None:
+                    origin = origin.redirected_from
+                navigations[page] = origin.url
+            return navigations.get(page)
+        except Exception:
+            # Запросы service worker не относятся к странице
+            return None
+
+    async def handle(route):
+        request = route.request
+        request_body = request.post_data_buffer
+        scope = scope_of(request)
+        if store.mode == REPLAY:
+            response = await store.lookup_async(request.method, request.url, request_body, scope=scope)
+            if response is None:
+                logger.debug(f"Нет записанного ответа: {request.method} {request.url}")
+                await route.abort("internetdisconnected")
+                return
+            await route.fulfill(status=response.status, headers=response.headers, body=response.body)
+            return
+
+        started = time.perf_counter()
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"Запрос {request.url} не выполнен: {e}")
+            await route.abort()
+            return
+        await store.record_async(request.method, request.url, response.status, list(response.headers.items()),
+                                 body, request_body, time.perf_counter() - started, source="browser", scope=scope)
+        await route.fulfill(response=response, body=body)
+
+    await context.route("**/*", handle)
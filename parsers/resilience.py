@@ -0,0 +1,371 @@
+"""
+Повторы с экспоненциальной задержкой, дедлайн на URL и предохранители магазинов.
+
+Парсеры магазинов перехватывают исключения и возвращают None / {} / [],
+поэтому решение о повторе принимается не по исключению, а по исходу загрузки:
+помощники BaseParser (_page(url), _http_session) через parsers.rate_control
+отмечают в текущей попытке таймаут, обрыв соединения, 429/503, 5xx или
+страницу блокировки (record_failure); для парсеров с RATE_LIMIT = None
+повторяются только проброшенные исключения. Если парсер вернул пустой результат
+и в попытке была такая ошибка, попытка считается временной неудачей.
+
+    RetryPolicy     - сколько повторов для каждого класса ошибок и задержка
+                      с полным джиттером (random(0, base * 2^n)), не меньше Retry-After
+    Deadline        - общий срок на URL, включая повторы и паузы
+    CircuitBreaker  - предохранитель магазина: после серии временных ошибок
+                      перестает отдавать работу магазину и периодически
+                      пропускает одну пробную страницу
+    Resilience      - все вместе; ParserRouter обрабатывает через него каждый URL
+
+Пример:
+    resilience = Resilience(RetryPolicy(budgets={"timeout": 1}), url_timeout=60)
+    product = await resilience.call("lugi", lambda: parser.parse_product_page(url))
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from utils.metrics import CIRCUIT_METRIC, metrics
+
+logger = logging.getLogger('parser')
+
+T = TypeVar("T")
+
+# Классы временных ошибок
+TIMEOUT = "timeout"
+CONNECTION = "connection"
+OVERLOAD = "overload"          # 429, 503
+SERVER_ERROR = "server_error"  # прочие 5xx
+BLOCKED = "blocked"            # капча / страница блокировки
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Предохранитель магазина разомкнут: страница не загружалась"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Истек срок обработки URL"""
+
+
+class RetriesExhausted(ConnectionError):
+    """Все попытки закончились временной ошибкой, которую парсер не пробросил"""
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Класс временной ошибки по исключению
+
+    Args:
+        error (BaseException): Исключение загрузки
+
+    Returns:
+        Optional[str]: TIMEOUT, CONNECTION или None (ошибка не временная - например, ошибка разбора)
+    """
+    if isinstance(error, DeadlineExceeded):
+        return None
+    names = {cls.__name__ for cls in type(error).__mro__}
+    # playwright.TimeoutError и исключения aiohttp - без импорта библиотек
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or "TimeoutError" in names:
+        return TIMEOUT
+    if isinstance(error, ConnectionError) or names & {"ClientConnectionError", "ServerDisconnectedError"}:
+        return CONNECTION
+    return None
+
+
+class Attempt:
+    """Исход текущей попытки загрузки страницы"""
+
+    __slots__ = ("failure", "retry_after")
+
+    def __init__(self):
+        self.failure: Optional[str] = None
+        self.retry_after: Optional[float] = None
+
+
+_attempt: contextvars.ContextVar[Optional[Attempt]] = contextvars.ContextVar("parser_attempt", default=None)
+
+
+def record_failure(kind: str, retry_after: Optional[float] = None):
+    """
+    Отмечает временную ошибку загрузки в текущей попытке (если URL обрабатывается через Resilience)
+
+    Args:
+        kind (str): Класс ошибки (TIMEOUT, CONNECTION, OVERLOAD, SERVER_ERROR, BLOCKED)
+        retry_after (Optional[float]): Retry-After ответа, секунды
+    """
+    attempt = _attempt.get()
+    if attempt is not None:
+        attempt.failure = kind
+        if retry_after is not None:
+            attempt.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Повторы по классам ошибок"""
+    # Сколько повторов (сверх первой попытки) для каждого класса ошибок; чего нет - не повторяется
+    budgets: Dict[str, int] = field(default_factory=lambda: {
+        TIMEOUT: 2,
+        CONNECTION: 3,
+        OVERLOAD: 3,
+        SERVER_ERROR: 2,
+        BLOCKED: 1,
+    })
+    # Задержка перед n-м повтором: random(0, min(max_delay, base_delay * 2^n))
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """
+        Задержка перед повтором
+
+        Args:
+            retry (int): Номер повтора, с 0
+            retry_after (Optional[float]): Retry-After ответа, секунды
+
+        Returns:
+            float: Секунды ожидания
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        return max(delay, retry_after or 0.0)
+
+
+class Deadline:
+    """Срок обработки URL, общий для всех попыток"""
+
+    def __init__(self, seconds: Optional[float]):
+        """
+        Args:
+            seconds (Optional[float]): Срок, секунды; None - без срока
+        """
+        self.expires = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Сколько секунд осталось (None - без срока)"""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """
+        Выполняет корутину в пределах оставшегося срока
+
+        Raises:
+            DeadlineExceeded: Срок истек (корутина отменяется)
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return await awaitable
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise DeadlineExceeded("Истек срок обработки URL")
+        try:
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            if self.expired:
+                raise DeadlineExceeded("Истек срок обработки URL") from None
+            raise
+
+
+class CircuitBreaker:
+    """
+    Предохранитель магазина.
+
+    closed    - страницы идут как обычно; failure_threshold временных ошибок подряд размыкают его
+    open      - страницы сразу завершаются CircuitOpenError, пока не пройдет reset_timeout
+    half_open - пропускается одна пробная страница: успех замыкает предохранитель,
+                ошибка снова размыкает его с вдвое большим reset_timeout (до max_reset_timeout)
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_reset_timeout: float = 600.0):
+        """
+        Args:
+            name (str): Магазин
+            failure_threshold (int): Сколько временных ошибок подряд размыкают предохранитель
+            reset_timeout (float): Через сколько секунд пробовать снова
+            max_reset_timeout (float): Предел роста reset_timeout
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe = False
+        self.stats = {"rejected": 0, "opened": 0}
+
+    def before_call(self) -> bool:
+        """
+        Разрешение на загрузку страницы
+
+        Returns:
+            bool: True, если это пробная страница (ее исход нужно передать в after_call)
+
+        Raises:
+            CircuitOpenError: Предохранитель разомкнут
+        """
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return False
+        if self.state == HALF_OPEN and not self._probe:
+            self._probe = True
+            logger.info(f"{self.name}: пробная страница после паузы {self.reset_timeout:.0f} с")
+            return True
+        self.stats["rejected"] += 1
+        raise CircuitOpenError(f"Магазин {self.name} временно недоступен (предохранитель разомкнут)")
+
+    def after_call(self, probe: bool, success: Optional[bool]):
+        """
+        Исход загрузки
+
+        Args:
+            probe (bool): Результат before_call
+            success (Optional[bool]): True - магазин ответил, False - временная ошибка,
+                None - исход не говорит о доступности магазина (например, ошибка в парсере)
+        """
+        if probe:
+            self._probe = False
+        if success is None:
+            return
+        if success:
+            self.failures = 0
+            if self.state != CLOSED:
+                logger.info(f"{self.name}: магазин снова отвечает")
+                self.reset_timeout = self.base_reset_timeout
+                self._set_state(CLOSED)
+            return
+
+        self.failures += 1
+        if self.state == HALF_OPEN and probe:
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        self._set_state(OPEN)
+        metrics.event("circuit_open", self.name)
+        logger.warning(f"{self.name}: {self.failures} временных ошибок подряд, "
+                       f"магазин пропускается {self.reset_timeout:.0f} с")
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.set_gauge(CIRCUIT_METRIC, 0 if state == CLOSED else 1, store=self.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "reset_timeout": self.reset_timeout, **self.stats}
+
+
+class Resilience:
+    """Повторы, дедлайн на URL и предохранители магазинов"""
+
+    def __init__(self, policy: RetryPolicy = RetryPolicy(), url_timeout: Optional[float] = 180.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            policy (RetryPolicy): Повторы по классам ошибок
+            url_timeout (Optional[float]): Срок на URL со всеми повторами, секунды; None - без срока
+            failure_threshold (int): Сколько временных ошибок подряд размыкают предохранитель магазина
+            reset_timeout (float): Через сколько секунд разомкнутый предохранитель пропускает пробную страницу
+        """
+        self.policy = policy
+        self.url_timeout = url_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, store: str) -> CircuitBreaker:
+        """Предохранитель магазина; создается при первом обращении"""
+        breaker = self._breakers.get(store)
+        if breaker is None:
+            breaker = self._breakers[store] = CircuitBreaker(store, self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    async def call(self, store: str, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет загрузку страницы с повторами временных ошибок
+
+        Args:
+            store (str): Магазин (предохранитель)
+            operation (Callable[[], Awaitable[T]]): Создает корутину одной попытки
+                (например, lambda: parser.parse_product_page(url))
+
+        Returns:
+            T: Результат попытки
+
+        Raises:
+            CircuitOpenError: Магазин пропускается
+            DeadlineExceeded: Истек срок на URL
+            RetriesExhausted: Попытки кончились, а парсер вернул пустой результат
+            Exception: Исключение последней попытки
+        """
+        breaker = self.breaker(store)
+        deadline = Deadline(self.url_timeout)
+        retries: Dict[str, int] = {}
+        while True:
+            probe = breaker.before_call()
+            attempt = Attempt()
+            token = _attempt.set(attempt)
+            result, error = None, None
+            try:
+                result = await deadline.run(operation())
+            except Exception as e:
+                error = e
+            except BaseException:
+                # Отмена (CancelledError) ничего не говорит о магазине, но пробная страница
+                # должна освободиться: иначе полуоткрытый предохранитель отклонял бы магазин навсегда
+                breaker.after_call(probe, None)
+                raise
+            finally:
+                _attempt.reset(token)
+
+            if error is not None:
+                kind = classify_error(error)
+            else:
+                kind = attempt.failure if not result else None
+            if isinstance(error, DeadlineExceeded):
+                breaker.after_call(probe, False)
+                raise error
+            if kind is not None:
+                breaker.after_call(probe, False)
+            else:
+                # Исключение не временное (например, ошибка в парсере) - о магазине оно ничего не говорит
+                breaker.after_call(probe, None if error is not None else True)
+            if kind is None:
+                if error is not None:
+                    raise error
+                return result
+
+            done = retries.get(kind, 0)
+            budget = self.policy.budgets.get(kind, 0)
+            delay = self.policy.delay(done, attempt.retry_after)
+            remaining = deadline.remaining()
+            if done >= budget or (remaining is not None and delay >= remaining) or breaker.state == OPEN:
+                if error is not None:
+                    raise error
+                raise RetriesExhausted(f"{kind}: {done + 1} попыток")
+            retries[kind] = done + 1
+            metrics.event(f"retry_{kind}", store)
+            logger.info(f"{store}: {kind}, повтор {done + 1}/{budget} через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Состояние предохранителей по магазинам"""
+        return {store: breaker.snapshot() for store, breaker in self._breakers.items()}
@@ -0,0 +1,306 @@
+import asyncio
+import dataclasses
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from parsers.base_parser import BaseParser
+from parsers.browser_pool import DEFAULT_FINGERPRINTS, ContextPool, Fingerprint
+from parsers.registry import StoreEntry, find_store
+from parsers.replay import page_scope
+from parsers.resilience import CircuitOpenError, Resilience
+from parsers.watchdog import BrowserWatchdog
+from utils.metrics import metrics
+from utils.slow_pages import SlowPageCapture
+
+logger = logging.getLogger('parser')
+
+
+class ParserRouter:
+    """
+    Маршрутизатор URL по парсерам магазинов.
+
+    URL из смешанного списка группируются по магазину (домен или шаблон URL
+    из parsers.registry). На группу создается один экземпляр парсера с одной
+    HTTP-сессией; все группы используют один общий браузер и общий пул заранее
+    настроенных контекстов (parsers.browser_pool). Браузер запускается, только
+    если в списке есть магазины, которым он нужен (USES_BROWSER).
+    Группы обрабатываются параллельно. Пока работает браузер, память контекстов
+    и процессов браузера контролирует BrowserWatchdog (parsers.watchdog).
+    Временные ошибки (таймауты, 429/503, капча) повторяются с задержкой в пределах
+    срока на URL, а магазин с серией таких ошибок временно пропускается
+    (parsers.resilience).
+
+    Пример:
+        async with ParserRouter() as router:
+            results = await router.parse_urls(urls)
+    """
+
+    def __init__(self, max_concurrency: int = 4, per_store_concurrency: int = 8, headless: bool = True,
+                 context_pool_size: Optional[int] = None, max_pages_per_context: int = 50,
+                 fingerprints: Sequence[Fingerprint] = DEFAULT_FINGERPRINTS,
+                 watchdog_interval: Optional[float] = 30.0, max_browser_rss_mb: Optional[float] = 2048.0,
+                 slow_pages: Optional[SlowPageCapture] = None, resilience: Optional[Resilience] = None):
+        """
+        Args:
+            max_concurrency (int): Сколько магазинов обрабатывать одновременно
+            per_store_concurrency (int): Сколько страниц одного магазина загружать одновременно (не больше);
+                фактическую нагрузку на магазин подстраивает адаптивный лимит домена (parsers.rate_control),
+                который начинается с 2 и растет, пока магазин справляется; граница лишь ограничивает его сверху
+            headless (bool): Запускать общий браузер без окна
+            context_pool_size (Optional[int]): Сколько контекстов держать в пуле;
+                по умолчанию столько, сколько страниц может открываться одновременно
+            max_pages_per_context (int): После скольких страниц контекст пересоздается
+            fingerprints (Sequence[Fingerprint]): Профили контекстов пула
+            watchdog_interval (Optional[float]): Период проверки памяти браузера, секунды; None - не проверять
+            max_browser_rss_mb (Optional[float]): Предел памяти процессов браузера, после которого
+                он пересоздается
+            slow_pages (Optional[SlowPageCapture]): Захват пакетов для медленных страниц;
+                по умолчанию - по переменной окружения PARSER_SLOW_PAGES
+            resilience (Optional[Resilience]): Повторы, срок на URL и предохранители магазинов;
+                по умолчанию - Resilience() с настройками по умолчанию
+        """
+        self.max_concurrency = max_concurrency
+        self.per_store_concurrency = per_store_concurrency
+        self.headless = headless
+        self.context_pool = ContextPool(
+            self._get_browser,
+            size=context_pool_size or max_concurrency * per_store_concurrency,
+            max_pages=max_pages_per_context,
+            fingerprints=fingerprints
+        )
+        self.watchdog = BrowserWatchdog(
+            self.context_pool,
+            lambda: self._browser,
+            self.recycle_browser,
+            interval=watchdog_interval or 30.0,
+            max_browser_rss_mb=max_browser_rss_mb
+        ) if watchdog_interval else None
+        self.slow_pages = slow_pages or SlowPageCapture.from_env()
+        self.resilience = resilience or Resilience()
+
+        self._parsers: Dict[StoreEntry, BaseParser] = {}
+        self._parsers_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+        # Браузеры, выведенные из работы, и задачи, закрывающие их после освобождения контекстов
+        self._retired_browsers: Dict[Any, asyncio.Task] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Закрывает парсеры (их сессии), пул контекстов, затем общий браузер"""
+        if self.watchdog is not None:
+            await self.watchdog.stop()
+        if self.slow_pages is not None:
+            self.slow_pages.stop()
+        for parser in self._parsers.values():
+            try:
+                await parser.close()
+            except Exception as e:
+                logger.error(f"Ошибка при закрытии парсера {type(parser).__name__}: {e}")
+        self._parsers.clear()
+        await self.context_pool.close()
+        for browser, task in list(self._retired_browsers.items()):
+            task.cancel()
+            await self._close_browser(browser)
+        self._retired_browsers.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _get_browser(self):
+        """Общий браузер; запускается при первом обращении любого парсера"""
+        if self._browser is None:
+            async with self._browser_lock:
+                if self._browser is None:
+                    if self._playwright is None:
+                        from playwright.async_api import async_playwright
+                        self._playwright = await async_playwright().start()
+                    with metrics.span("browser_launch"):
+                        self._browser = await self._playwright.chromium.launch(
+                            headless=self.headless,
+                            args=BaseParser.BROWSER_ARGS
+                        )
+        return self._browser
+
+    @property
+    def browser(self):
+        """Текущий общий браузер (None, если еще не запущен)"""
+        return self._browser
+
+    async def recycle_browser(self, drain_timeout: float = 120.0):
+        """
+        Пересоздает общий браузер, не прерывая загрузку страниц: новые контексты
+        строятся в новом браузере, старый закрывается, когда вернут все его контексты
+
+        Args:
+            drain_timeout (float): Сколько ждать возврата контекстов, секунды
+        """
+        async with self._browser_lock:
+            old, self._browser = self._browser, None
+        if old is None:
+            return
+        metrics.event("browser_recycled")
+        self._retired_browsers[old] = asyncio.ensure_future(self._close_drained(old, drain_timeout))
+
+    async def _close_drained(self, browser, drain_timeout: float):
+        deadline = asyncio.get_running_loop().time() + drain_timeout
+        while True:
+            # Контексты, достроенные в старом браузере после начала пересоздания, тоже выводятся
+            remaining = [pooled for pooled in self.context_pool.contexts() if pooled.browser is browser]
+            for pooled in remaining:
+                self.context_pool.drain(pooled, "browser")
+            if not remaining or asyncio.get_running_loop().time() > deadline:
+                break
+            await asyncio.sleep(1)
+        if remaining:
+            logger.warning(f"Браузер закрывается с {len(remaining)} невозвращенными контекстами")
+        self._retired_browsers.pop(browser, None)
+        await self._close_browser(browser)
+
+    @staticmethod
+    async def _close_browser(browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии браузера: {e}")
+
+    def route(self, url: str) -> Optional[StoreEntry]:
+        """
+        Магазин, который обрабатывает URL
+
+        Args:
+            url (str): URL страницы
+
+        Returns:
+            Optional[StoreEntry]: Описание магазина или None
+        """
+        return find_store(url)
+
+    def group(self, urls: List[str]) -> Dict[Optional[StoreEntry], List[str]]:
+        """
+        Группирует URL по магазинам (порядок внутри группы сохраняется, дубли убираются)
+
+        Args:
+            urls (List[str]): URL страниц
+
+        Returns:
+            Dict[Optional[StoreEntry], List[str]]: URL по магазинам; None - неизвестные
+        """
+        groups = defaultdict(list)
+        for url in dict.fromkeys(urls):
+            groups[self.route(url)].append(url)
+        return dict(groups)
+
+    async def get_parser(self, entry: StoreEntry) -> BaseParser:
+        """
+        Экземпляр парсера магазина, общий для всех URL этого магазина
+
+        Args:
+            entry (StoreEntry): Описание магазина
+
+        Returns:
+            BaseParser: Открытый парсер (закроется в close())
+        """
+        async with self._parsers_lock:
+            parser = self._parsers.get(entry)
+            if parser is None:
+                parser = entry.load()()
+                parser.store_name = entry.name
+                parser.use_browser(self._get_browser)
+                parser.use_context_pool(self.context_pool)
+                await parser.__aenter__()
+                self._parsers[entry] = parser
+            return parser
+
+    async def parse_urls(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Парсит страницы товаров из смешанного списка URL
+
+        Args:
+            urls (List[str]): URL страниц товаров разных магазинов
+
+        Returns:
+            List[Dict[str, Any]]: Результаты в порядке URL: {"url", "store", "product"}
+                или {"url", "store", "error"}
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        groups = self.group(urls)
+        for url in groups.pop(None, []):
+            results[url] = {"url": url, "store": None, "error": "Неизвестный магазин"}
+        if self.slow_pages is not None:
+            # До создания парсеров: их HTTP-сессии подключат журнал запросов
+            self.slow_pages.start()
+
+        if any(self._uses_browser(entry) for entry in groups):
+            # Контексты строятся в фоне, пока парсеры делают HTTP-часть работы
+            await self.context_pool.start()
+            if self.watchdog is not None:
+                self.watchdog.start()
+
+        stores = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_group(entry: StoreEntry, store_urls: List[str]):
+            async with stores:
+                try:
+                    parser = await self.get_parser(entry)
+                except Exception as e:
+                    logger.error(f"Не удалось создать парсер {entry.name}: {e}")
+                    for url in store_urls:
+                        results[url] = {"url": url, "store": entry.name, "error": str(e)}
+                    return
+
+                pages = asyncio.Semaphore(self.per_store_concurrency)
+
+                async def run_url(url: str):
+                    async with pages:
+                        results[url] = await self._parse_one(parser, entry, url)
+
+                await asyncio.gather(*(run_url(url) for url in store_urls))
+
+        await asyncio.gather(*(run_group(entry, store_urls) for entry, store_urls in groups.items()))
+        return [results[url] for url in urls]
+
+    @staticmethod
+    def _uses_browser(entry: StoreEntry) -> bool:
+        try:
+            return getattr(entry.load(), "USES_BROWSER", True)
+        except Exception:
+            # Ошибка импорта будет отражена в результатах при создании парсера
+            return False
+
+    async def _attempt(self, parser: BaseParser, entry: StoreEntry, url: str):
+        """Одна попытка разбора страницы"""
+        if self.slow_pages is not None:
+            return await self.slow_pages.track(url, entry.name, parser.parse_product_page(url))
+        return await parser.parse_product_page(url)
+
+    async def _parse_one(self, parser: BaseParser, entry: StoreEntry, url: str) -> Dict[str, Any]:
+        # Время страницы и разбивка по этапам попадают в utils.metrics (parser_page_seconds)
+        # page_scope: записанные ответы (PARSER_NETWORK_MODE) ищутся среди ответов этой страницы
+        with metrics.page(url, entry.name), page_scope(url):
+            try:
+                product = await self.resilience.call(entry.name, lambda: self._attempt(parser, entry, url))
+            except CircuitOpenError as e:
+                metrics.mark_page("skipped")
+                return {"url": url, "store": entry.name, "error": str(e)}
+            except Exception as e:
+                logger.error(f"Ошибка при парсинге {url}: {e}")
+                metrics.mark_page("error")
+                return {"url": url, "store": entry.name, "error": str(e)}
+            if not product:
+                metrics.mark_page("empty")
+        if product is None:
+            return {"url": url, "store": entry.name, "error": "Страница не разобрана"}
+        if dataclasses.is_dataclass(product):
+            product = dataclasses.asdict(product)
+        return {"url": url, "store": entry.name, "product": product}
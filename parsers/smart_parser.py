@@ -1,16 +1,24 @@
-from bs4 import BeautifulSoup
 import re
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Sequence
 import json
 import os
 from datetime import datetime
 import logging
 
+from parsers.dom import region_strainer
+from parsers.normalize import parse_amount
+from utils.metrics import metrics
+
 logger = logging.getLogger('parser')
 
 class SmartParser:
-    def __init__(self, storage_path: str = "data/patterns.json"):
+    def __init__(self, storage_path: str = "data/patterns.json",
+                 regions: Optional[Sequence[str]] = None, store_name: Optional[str] = None):
         self.storage_path = storage_path
+        # Метка магазина в метриках этапов (utils.metrics)
+        self.store_name = store_name
+        # Обучаемся и извлекаем только внутри регионов товара, а не в шапке и попапах
+        self.parse_only = region_strainer(regions) if regions else None
         self.patterns = self.load_patterns()
         
     def load_patterns(self) -> Dict:
@@ -33,7 +41,8 @@ class SmartParser:
         """Сохранение паттернов в файл"""
         os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
         try:
-            with open(self.storage_path, 'w', encoding='utf-8') as f:
+            with metrics.span("smart_save", store=self.store_name), \
+                    open(self.storage_path, 'w', encoding='utf-8') as f:
                 json.dump(self.patterns, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"Ошибка при сохранении паттернов: {e}")
@@ -63,112 +72,117 @@ class SmartParser:
 
     def discover_patterns(self, html: str) -> Dict[str, List[str]]:
         """Поиск новых паттернов в HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
-        new_patterns = {
-            "price": [],
-            "title": [],
-            "model": [],
-            "brand": [],
-            "availability": []
-        }
-        
-        # Поиск цен
-        price_candidates = soup.find_all(
-            text=re.compile(r'\d+[\s,.]?\d*\s*(?:грн|₴)')
-        )
-        for candidate in price_candidates:
-            selector = self.get_selector_path(candidate.parent)
-            if selector and selector not in self.patterns["price"]:
-                new_patterns["price"].append(selector)
-        
-        # Поиск названий товаров
-        title_candidates = soup.find_all(['h1', 'h2', '.product-name'])
-        for candidate in title_candidates:
-            selector = self.get_selector_path(candidate)
-            if selector and selector not in self.patterns["title"]:
-                new_patterns["title"].append(selector)
-        
-        # Поиск моделей
-        model_candidates = soup.find_all(
-            text=re.compile(r'(?:Модель|Артикул):\s*[A-Za-z0-9-]+')
-        )
-        for candidate in model_candidates:
-            selector = self.get_selector_path(candidate.parent)
-            if selector and selector not in self.patterns["model"]:
-                new_patterns["model"].append(selector)
-        
-        # Поиск брендов
-        brand_candidates = soup.find_all(
-            text=re.compile(r'(?:Виробник|Бренд):\s*[A-Za-z]+')
-        )
-        for candidate in brand_candidates:
-            selector = self.get_selector_path(candidate.parent)
-            if selector and selector not in self.patterns["brand"]:
-                new_patterns["brand"].append(selector)
-        
-        # Поиск наличия
-        availability_candidates = soup.find_all(
-            text=re.compile(r'[Вв]\s*наявності|[Нн]емає в наявності')
-        )
-        for candidate in availability_candidates:
-            selector = self.get_selector_path(candidate.parent)
-            if selector and selector not in self.patterns["availability"]:
-                new_patterns["availability"].append(selector)
+        from bs4 import BeautifulSoup
+        with metrics.span("smart_parse", store=self.store_name):
+            soup = BeautifulSoup(html, 'html.parser', parse_only=self.parse_only)
+        with metrics.span("smart_discover", store=self.store_name):
+            new_patterns = {
+                "price": [],
+                "title": [],
+                "model": [],
+                "brand": [],
+                "availability": []
+            }
+        
+            # Поиск цен
+            price_candidates = soup.find_all(
+                text=re.compile(r'\d+[\s,.]?\d*\s*(?:грн|₴)')
+            )
+            for candidate in price_candidates:
+                selector = self.get_selector_path(candidate.parent)
+                if selector and selector not in self.patterns["price"]:
+                    new_patterns["price"].append(selector)
+        
+            # Поиск названий товаров
+            title_candidates = soup.find_all(['h1', 'h2', '.product-name'])
+            for candidate in title_candidates:
+                selector = self.get_selector_path(candidate)
+                if selector and selector not in self.patterns["title"]:
+                    new_patterns["title"].append(selector)
+        
+            # Поиск моделей
+            model_candidates = soup.find_all(
+                text=re.compile(r'(?:Модель|Артикул):\s*[A-Za-z0-9-]+')
+            )
+            for candidate in model_candidates:
+                selector = self.get_selector_path(candidate.parent)
+                if selector and selector not in self.patterns["model"]:
+                    new_patterns["model"].append(selector)
+        
+            # Поиск брендов
+            brand_candidates = soup.find_all(
+                text=re.compile(r'(?:Виробник|Бренд):\s*[A-Za-z]+')
+            )
+            for candidate in brand_candidates:
+                selector = self.get_selector_path(candidate.parent)
+                if selector and selector not in self.patterns["brand"]:
+                    new_patterns["brand"].append(selector)
+        
+            # Поиск наличия
+            availability_candidates = soup.find_all(
+                text=re.compile(r'[Вв]\s*наявності|[Нн]емає в наявності')
+            )
+            for candidate in availability_candidates:
+                selector = self.get_selector_path(candidate.parent)
+                if selector and selector not in self.patterns["availability"]:
+                    new_patterns["availability"].append(selector)
         
         return new_patterns
 
     def extract_data(self, html: str) -> Dict[str, Any]:
         """Извлечение данных с использованием известных паттернов"""
-        soup = BeautifulSoup(html, 'html.parser')
-        data = {}
-        
-        # Извлекаем цену
-        for selector in self.patterns["price"]:
-            element = soup.select_one(selector)
-            if element:
-                price_text = element.get_text(strip=True)
-                price_clean = ''.join(c for c in price_text if c.isdigit())
-                if price_clean:
-                    data["price"] = float(price_clean)
+        from bs4 import BeautifulSoup
+        with metrics.span("smart_parse", store=self.store_name):
+            soup = BeautifulSoup(html, 'html.parser', parse_only=self.parse_only)
+        with metrics.span("smart_extract", store=self.store_name):
+            data = {}
+        
+            # Извлекаем цену
+            for selector in self.patterns["price"]:
+                element = soup.select_one(selector)
+                if element:
+                    price = parse_amount(element.get_text(strip=True))
+                    if price is not None:
+                        data["price"] = price
+                        break
+        
+            # Извлекаем название
+            for selector in self.patterns["title"]:
+                element = soup.select_one(selector)
+                if element:
+                    title = element.get_text(strip=True)
+                    if title:
+                        data["title"] = title
+                        break
+        
+            # Извлекаем модель
+            for selector in self.patterns["model"]:
+                element = soup.select_one(selector)
+                if element:
+                    model_text = element.get_text(strip=True)
+                    model_match = re.search(r'(?:Модель|Артикул):\s*([A-Za-z0-9-]+)', model_text)
+                    if model_match:
+                        data["model"] = model_match.group(1)
+                        break
+        
+            # Извлекаем бренд
+            for selector in self.patterns["brand"]:
+                element = soup.select_one(selector)
+                if element:
+                    brand_text = element.get_text(strip=True)
+                    brand_match = re.search(r'(?:Виробник|Бренд):\s*([A-Za-z]+)', brand_text)
+                    if brand_match:
+                        data["brand"] = brand_match.group(1)
+                        break
+        
+            # Извлекаем наличие
+            for selector in self.patterns["availability"]:
+                element = soup.select_one(selector)
+                if element:
+                    availability_text = element.get_text(strip=True).lower()
+                    data["available"] = "наявності" in availability_text
                     break
         
-        # Извлекаем название
-        for selector in self.patterns["title"]:
-            element = soup.select_one(selector)
-            if element:
-                title = element.get_text(strip=True)
-                if title:
-                    data["title"] = title
-                    break
-        
-        # Извлекаем модель
-        for selector in self.patterns["model"]:
-            element = soup.select_one(selector)
-            if element:
-                model_text = element.get_text(strip=True)
-                model_match = re.search(r'(?:Модель|Артикул):\s*([A-Za-z0-9-]+)', model_text)
-                if model_match:
-                    data["model"] = model_match.group(1)
-                    break
-        
-        # Извлекаем бренд
-        for selector in self.patterns["brand"]:
-            element = soup.select_one(selector)
-            if element:
-                brand_text = element.get_text(strip=True)
-                brand_match = re.search(r'(?:Виробник|Бренд):\s*([A-Za-z]+)', brand_text)
-                if brand_match:
-                    data["brand"] = brand_match.group(1)
-                    break
-        
-        # Извлекаем наличие
-        for selector in self.patterns["availability"]:
-            element = soup.select_one(selector)
-            if element:
-                availability_text = element.get_text(strip=True).lower()
-                data["available"] = "наявності" in availability_text
-                break
-        
         return data
 
     def learn(self, html: str, success_data: Dict[str, Any]):
@@ -2,9 +2,10 @@ import asyncio
 import json
 import logging
 from typing import Dict, List, Any
-import aiohttp
-from bs4 import BeautifulSoup
 from ..base_parser import BaseParser
+from ..normalize import parse_amount
+from ..rate_control import is_block_page
+from utils.metrics import metrics
 
 logger = logging.getLogger('parser')
 
@@ -13,6 +14,10 @@ class AliExpressParser(BaseParser):
     
     BASE_URL = "https://aliexpress.com"
     SEARCH_URL = "https://www.aliexpress.com/wholesale"
+    # Крупные выдачи разбираем напрямую через lxml, минуя дерево BeautifulSoup
+    DOM_BACKEND = "lxml"
+    # Страницы загружаются через aiohttp, браузер не нужен
+    USES_BROWSER = False
     
     def __init__(self):
         super().__init__()
@@ -35,14 +40,14 @@ class AliExpressParser(BaseParser):
                 'sortType': 'total_tranpro_desc'  # Сортировка по популярности
             }
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
+            async with self._http_session() as session:
                 async with session.get(self.SEARCH_URL, params=params) as response:
                     if response.status != 200:
                         logger.error(f"Ошибка при поиске: {response.status}")
                         return []
                     
                     html = await response.text()
-                    soup = BeautifulSoup(html, 'lxml')
+                    soup = self.parse_dom(html)
                     
                     # Ищем карточки товаров
                     product_cards = soup.select('div.product-card')[:limit]
@@ -60,15 +65,16 @@ class AliExpressParser(BaseParser):
                                 continue
                             
                             # Очищаем цену от символов валюты и форматирования
-                            price_text = price_elem.text.strip()
-                            price = float(price_text.replace('US $', '').replace(',', ''))
+                            price = parse_amount(price_elem.text())
+                            if price is None:
+                                continue
                             
                             # Формируем данные о товаре
                             product = {
-                                'title': title_elem.text.strip(),
+                                'title': title_elem.text(strip=False).strip(),
                                 'price': price,
-                                'url': link_elem['href'] if link_elem['href'].startswith('http') else self.BASE_URL + link_elem['href'],
-                                'images': [image_elem['src']] if image_elem and 'src' in image_elem.attrs else [],
+                                'url': link_elem.attr('href') if link_elem.attr('href').startswith('http') else self.BASE_URL + link_elem.attr('href'),
+                                'images': [image_elem.attr('src')] if image_elem and image_elem.attr('src') else [],
                                 'availability': 'available'  # AliExpress обычно показывает только доступные товары
                             }
                             
@@ -90,41 +96,50 @@ class AliExpressParser(BaseParser):
         try:
             logger.info(f"Парсим страницу товара: {url}")
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        logger.error(f"Ошибка при получении страницы товара: {response.status}")
-                        return {}
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'lxml')
-                    
-                    # Получаем основную информацию о товаре
-                    title = soup.select_one('h1.product-title')
-                    price = soup.select_one('div.product-price')
-                    description = soup.select_one('div.product-description')
-                    specs = soup.select('div.specification-table tr')
-                    images = soup.select('div.images-view-list img')
-                    
-                    # Собираем характеристики товара
-                    specifications = {}
-                    for row in specs:
-                        label = row.select_one('th')
-                        value = row.select_one('td')
-                        if label and value:
-                            specifications[label.text.strip()] = value.text.strip()
-                    
-                    # Формируем результат
-                    result = {
-                        'title': title.text.strip() if title else '',
-                        'price': float(price.text.replace('US $', '').replace(',', '')) if price else 0,
-                        'description': description.text.strip() if description else '',
-                        'specifications': specifications,
-                        'availability': 'available',  # AliExpress обычно показывает только доступные товары
-                        'images': [img['src'] for img in images if 'src' in img.attrs]
-                    }
-                    
-                    return result
+            async with self._http_session() as session:
+                with self._stage("fetch"):
+                    async with session.get(url) as response:
+                        if response.status != 200:
+                            logger.error(f"Ошибка при получении страницы товара: {response.status}")
+                            metrics.event("http_error", self.store_name)
+                            return {}
+                        
+                        html = await response.text()
+            
+            soup = self.parse_dom(html)
+            
+            with self._stage("extract"):
+                # Получаем основную информацию о товаре
+                title = soup.select_one('h1.product-title')
+                price = soup.select_one('div.product-price')
+                description = soup.select_one('div.product-description')
+                specs = soup.select('div.specification-table tr')
+                images = soup.select('div.images-view-list img')
+                
+                # Собираем характеристики товара
+                specifications = {}
+                for row in specs:
+                    label = row.select_one('th')
+                    value = row.select_one('td')
+                    if label and value:
+                        specifications[label.text(strip=False).strip()] = value.text(strip=False).strip()
+                
+                # Формируем результат
+                result = {
+                    'title': title.text(strip=False).strip() if title else '',
+                    'price': (parse_amount(price.text()) or 0) if price else 0,
+                    'description': description.text(strip=False).strip() if description else '',
+                    'specifications': specifications,
+                    'availability': 'available',  # AliExpress обычно показывает только доступные товары
+                    'images': [img.attr('src') for img in images if img.attr('src') is not None]
+                }
+                
+            # Страница без названия товара может оказаться капчей вместо товара
+            if not result['title'] and is_block_page(html=html):
+                self._report_block(url)
+                return {}
+            
+            return result
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы товара: {str(e)}")
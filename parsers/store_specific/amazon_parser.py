@@ -2,9 +2,10 @@ import asyncio
 import json
 import logging
 from typing import Dict, List, Any
-import aiohttp
-from bs4 import BeautifulSoup
 from ..base_parser import BaseParser
+from ..normalize import parse_amount
+from ..rate_control import is_block_page
+from utils.metrics import metrics
 
 logger = logging.getLogger('parser')
 
@@ -12,6 +13,10 @@ class AmazonParser(BaseParser):
     """Парсер для интернет-магазина Amazon"""
     
     BASE_URL = "https://www.amazon.com"
+    # Крупные выдачи разбираем напрямую через lxml, минуя дерево BeautifulSoup
+    DOM_BACKEND = "lxml"
+    # Страницы загружаются через aiohttp, браузер не нужен
+    USES_BROWSER = False
     
     def __init__(self):
         super().__init__()
@@ -33,14 +38,14 @@ class AmazonParser(BaseParser):
                 'ref': 'nb_sb_noss'
             }
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
+            async with self._http_session() as session:
                 async with session.get(search_url, params=params) as response:
                     if response.status != 200:
                         logger.error(f"Ошибка при поиске: {response.status}")
                         return []
                     
                     html = await response.text()
-                    soup = BeautifulSoup(html, 'lxml')
+                    soup = self.parse_dom(html)
                     
                     # Ищем карточки товаров
                     product_cards = soup.select('div[data-component-type="s-search-result"]')[:limit]
@@ -59,10 +64,10 @@ class AmazonParser(BaseParser):
                             
                             # Формируем данные о товаре
                             product = {
-                                'title': title_elem.text.strip(),
-                                'price': float(price_elem.text.replace(',', '')) if price_elem else 0,
-                                'url': self.BASE_URL + link_elem['href'] if link_elem['href'].startswith('/') else link_elem['href'],
-                                'images': [image_elem['src']] if image_elem else [],
+                                'title': title_elem.text(strip=False).strip(),
+                                'price': (parse_amount(price_elem.text()) or 0) if price_elem else 0,
+                                'url': self.BASE_URL + link_elem.attr('href') if link_elem.attr('href').startswith('/') else link_elem.attr('href'),
+                                'images': [image_elem.attr('src')] if image_elem else [],
                                 'availability': 'available'  # Amazon обычно показывает только доступные товары в поиске
                             }
                             
@@ -84,42 +89,51 @@ class AmazonParser(BaseParser):
         try:
             logger.info(f"Парсим страницу товара: {url}")
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        logger.error(f"Ошибка при получении страницы товара: {response.status}")
-                        return {}
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'lxml')
-                    
-                    # Получаем основную информацию о товаре
-                    title = soup.select_one('#productTitle')
-                    price = soup.select_one('#priceblock_ourprice, #priceblock_dealprice')
-                    description = soup.select_one('#productDescription p')
-                    availability = soup.select_one('#availability span')
-                    image_gallery = soup.select('#altImages img')
-                    
-                    # Получаем характеристики товара
-                    specs = {}
-                    specs_table = soup.select('#productDetails_techSpec_section_1 tr')
-                    for row in specs_table:
-                        label = row.select_one('.label')
-                        value = row.select_one('.value')
-                        if label and value:
-                            specs[label.text.strip()] = value.text.strip()
-                    
-                    # Формируем результат
-                    result = {
-                        'title': title.text.strip() if title else '',
-                        'price': float(price.text.replace('$', '').replace(',', '')) if price else 0,
-                        'description': description.text.strip() if description else '',
-                        'specifications': specs,
-                        'availability': availability.text.strip() if availability else 'unknown',
-                        'images': [img['src'] for img in image_gallery if 'src' in img.attrs]
-                    }
-                    
-                    return result
+            async with self._http_session() as session:
+                with self._stage("fetch"):
+                    async with session.get(url) as response:
+                        if response.status != 200:
+                            logger.error(f"Ошибка при получении страницы товара: {response.status}")
+                            metrics.event("http_error", self.store_name)
+                            return {}
+                        
+                        html = await response.text()
+            
+            soup = self.parse_dom(html)
+            
+            with self._stage("extract"):
+                # Получаем основную информацию о товаре
+                title = soup.select_one('#productTitle')
+                price = soup.select_one('#priceblock_ourprice, #priceblock_dealprice')
+                description = soup.select_one('#productDescription p')
+                availability = soup.select_one('#availability span')
+                image_gallery = soup.select('#altImages img')
+                
+                # Получаем характеристики товара
+                specs = {}
+                specs_table = soup.select('#productDetails_techSpec_section_1 tr')
+                for row in specs_table:
+                    label = row.select_one('.label')
+                    value = row.select_one('.value')
+                    if label and value:
+                        specs[label.text(strip=False).strip()] = value.text(strip=False).strip()
+                
+                # Формируем результат
+                result = {
+                    'title': title.text(strip=False).strip() if title else '',
+                    'price': (parse_amount(price.text()) or 0) if price else 0,
+                    'description': description.text(strip=False).strip() if description else '',
+                    'specifications': specs,
+                    'availability': availability.text(strip=False).strip() if availability else 'unknown',
+                    'images': [img.attr('src') for img in image_gallery if img.attr('src') is not None]
+                }
+                
+            # Страница без названия товара может оказаться капчей вместо товара
+            if not result['title'] and is_block_page(html=html):
+                self._report_block(url)
+                return {}
+            
+            return result
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы товара: {str(e)}")
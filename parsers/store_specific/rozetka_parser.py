@@ -1,20 +1,9 @@
 from typing import List, Dict, Optional, Any
-from bs4 import BeautifulSoup
-import re
-from ..base_parser import BaseParser, ProductInfo, ProductPrice
-import urllib.parse
+from ..base_parser import BaseParser, ProductInfo
+from ..normalize import parse_amount
 import asyncio
 import json
-import requests
 from utils.log import logger
-from playwright.async_api import async_playwright
-import aiohttp
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException
 
 class RozetkaParser(BaseParser):
     """Парсер для интернет-магазина Rozetka"""
@@ -29,12 +18,6 @@ class RozetkaParser(BaseParser):
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         }
-        
-        # Настройка Chrome
-        self.chrome_options = Options()
-        self.chrome_options.add_argument('--headless')  # Запуск в фоновом режиме
-        self.chrome_options.add_argument('--no-sandbox')
-        self.chrome_options.add_argument('--disable-dev-shm-usage')
     
     async def search_products(self, query: str, limit: int = 5) -> List[Dict]:
         """Поиск товаров по запросу"""
@@ -51,7 +34,7 @@ class RozetkaParser(BaseParser):
                 'per_page': limit
             }
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
+            async with self._http_session() as session:
                 async with session.get(self.API_URL, params=params) as response:
                     if response.status != 200:
                         logger.error(f"Ошибка API: {response.status}")
@@ -88,12 +71,7 @@ class RozetkaParser(BaseParser):
     
     def _clean_price(self, price_str: str) -> Optional[float]:
         """Очистка и преобразование строки с ценой в число"""
-        try:
-            # Удаляем все символы кроме цифр и точки
-            clean_price = re.sub(r'[^\d.]', '', price_str)
-            return float(clean_price)
-        except (ValueError, TypeError):
-            return None
+        return parse_amount(price_str)
     
     async def parse_product_page(self, url: str) -> ProductInfo:
         """
@@ -107,83 +85,84 @@ class RozetkaParser(BaseParser):
         """
         print(f"\nПарсинг страницы товара: {url}")
         
-        page = await self.context.new_page()
         try:
-            await page.goto(url, wait_until='networkidle', timeout=30000)
-            await asyncio.sleep(5)  # Даем время на загрузку динамического контента
-            
-            # Получаем название
-            title = None
-            for selector in ['.product__title', '.product-header__title']:
-                element = await page.query_selector(selector)
-                if element:
-                    title = await element.text_content()
-                    title = self.clean_text(title)
-                    break
-            
-            # Получаем описание
-            description = ""
-            for selector in ['.product-about__description', '.product-about__description-content']:
-                element = await page.query_selector(selector)
-                if element:
-                    description = await element.text_content()
-                    description = self.clean_text(description)
-                    break
-            
-            # Получаем цену
-            price = None
-            for selector in ['.product-price__big', '.product-price__value']:
-                element = await page.query_selector(selector)
-                if element:
-                    price_text = await element.text_content()
-                    price = self.extract_price(price_text)
-                    if price:
-                        break
-            
-            # Получаем изображения
-            images = []
-            for selector in ['.product-photo__picture img', '.product__photo img']:
-                elements = await page.query_selector_all(selector)
-                for img in elements:
-                    src = await img.get_attribute('src')
-                    if src:
-                        images.append(src)
-            
-            # Получаем характеристики
-            specifications = {}
-            for selector in ['.characteristics-full__item', '.product-characteristics__item']:
-                spec_elements = await page.query_selector_all(selector)
-                for spec in spec_elements:
-                    name_element = await spec.query_selector('.characteristics-full__name, .product-characteristics__name')
-                    value_element = await spec.query_selector('.characteristics-full__value, .product-characteristics__value')
-                    
-                    if name_element and value_element:
-                        name = await name_element.text_content()
-                        value = await value_element.text_content()
-                        name = self.clean_text(name)
-                        value = self.clean_text(value)
-                        specifications[name] = value
-            
-            # Проверяем наличие
-            available = False
-            for selector in ['.product-status--available', '.product__status--green']:
-                element = await page.query_selector(selector)
-                if element:
-                    available = True
-                    break
-            
-            return ProductInfo(
-                title=title,
-                description=description,
-                url=url,
-                price=price,
-                images=images,
-                available=available,
-                specifications=specifications
-            )
+            async with self._page(url) as page:
+                with self._stage("goto"):
+                    await self._goto(page, url, wait_until='networkidle', timeout=30000)
+                with self._stage("settle"):
+                    await asyncio.sleep(5)  # Даем время на загрузку динамического контента
+                
+                with self._stage("extract"):
+                    # Получаем название
+                    title = None
+                    for selector in ['.product__title', '.product-header__title']:
+                        element = await page.query_selector(selector)
+                        if element:
+                            title = await element.text_content()
+                            title = self.clean_text(title)
+                            break
+                
+                    # Получаем описание
+                    description = ""
+                    for selector in ['.product-about__description', '.product-about__description-content']:
+                        element = await page.query_selector(selector)
+                        if element:
+                            description = await element.text_content()
+                            description = self.clean_text(description)
+                            break
+                
+                    # Получаем цену
+                    price = None
+                    for selector in ['.product-price__big', '.product-price__value']:
+                        element = await page.query_selector(selector)
+                        if element:
+                            price_text = await element.text_content()
+                            price = self.extract_price(price_text)
+                            if price:
+                                break
+                
+                    # Получаем изображения
+                    images = []
+                    for selector in ['.product-photo__picture img', '.product__photo img']:
+                        elements = await page.query_selector_all(selector)
+                        for img in elements:
+                            src = await img.get_attribute('src')
+                            if src:
+                                images.append(src)
+                
+                    # Получаем характеристики
+                    specifications = {}
+                    for selector in ['.characteristics-full__item', '.product-characteristics__item']:
+                        spec_elements = await page.query_selector_all(selector)
+                        for spec in spec_elements:
+                            name_element = await spec.query_selector('.characteristics-full__name, .product-characteristics__name')
+                            value_element = await spec.query_selector('.characteristics-full__value, .product-characteristics__value')
+                
+                            if name_element and value_element:
+                                name = await name_element.text_content()
+                                value = await value_element.text_content()
+                                name = self.clean_text(name)
+                                value = self.clean_text(value)
+                                specifications[name] = value
+                
+                    # Проверяем наличие
+                    available = False
+                    for selector in ['.product-status--available', '.product__status--green']:
+                        element = await page.query_selector(selector)
+                        if element:
+                            available = True
+                            break
+                
+                return ProductInfo(
+                    title=title,
+                    description=description,
+                    url=url,
+                    price=price,
+                    images=images,
+                    available=available,
+                    specifications=specifications
+                )
             
         except Exception as e:
             print(f"Ошибка при парсинге товара: {e}")
             return None
-        finally:
-            await page.close() 
\ No newline at end of file
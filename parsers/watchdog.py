@@ -0,0 +1,230 @@
+"""
+Контроль памяти браузера при долгих обходах.
+
+BrowserWatchdog периодически снимает показатели: резидентную память всех
+процессов Chromium (список процессов - через CDP SystemInfo.getProcessInfo,
+RSS - из /proc), JS-кучу и число открытых страниц каждого контекста пула.
+Контекст, превысивший пределы, выводится из пула без прерывания работы:
+свободный закрывается сразу, выданный - после возврата. Если растет сам
+браузер, он пересоздается владельцем (ParserRouter.recycle_browser): новые
+контексты строятся уже в новом браузере, старый закрывается, когда в нем не
+останется выданных контекстов.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from parsers.browser_pool import ContextPool, PooledContext, js_heap_mb
+from utils.metrics import BROWSER_PAGES_METRIC, BROWSER_RSS_METRIC, CONTEXT_HEAP_METRIC, metrics
+
+logger = logging.getLogger('parser')
+
+
+def process_rss_mb(pid: int) -> Optional[float]:
+    """
+    Резидентная память процесса в МБ (VmRSS из /proc; только Linux)
+
+    Args:
+        pid (int): Идентификатор процесса
+
+    Returns:
+        Optional[float]: RSS или None, если процесс не найден или /proc недоступен
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii", errors="ignore") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+class BrowserWatchdog:
+    """
+    Сторож памяти браузера и пула контекстов.
+
+    Пример:
+        watchdog = BrowserWatchdog(pool, lambda: router.browser, router.recycle_browser,
+                                   max_browser_rss_mb=2048)
+        watchdog.start()
+        ...
+        await watchdog.stop()
+    """
+
+    def __init__(self, pool: ContextPool, browser_getter: Callable[[], Any],
+                 recycle_browser: Optional[Callable[[], Awaitable[Any]]] = None, interval: float = 30.0,
+                 max_browser_rss_mb: Optional[float] = 2048.0, max_context_heap_mb: Optional[float] = 512.0,
+                 max_context_pages: Optional[int] = 10, max_context_age: Optional[float] = None):
+        """
+        Args:
+            pool (ContextPool): Пул контекстов
+            browser_getter (Callable[[], Optional[Browser]]): Текущий браузер без запуска (None - не запущен)
+            recycle_browser (Optional[Callable[[], Awaitable]]): Пересоздание браузера; None - браузер не трогать
+            interval (float): Период проверки, секунды
+            max_browser_rss_mb (Optional[float]): Предел RSS всех процессов браузера, МБ
+            max_context_heap_mb (Optional[float]): Предел суммарной JS-кучи страниц контекста, МБ
+            max_context_pages (Optional[int]): Предел одновременно открытых страниц контекста
+                (обычно признак утечки вкладок)
+            max_context_age (Optional[float]): Предельный возраст контекста, секунды
+        """
+        self.pool = pool
+        self.browser_getter = browser_getter
+        self.recycle_browser = recycle_browser
+        self.interval = interval
+        self.max_browser_rss_mb = max_browser_rss_mb
+        self.max_context_heap_mb = max_context_heap_mb
+        self.max_context_pages = max_context_pages
+        self.max_context_age = max_context_age
+
+        self._task: Optional[asyncio.Task] = None
+        self._cdp_sessions: Dict[int, Any] = {}
+        self._last: Dict[str, Any] = {}
+        self._stats = Counter()
+
+    def start(self) -> "BrowserWatchdog":
+        """Запускает периодическую проверку в фоне"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def stop(self):
+        """Останавливает проверку"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._cdp_sessions.clear()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Ошибка проверки памяти браузера: {e}")
+
+    async def check(self) -> Dict[str, Any]:
+        """
+        Снимает показатели и выводит из работы контексты и браузер, превысившие пределы
+
+        Returns:
+            Dict[str, Any]: Показатели (см. metrics)
+        """
+        started = time.perf_counter()
+        pooled_contexts = self.pool.contexts()
+        contexts = [await self._sample_context(pooled) for pooled in pooled_contexts]
+        browser = self.browser_getter()
+        browser_rss = await self.browser_rss_mb(browser) if browser is not None else None
+
+        for pooled, sample in zip(pooled_contexts, contexts):
+            reason = self._context_over_limit(sample)
+            if reason is not None and pooled.retire_reason is None:
+                logger.info(f"Контекст браузера выводится из пула ({reason}): {sample}")
+                self._stats[f"context_recycled:{reason}"] += 1
+                self.pool.drain(pooled, reason)
+
+        if (browser_rss is not None and self.max_browser_rss_mb
+                and browser_rss > self.max_browser_rss_mb and self.recycle_browser is not None):
+            logger.warning(f"Браузер занимает {browser_rss:.0f} МБ (предел {self.max_browser_rss_mb:.0f}), "
+                           f"пересоздаем")
+            self._stats["browser_recycled"] += 1
+            self._cdp_sessions.pop(id(browser), None)
+            await self.recycle_browser()
+
+        self._stats["checks"] += 1
+        self._publish(browser_rss, contexts)
+        self._last = {
+            "browser_rss_mb": browser_rss,
+            "contexts": contexts,
+            "open_pages": sum(sample["open_pages"] for sample in contexts),
+            "check_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return self.metrics()
+
+    @staticmethod
+    def _publish(browser_rss: Optional[float], contexts: List[Dict[str, Any]]):
+        """Публикует замеры как gauge в utils.metrics (контексты - по номеру в пуле)"""
+        if not metrics.enabled:
+            return
+        if browser_rss is not None:
+            metrics.set_gauge(BROWSER_RSS_METRIC, browser_rss * 1024 * 1024)
+        metrics.set_gauge(BROWSER_PAGES_METRIC, sum(sample["open_pages"] for sample in contexts))
+        metrics.clear_gauge(CONTEXT_HEAP_METRIC)
+        for slot, sample in enumerate(contexts):
+            if sample["js_heap_mb"] is not None:
+                metrics.set_gauge(CONTEXT_HEAP_METRIC, sample["js_heap_mb"] * 1024 * 1024, context=slot)
+
+    async def _sample_context(self, pooled: PooledContext) -> Dict[str, Any]:
+        try:
+            pages = list(pooled.context.pages)
+        except Exception:
+            pages = []
+        heaps = [heap for heap in [await js_heap_mb(page) for page in pages] if heap is not None]
+        if heaps:
+            pooled.js_heap_mb = sum(heaps)
+        return {
+            "fingerprint": pooled.fingerprint.user_agent,
+            "open_pages": len(pages),
+            "pages_served": pooled.pages_served,
+            "js_heap_mb": pooled.js_heap_mb,
+            "age": round(time.monotonic() - pooled.created_at, 1),
+            "retiring": pooled.retire_reason,
+        }
+
+    def _context_over_limit(self, sample: Dict[str, Any]) -> Optional[str]:
+        if self.max_context_pages and sample["open_pages"] > self.max_context_pages:
+            return "open_pages"
+        if self.max_context_heap_mb and sample["js_heap_mb"] and sample["js_heap_mb"] > self.max_context_heap_mb:
+            return "memory"
+        if self.max_context_age and sample["age"] > self.max_context_age:
+            return "age"
+        return None
+
+    async def browser_pids(self, browser) -> List[int]:
+        """
+        Идентификаторы всех процессов браузера (браузер, рендереры, GPU, утилиты)
+
+        Args:
+            browser: Браузер playwright (Chromium)
+
+        Returns:
+            List[int]: PID процессов; пустой список, если CDP недоступен
+        """
+        try:
+            session = self._cdp_sessions.get(id(browser))
+            if session is None:
+                session = await browser.new_browser_cdp_session()
+                self._cdp_sessions[id(browser)] = session
+            info = await session.send("SystemInfo.getProcessInfo")
+        except Exception as e:
+            logger.debug(f"SystemInfo.getProcessInfo недоступен: {e}")
+            self._cdp_sessions.pop(id(browser), None)
+            return []
+        return [process["id"] for process in info.get("processInfo", []) if process.get("id")]
+
+    async def browser_rss_mb(self, browser) -> Optional[float]:
+        """
+        Суммарная резидентная память процессов браузера, МБ
+
+        Args:
+            browser: Браузер playwright
+
+        Returns:
+            Optional[float]: RSS или None, если измерить не удалось
+        """
+        sizes = [size for size in map(process_rss_mb, await self.browser_pids(browser)) if size is not None]
+        return sum(sizes) if sizes else None
+
+    def metrics(self) -> Dict[str, Any]:
+        """Последние показатели, счетчики сторожа и пула"""
+        return {
+            **self._last,
+            **self._stats,
+            "pool": self.pool.stats(),
+        }
@@ -0,0 +1,43 @@
+"""Индекс центроидов категорий: дообучение и идентичность для кэша"""
+import numpy as np
+
+from ai.category_index import CategoryIndex
+
+TITLES = ["Смартфон Samsung Galaxy S24", "Ноутбук Lenovo IdeaPad", "Смартфон Xiaomi Redmi", "Чехол для iPhone"]
+LABELS = ["smartphone", "laptop", "smartphone", "accessory"]
+
+
+def test_partial_fit_sums_features_by_category():
+    index = CategoryIndex(n_features=2 ** 10).fit(TITLES[:2], LABELS[:2])
+    index.partial_fit(TITLES[2:], LABELS[2:])
+
+    features = index.transform(TITLES).toarray()
+    for row, label in enumerate(index.labels):
+        members = [position for position, value in enumerate(LABELS) if value == label]
+        np.testing.assert_allclose(index._sums[row].toarray()[0], features[members].sum(axis=0), rtol=1e-5)
+    assert index._counts.tolist() == [2, 1, 1]
+    assert index.predict(["Смартфон Samsung Galaxy A55"])[0][0] == "smartphone"
+
+
+def test_fingerprint_ignores_partial_fit(tmp_path):
+    index = CategoryIndex(n_features=2 ** 10).fit(TITLES[:2], LABELS[:2])
+    before = index.fingerprint()
+    index.partial_fit(TITLES[2:], LABELS[2:])
+    assert index.fingerprint() == before
+
+    path = str(tmp_path / "index.npz")
+    CategoryIndex(n_features=2 ** 10, version="2").fit(TITLES, LABELS).save(path)
+    loaded = CategoryIndex.load(path)
+    assert loaded.version == "2"
+    assert loaded.fingerprint() != before
+
+
+def test_storage_grows_with_ngrams_not_features(tmp_path):
+    index = CategoryIndex().fit(TITLES, LABELS)
+    # Плотные строки весили бы n_features * 4 байта на категорию
+    assert index._sums.nnz < 500 and index._centroids.nnz == index._sums.nnz
+
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = CategoryIndex.load(path)
+    np.testing.assert_allclose(loaded.scores(TITLES), index.scores(TITLES), rtol=1e-6)
@@ -0,0 +1,66 @@
+"""Подготовка описаний к NER: удаление шаблонных фраз, нарезка и ошибки токенизатора"""
+import re
+
+from ai.chunking import ChunkingConfig, chunk_text, strip_boilerplate
+from ai.classifier import ProductClassifier
+
+
+class WordTokenizer:
+    """Токенизатор по словам с offset_mapping; падает на тексте со словом "сбой" """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        self.calls += 1
+        if "сбой" in text:
+            raise ValueError("токенизатор без offset_mapping")
+        return {"offset_mapping": [match.span() for match in re.finditer(r'\S+', text)]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class FakeNer:
+    task = "ner"
+
+    def __init__(self):
+        self.tokenizer = WordTokenizer()
+        self.calls = []
+
+    def __call__(self, texts, batch_size):
+        self.calls.append(list(texts))
+        return [[{"word": text.split()[0], "entity_group": "MISC", "score": 0.9, "start": 0,
+                  "end": len(text.split()[0])}] for text in texts]
+
+
+def test_seo_title_with_buy_is_kept():
+    text = ("Купить смартфон Samsung Galaxy S24 8/256 ГБ в Киеве. "
+            "Быстрая доставка по всей Украине. Купить недорого в кошик!")
+    assert strip_boilerplate(text) == "Купить смартфон Samsung Galaxy S24 8/256 ГБ в Киеве."
+
+
+def test_pure_boilerplate_is_dropped():
+    text = "Экран 6,2 дюйма. Оплата при получении. Подробнее на www.example.com/phone"
+    assert strip_boilerplate(text) == "Экран 6,2 дюйма."
+
+
+def test_chunk_lengths_come_from_single_tokenization():
+    tokenizer = WordTokenizer()
+    text = " ".join(f"w{index}" for index in range(20))
+    chunks = chunk_text(text, tokenizer, ChunkingConfig(max_tokens=12, stride=2))
+
+    assert tokenizer.calls == 1
+    assert [chunk.tokens for chunk in chunks] == [len(chunk.text.split()) for chunk in chunks]
+    assert chunks[0].offset == 0 and chunks[-1].text.endswith("w19")
+
+
+def test_tokenizer_error_fails_only_its_item(monkeypatch):
+    ner = FakeNer()
+    monkeypatch.setattr(ProductClassifier, "ner", property(lambda self: ner))
+    outputs = ProductClassifier()._ner_outputs(["Чехол Spigen", "сбой токенизатора", "Кабель USB-C"], 4)
+
+    assert outputs[1] is None
+    assert [entity["word"] for entity in outputs[0]] == ["Чехол"]
+    assert [entity["word"] for entity in outputs[2]] == ["Кабель"]
+    assert ner.calls == [["Чехол Spigen", "Кабель USB-C"]]
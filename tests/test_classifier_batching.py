@@ -0,0 +1,31 @@
+"""Батчи инференса: группировка по длине и разбор упавшего батча по одному тексту"""
+from ai.classifier import ProductClassifier
+
+
+class FakePipeline:
+    """Pipeline, который падает на любом батче с текстом "bad" """
+
+    task = "text-classification"
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size):
+        self.calls.append(list(texts))
+        if "bad" in texts:
+            raise ValueError("плохой текст")
+        return [{"label": text, "score": 1.0} for text in texts]
+
+
+def test_length_buckets_sort_by_length():
+    texts = ["aaaa", "a", "aaa", "aa"]
+    assert ProductClassifier._length_buckets(texts, 2) == [[1, 3], [2, 0]]
+
+
+def test_failed_batch_falls_back_to_single_items():
+    pipeline = FakePipeline()
+    texts = ["one", "bad", "two", "three"]
+    results = ProductClassifier()._run_batched(pipeline, texts, 4, "Ошибка")
+
+    assert [result and result["label"] for result in results] == ["one", None, "two", "three"]
+    assert len(pipeline.calls) == 1 + len(texts)
@@ -0,0 +1,119 @@
+"""
+Бэкенды DOM bs4 и lxml должны извлекать из сохраненных страниц магазинов одно и то же.
+
+Запуск:
+    python -m pytest tests
+"""
+import asyncio
+import os
+
+import pytest
+
+from parsers.dom import DomNode, parse_html
+from parsers.replay import RECORD, NetworkSession, NetworkStore
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "fixtures")
+BACKENDS = ("bs4", "lxml")
+
+# Селекторы, которыми пользуются экстракторы магазинов (для Rozetka - селекторы query_selector)
+STORE_SELECTORS = {
+    "lugi": [
+        "h1.product-name", "h1.product-title", "h1.name", "h1[itemprop='name']", ".product-name h1", "#product h1",
+        ".autocalc-product-price", "#tab-description", ".image a img", ".additional-images img",
+        "#tab-specification tr", "#tab-specification td", ".stock-status", "#button-cart", ".product-layout",
+    ],
+    "rozetka": [
+        ".product__title", ".product-header__title", ".product-about__description",
+        ".product-about__description-content", ".product-price__big", ".product-price__value",
+        ".product-photo__picture img", ".product__photo img", ".characteristics-full__item",
+        ".product-characteristics__item",
+    ],
+    "amazon": [
+        "#productTitle", "#priceblock_ourprice, #priceblock_dealprice", "#productDescription p",
+        "#availability span", "#altImages img", "#productDetails_techSpec_section_1 tr",
+        "#productDetails_techSpec_section_1 tr .label", "#productDetails_techSpec_section_1 tr .value",
+        'div[data-component-type="s-search-result"]', "img.s-image",
+    ],
+    "aliexpress": [
+        "h1.product-title", "div.product-price", "div.product-description", "div.specification-table tr",
+        "div.specification-table th", "div.specification-table td", "div.images-view-list img",
+    ],
+}
+
+# Парсеры с HTTP-загрузкой: страница воспроизводится из хранилища parsers.replay
+HTTP_STORES = {
+    "amazon": ("parsers.store_specific.amazon_parser", "AmazonParser", "https://www.amazon.com/dp/B09XS7JWHH"),
+    "aliexpress": ("parsers.store_specific.aliexpress_parser", "AliExpressParser",
+                   "https://aliexpress.ru/item/1005006203.html"),
+}
+
+
+def fixture(store: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, f"{store}_product.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+def describe(root: DomNode, selectors):
+    """Все, что экстрактор может прочитать по селекторам: текст в обоих режимах и атрибуты"""
+    found = {}
+    for selector in selectors:
+        found[selector] = [
+            (node.text(), node.text(strip=False), node.attr("class"), node.attr("src"), node.attr("href"),
+             node.attr("data-additional-hover"))
+            for node in root.select(selector)
+        ]
+    return found
+
+
+def with_backend(parser_class, backend: str):
+    return type(f"{parser_class.__name__}_{backend}", (parser_class,), {"DOM_BACKEND": backend})
+
+
+def test_dom_node_is_abstract():
+    with pytest.raises(TypeError):
+        DomNode()
+
+
+@pytest.mark.parametrize("store", sorted(STORE_SELECTORS))
+def test_fixture_selectors_match(store):
+    html = fixture(store)
+    results = {backend: describe(parse_html(html, backend, "html.parser"), STORE_SELECTORS[store])
+               for backend in BACKENDS}
+    assert any(results["bs4"].values()), f"селекторы {store} ничего не нашли"
+    assert results["bs4"] == results["lxml"]
+
+
+@pytest.mark.parametrize("regions", [None, "product"], ids=["full", "regions"])
+def test_lugi_standard_parse_backends(regions):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    html = fixture("lugi")
+    results = {}
+    for backend in BACKENDS:
+        parser = with_backend(LUGIParser, backend)()
+        if regions is None:
+            parser.PRODUCT_REGIONS = None
+        results[backend] = asyncio.run(parser._standard_parse(html))
+    assert results["bs4"]["title"] and results["bs4"]["price"]
+    assert results["bs4"] == results["lxml"]
+
+
+@pytest.mark.parametrize("store", sorted(HTTP_STORES))
+def test_http_store_backends(store, tmp_path):
+    import importlib
+
+    module, class_name, url = HTTP_STORES[store]
+    parser_class = getattr(importlib.import_module(module), class_name)
+    html = fixture(store)
+
+    async def parse(backend: str):
+        network = NetworkStore(str(tmp_path / backend), RECORD)
+        network.record("GET", url, 200, [("Content-Type", "text/html; charset=utf-8")], html.encode("utf-8"))
+        parser = with_backend(parser_class, backend)()
+        parser.session = NetworkSession(network)
+        parser._entered = True
+        return await parser.parse_product_page(url)
+
+    results = {backend: asyncio.run(parse(backend)) for backend in BACKENDS}
+    assert results["bs4"]["title"]
+    assert results["bs4"] == results["lxml"]
@@ -0,0 +1,49 @@
+"""Извлечение характеристик: перекрывающиеся совпадения разных шаблонов не теряются"""
+import re
+
+import pytest
+
+from ai.feature_extractor import FeatureExtractor, ProductFeature
+
+TEXTS = [
+    "Смартфон 8 на 128 ГБ, экран 6,1\" и камера 50 Мп",
+    "Память 8 x 256 GB, аккумулятор 5000 мАч",
+    "Ноутбук 16GB/1TB, 15.6 дюйм, 1920x1080, цвет: черный",
+    "Планшет 4 на 64 ГБ, колір: сірий",
+    "Без характеристик",
+]
+
+
+def reference_features(extractor, text):
+    """Исходная реализация: re.finditer по каждому шаблону отдельно"""
+    features = []
+    for feature_type, patterns in extractor.patterns.items():
+        for pattern in patterns:
+            for match in re.finditer(pattern, text, re.IGNORECASE):
+                if feature_type == "resolution":
+                    value = f"{match.group(1)}x{match.group(2)}"
+                    unit = "pixels"
+                else:
+                    value = match.group(1)
+                    unit = match.group(2) if len(match.groups()) > 1 else None
+                if unit in extractor.unit_normalizers:
+                    unit = extractor.unit_normalizers[unit]
+                features.append(ProductFeature(name=feature_type, value=value, unit=unit))
+    return features
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_matches_reference(text):
+    extractor = FeatureExtractor()
+    assert extractor.extract_features(text) == reference_features(extractor, text)
+
+
+def test_memory_and_resolution_overlap():
+    features = FeatureExtractor().extract_features("8 на 128 ГБ")
+    assert ProductFeature(name="memory", value="128", unit="GB") in features
+    assert ProductFeature(name="resolution", value="8x128", unit="pixels") in features
+
+
+def test_units_normalized_in_any_case():
+    features = FeatureExtractor().extract_features("128 гб, 5000 МАЧ")
+    assert [(feature.value, feature.unit) for feature in features] == [("128", "GB"), ("5000", "mAh")]
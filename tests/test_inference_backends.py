@@ -0,0 +1,73 @@
+"""
+Бэкенды инференса int8 и onnx должны отвечать так же, как fp32 torch.
+Модели - крошечные BERT, собранные локально в tmp_path; без torch и transformers
+(и без optimum для onnx) тесты пропускаются.
+"""
+import re
+
+import pytest
+
+TEXTS = [
+    "Смартфон Samsung Galaxy S24 8/256 ГБ, черный",
+    "Ноутбук Lenovo IdeaPad 5 16 ГБ, 15.6 дюйм",
+    "Бездротові навушники JBL Tune 520BT",
+    "Телевизор LG 55 4K Smart TV",
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_models(tmp_path_factory):
+    """Каталоги маленьких моделей классификации и NER с общим словарем"""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+
+    directory = tmp_path_factory.mktemp("tiny-models")
+    words = sorted({word for text in TEXTS for word in re.findall(r'\w+|[^\w\s]', text.lower())})
+    vocab_file = directory / "vocab.txt"
+    vocab_file.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *words]), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(vocab_file=str(vocab_file), do_lower_case=True, strip_accents=False)
+
+    def build(model_class, labels, bias):
+        torch.manual_seed(0)
+        config = transformers.BertConfig(
+            vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+            intermediate_size=64, max_position_embeddings=128, initializer_range=0.2,
+            id2label=dict(enumerate(labels)), label2id={label: index for index, label in enumerate(labels)}
+        )
+        model = model_class(config).eval()
+        # Запас между классами: проверяется согласие чисел, а не то, как бэкенды разрешают ничьи
+        with torch.no_grad():
+            model.classifier.bias.copy_(torch.tensor(bias))
+        path = directory / model_class.__name__
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+        return str(path)
+
+    return (
+        build(transformers.BertForSequenceClassification, ["phone", "other"], [1.5, 0.0]),
+        build(transformers.BertForTokenClassification, ["O", "B-PRODUCT", "I-PRODUCT"], [0.0, 1.5, 0.0]),
+    )
+
+
+def check_agreement(report):
+    assert report["label_agreement"] == 1.0
+    assert report["mean_score_delta"] < 0.05
+    # Квантизация может сдвинуть границу отдельной сущности
+    assert report["entity_f1"] >= 0.9
+
+
+def test_int8_agrees_with_torch(tiny_models):
+    from ai.backend_benchmark import compare_backends
+
+    classifier_model, ner_model = tiny_models
+    report = compare_backends(TEXTS, ("int8",), classifier_model=classifier_model, ner_model=ner_model, repeats=1)
+    check_agreement(report["int8"])
+
+
+def test_onnx_agrees_with_torch(tiny_models):
+    pytest.importorskip("optimum.onnxruntime")
+    from ai.backend_benchmark import compare_backends
+
+    classifier_model, ner_model = tiny_models
+    report = compare_backends(TEXTS, ("onnx",), classifier_model=classifier_model, ner_model=ner_model, repeats=1)
+    check_agreement(report["onnx"])
@@ -0,0 +1,46 @@
+"""Кэш инференса: идентичность модели входит в ключ, записи других идентичностей не удаляются"""
+from types import SimpleNamespace
+
+from ai.cache import InferenceCache
+
+
+def test_other_identity_does_not_evict(tmp_path):
+    cache = InferenceCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("analyze:ru", "A", ["телефон"], [{"model": "A"}])
+
+    assert cache.get_many("analyze:ru", "B", ["телефон"]) == [None]
+    cache.put_many("analyze:ru", "B", ["телефон"], [{"model": "B"}])
+    assert cache.get_many("analyze:ru", "A", ["телефон"]) == [{"model": "A"}]
+    cache.close()
+
+    reopened = InferenceCache(str(tmp_path / "cache.sqlite"))
+    assert reopened.get_many("analyze:ru", "A", ["телефон"]) == [{"model": "A"}]
+    assert reopened.get_many("analyze:ru", "B", ["телефон"]) == [{"model": "B"}]
+
+
+def test_prune_removes_only_stale_identities(tmp_path):
+    cache = InferenceCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many("analyze:ru", "old", ["телефон"], [1])
+    cache.put_many("analyze:ru", "new", ["телефон"], [2])
+    cache._db.execute("UPDATE models SET last_used = 0 WHERE identity = 'old'")
+
+    assert cache.prune(max_age_days=1) == 1
+    cache._memory.clear()
+    assert cache.get_many("analyze:ru", "old", ["телефон"]) == [None]
+    assert cache.get_many("analyze:ru", "new", ["телефон"]) == [2]
+
+
+def test_sync_and_service_paths_share_identity():
+    from ai.cascade import CascadeConfig
+    from ai.chunking import ChunkingConfig
+    from ai.classifier import ProductClassifier
+
+    classifier = ProductClassifier()
+    service = SimpleNamespace(backend="torch", cascade_config=CascadeConfig(), chunking=ChunkingConfig(),
+                              category_index=None)
+    sync = classifier._analyze_identity(classifier.backend, classifier.cascade.config, classifier.chunking,
+                                        classifier.category_index)
+    service_identity = classifier._analyze_identity(service.backend, service.cascade_config, service.chunking,
+                                                    service.category_index)
+    assert sync == service_identity
+    assert sync != classifier._analyze_identity("onnx", service.cascade_config, service.chunking, None)
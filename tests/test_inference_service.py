@@ -0,0 +1,26 @@
+"""Остановка сервиса инференса не оставляет вызывающий код ждать вечно"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ai.service import InferenceService
+
+
+def test_stop_fails_batch_being_collected():
+    async def run():
+        service = InferenceService(workers=1, max_batch=4, preload=False)
+        # Сервис без процессов: диспетчер собрал батч и ждет свободный процесс
+        service._executor = ThreadPoolExecutor(1)
+        service._queue = asyncio.Queue()
+        service._slots = asyncio.Semaphore(0)
+        service._dispatcher = asyncio.create_task(service._dispatch())
+
+        submitted = [asyncio.create_task(service.submit(text)) for text in ("a", "b", "c")]
+        await asyncio.sleep(0.05)
+        assert service._queue.empty()
+
+        await service.stop()
+        return await asyncio.wait_for(asyncio.gather(*submitted, return_exceptions=True), 1)
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,48 @@
+"""Экспорт артефактов моделей: каталог появляется только целиком"""
+import os
+
+from ai.classifier import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+
+    def save_pretrained(self, directory: str):
+        with open(os.path.join(directory, f"{self.name}.safetensors"), "w") as f:
+            f.write(self.name)
+        if self.fail:
+            raise OSError("диск заполнен")
+
+
+def test_failed_export_leaves_no_partial_artifact(tmp_path):
+    path = str(tmp_path / "model")
+    try:
+        ModelRegistry._save_artifact(path, "*.safetensors", FakeModel("weights", fail=True))
+    except OSError:
+        pass
+    assert not os.path.exists(path)
+    assert os.listdir(tmp_path) == []
+
+
+def test_existing_export_is_kept(tmp_path):
+    path = str(tmp_path / "model")
+    ModelRegistry._save_artifact(path, "*.safetensors", FakeModel("first"))
+    ModelRegistry._save_artifact(path, "*.safetensors", FakeModel("second"))
+    assert sorted(os.listdir(path)) == ["first.safetensors"]
+    assert os.listdir(tmp_path) == ["model"]
+
+
+def test_leftover_partial_export_is_replaced(tmp_path):
+    path = tmp_path / "model"
+    path.mkdir()
+    (path / "config.json").write_text("{}")
+    ModelRegistry._save_artifact(str(path), "*.safetensors", FakeModel("weights"))
+    assert sorted(os.listdir(path)) == ["weights.safetensors"]
+
+
+def test_service_does_not_fork():
+    from ai.service import InferenceService
+
+    assert InferenceService().start_method in ("forkserver", "spawn")
@@ -0,0 +1,112 @@
+"""
+Ошибки страниц браузера: предел домена снижает только ошибка навигации (page.goto),
+а таймаут ожидания селектора - это ошибка разбора
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from parsers.rate_control import RateController
+
+
+class PlaywrightTimeout(Exception):
+    """Как playwright TimeoutError: распознается по имени класса"""
+
+
+PlaywrightTimeout.__name__ = "TimeoutError"
+
+
+class FakePage:
+    url = "https://lugi.com.ua/phone"
+    main_frame = object()
+
+    def __init__(self, fail_goto=False, fail_selector=False):
+        self.fail_goto = fail_goto
+        self.fail_selector = fail_selector
+
+    def on(self, event, handler):
+        pass
+
+    async def goto(self, url, **kwargs):
+        if self.fail_goto:
+            raise PlaywrightTimeout("Timeout 30000ms exceeded (goto)")
+
+    async def wait_for_load_state(self, state=None):
+        pass
+
+    async def wait_for_selector(self, selector, timeout=None):
+        if self.fail_selector:
+            raise PlaywrightTimeout(f"Timeout {timeout}ms exceeded waiting for {selector}")
+
+    async def wait_for_timeout(self, timeout):
+        pass
+
+    async def content(self):
+        return "<html></html>"
+
+
+def lugi_parser(page):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    parser = LUGIParser()
+    parser.rate_controller = RateController()
+
+    @asynccontextmanager
+    async def open_page():
+        yield page
+
+    parser._open_page = open_page
+    return parser
+
+
+def backoffs(parser):
+    return parser.rate_controller.limiter(FakePage.url).stats["backoffs"]
+
+
+def test_selector_timeout_does_not_back_off():
+    parser = lugi_parser(FakePage(fail_selector=True))
+    assert asyncio.run(parser.parse_product_page(FakePage.url)) is None
+    assert backoffs(parser) == 0
+
+
+def test_navigation_timeout_backs_off():
+    parser = lugi_parser(FakePage(fail_goto=True))
+    assert asyncio.run(parser.parse_product_page(FakePage.url)) is None
+    assert backoffs(parser) == 1
+
+
+def run_resilient(parser):
+    from parsers.resilience import Resilience, RetryPolicy
+
+    resilience = Resilience(RetryPolicy(base_delay=0.0), url_timeout=None)
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        return await parser.parse_product_page(FakePage.url)
+
+    try:
+        result = asyncio.run(resilience.call("lugi", attempt))
+    except Exception as e:
+        result = e
+    return result, len(calls), resilience.breaker("lugi").failures
+
+
+def test_selector_timeout_is_parse_failure():
+    for rate_limit in (True, False):
+        parser = lugi_parser(FakePage(fail_selector=True))
+        if not rate_limit:
+            parser.RATE_LIMIT = None
+        assert run_resilient(parser) == (None, 1, 0)
+
+
+def test_navigation_timeout_is_retried():
+    for rate_limit in (True, False):
+        parser = lugi_parser(FakePage(fail_goto=True))
+        if not rate_limit:
+            parser.RATE_LIMIT = None
+        else:
+            # Пауза домена после таймаута не нужна тесту
+            parser.RATE_LIMIT = type(parser.RATE_LIMIT)(cooldown=0.0)
+        result, calls, failures = run_resilient(parser)
+        assert type(result).__name__ == "RetriesExhausted"
+        assert calls == 3 and failures == 3
@@ -0,0 +1,71 @@
+"""Категории по ключевым словам: границы слов, слова разных языков, пакетный режим и перекрытия"""
+import pytest
+
+from ai.keyword_automaton import KeywordAutomaton
+from ai.product_categories import CategoryMatcher, ProductCategory
+
+TEXTS = [
+    "Смартфон Samsung Galaxy S24, 8/256 ГБ",
+    "Ноутбук Lenovo IdeaPad 5, 16 ГБ",
+    "Бездротові навушники JBL Tune 520BT",
+    "Телевізор LG 55\" 4K",
+    "Планшет Apple iPad Air 11",
+    "Smart TV Xiaomi 43 inch",
+    "Творог 5%, 200 г",
+    "",
+]
+
+
+def test_short_keyword_needs_word_boundaries():
+    matcher = CategoryMatcher()
+    assert matcher.match_category("Подставка ATVision для ноутбука") == ProductCategory.LAPTOP
+    assert matcher.match_category("Пульт для tvbox") == ProductCategory.UNKNOWN
+    assert matcher.match_category("Кронштейн для TV, 32-55\"") == ProductCategory.TV
+
+
+def test_long_keyword_matches_word_forms():
+    matcher = CategoryMatcher()
+    assert matcher.match_category("Чехол для смартфона Xiaomi") == ProductCategory.SMARTPHONE
+    assert matcher.match_category("Сумка для ноутбуків 15.6\"") == ProductCategory.LAPTOP
+
+
+@pytest.mark.parametrize("text, category", [
+    ("Бездротові навушники JBL", ProductCategory.HEADPHONES),
+    ("Монітор Dell 27\"", ProductCategory.TV),
+    ("Wireless headphones Sony WH-1000XM5", ProductCategory.HEADPHONES),
+    ("Беспроводные наушники Sony", ProductCategory.HEADPHONES),
+])
+def test_keywords_of_every_language(text, category):
+    matcher = CategoryMatcher()
+    assert matcher.match_category(text, "uk") == category
+    assert matcher.match_category(text, "ru") == category
+
+
+def test_compound_keyword_counts_once():
+    scores = CategoryMatcher().score_categories("Smart TV Samsung")
+    assert scores == {ProductCategory.TV: 2.0}
+
+
+def test_longest_match_wins_over_overlap():
+    automaton = KeywordAutomaton()
+    automaton.add("smart tv", "tv")
+    automaton.add("tv", "tv")
+    automaton.add("tv box", "box")
+
+    matches = automaton.longest_matches("smart tv box")
+    assert [match.keyword for match in matches] == ["smart tv"]
+    assert len(list(automaton.iter_matches("smart tv box"))) == 3
+
+
+def test_same_keyword_of_two_categories_counts_for_both():
+    automaton = KeywordAutomaton()
+    automaton.add("galaxy", "smartphone")
+    automaton.add("galaxy", "tablet")
+
+    assert sorted(match.value for match in automaton.longest_matches("Samsung Galaxy")) == ["smartphone", "tablet"]
+
+
+def test_batch_matches_single_calls():
+    matcher = CategoryMatcher()
+    assert matcher.match_batch(TEXTS) == [matcher.match_category(text) for text in TEXTS]
+    assert matcher.match_batch(TEXTS)[-2:] == [ProductCategory.UNKNOWN, ProductCategory.UNKNOWN]
@@ -0,0 +1,46 @@
+"""
+Разбор только регионов страницы (PRODUCT_REGIONS) должен давать тот же результат,
+что и разбор всей страницы: иначе поле, блок которого не попал в регионы, молча пустеет.
+"""
+import asyncio
+
+import pytest
+
+from parsers.dom import parse_html
+from tests.test_dom_backends import BACKENDS, STORE_SELECTORS, describe, fixture, with_backend
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_lugi_regions_keep_extracted_fields(backend):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    html = fixture("lugi")
+    parser = with_backend(LUGIParser, backend)()
+    regions = asyncio.run(parser._standard_parse(html))
+    parser.PRODUCT_REGIONS = None
+    full = asyncio.run(parser._standard_parse(html))
+
+    assert full["title"] and full["price"] and full["images"] and full["specifications"]
+    assert regions == full
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_lugi_regions_keep_selector_matches(backend):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    html = fixture("lugi")
+    selectors = STORE_SELECTORS["lugi"]
+    regions = describe(parse_html(html, backend, LUGIParser.HTML_FEATURES, LUGIParser.PRODUCT_REGIONS), selectors)
+    full = describe(parse_html(html, backend, LUGIParser.HTML_FEATURES), selectors)
+    assert regions == full
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_lugi_regions_keep_wrapped_title(backend):
+    from parsers.store_specific.lugi_parser import LUGIParser
+
+    html = ('<html><body><div class="product-name"><h1>Чехол Spigen</h1></div>'
+            '<div class="autocalc-product-price">499 грн</div></body></html>')
+    parser = with_backend(LUGIParser, backend)()
+    data = asyncio.run(parser._standard_parse(html))
+    assert data["title"] == "Чехол Spigen"
@@ -0,0 +1,55 @@
+"""
+region_strainer на обеих линейках beautifulsoup4: до 4.13 функцию фильтра вызывает
+сам SoupStrainer с (имя, атрибуты), с 4.13 решение принимает allow_tag_creation.
+Запускать под обеими версиями bs4 (например, 4.12.3 и 4.15)
+"""
+import bs4
+import pytest
+
+from parsers.dom import parse_html, region_strainer
+
+BS4_VERSION = tuple(int(part) for part in bs4.__version__.split(".")[:2])
+REGIONS = ("h1", "#product", ".stock-status")
+
+HTML = """
+<html><body>
+  <header><h2>Меню</h2></header>
+  <h1>Смартфон</h1>
+  <div id="product"><span class="price">1 299 грн</span></div>
+  <p class="stock-status in-stock">В наличии</p>
+  <p class="stock">Не регион</p>
+  <footer>Подвал</footer>
+</body></html>
+"""
+
+ACCEPTED = [("h1", {}), ("div", {"id": "product"}), ("p", {"class": "stock-status in-stock"}),
+            ("p", {"class": ["in-stock", "stock-status"]})]
+REJECTED = [("h2", {}), ("div", {"id": "other"}), ("p", {"class": "stock"}), ("footer", None)]
+
+
+def test_parse_keeps_only_regions():
+    root = parse_html(HTML, "bs4", regions=REGIONS)
+    assert root.select_one("h1").text() == "Смартфон"
+    assert root.select_one("#product .price").text() == "1 299 грн"
+    assert root.select_one(".stock-status").text() == "В наличии"
+    assert root.select_one("header") is None
+    assert root.select_one("footer") is None
+    assert root.select_one("p.stock:not(.stock-status)") is None
+
+
+@pytest.mark.skipif(BS4_VERSION >= (4, 13), reason="поведение beautifulsoup4 < 4.13")
+def test_filter_called_with_attrs_before_4_13():
+    strainer = region_strainer(REGIONS)
+    for name, attrs in ACCEPTED:
+        assert strainer.search_tag(name, attrs or {}), (name, attrs)
+    for name, attrs in REJECTED:
+        assert not strainer.search_tag(name, attrs or {}), (name, attrs)
+
+
+@pytest.mark.skipif(BS4_VERSION < (4, 13), reason="поведение beautifulsoup4 >= 4.13")
+def test_allow_tag_creation_since_4_13():
+    strainer = region_strainer(REGIONS)
+    for name, attrs in ACCEPTED:
+        assert strainer.allow_tag_creation(None, name, attrs), (name, attrs)
+    for name, attrs in REJECTED:
+        assert not strainer.allow_tag_creation(None, name, attrs), (name, attrs)
@@ -0,0 +1,100 @@
+"""Запись и воспроизведение сети: ответы привязаны к странице, а не к порядку задач"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+from parsers.replay import RECORD, REPLAY, NetworkStore, attach_to_context, page_scope
+
+STOCK_URL = "https://shop.example/api/stock?id=1"
+
+
+async def record_pages(store, pages):
+    for page_url, body in pages:
+        with page_scope(page_url):
+            await store.record_async("GET", STOCK_URL, 200, [], body)
+
+
+async def replay_pages(store, page_urls):
+    bodies = {}
+    for page_url in page_urls:
+        with page_scope(page_url):
+            bodies[page_url] = (await store.lookup_async("GET", STOCK_URL)).body
+    return bodies
+
+
+def test_replay_does_not_depend_on_task_order(tmp_path):
+    path = str(tmp_path)
+    asyncio.run(record_pages(NetworkStore(path, RECORD), [("https://shop.example/a", b"A"),
+                                                          ("https://shop.example/b", b"B")]))
+    # Страницы воспроизводятся в обратном порядке, но получают свои ответы
+    bodies = asyncio.run(replay_pages(NetworkStore(path, REPLAY), ["https://shop.example/b", "https://shop.example/a"]))
+    assert bodies == {"https://shop.example/b": b"B", "https://shop.example/a": b"A"}
+
+
+def test_unscoped_entries_replay_in_record_order(tmp_path):
+    recorded = NetworkStore(str(tmp_path), RECORD)
+    recorded.record("GET", STOCK_URL, 200, [], b"first")
+    recorded.record("GET", STOCK_URL, 200, [], b"second")
+    # Старый формат: записи без страницы и номера повтора
+    lines = [json.loads(line) for line in recorded.entries_path.read_text(encoding="utf-8").splitlines()]
+    recorded.entries_path.write_text("".join(
+        json.dumps({key: value for key, value in entry.items() if key not in ("_scope", "_occurrence")}) + "\n"
+        for entry in lines
+    ), encoding="utf-8")
+
+    store = NetworkStore(str(tmp_path), REPLAY)
+    with page_scope("https://shop.example/a"):
+        assert [store.lookup("GET", STOCK_URL).body for _ in range(3)] == [b"first", b"second", b"second"]
+
+
+class FakeRequest:
+    def __init__(self, url, page, navigation=False, redirected_from=None):
+        self.url = url
+        self.method = "GET"
+        self.post_data_buffer = None
+        self.frame = page.main_frame
+        self.redirected_from = redirected_from
+        self._navigation = navigation
+
+    def is_navigation_request(self):
+        return self._navigation
+
+
+class FakeRoute:
+    def __init__(self, request):
+        self.request = request
+        self.body = None
+
+    async def fulfill(self, status, headers, body):
+        self.body = body
+
+    async def abort(self, error_code=None):
+        self.body = None
+
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = SimpleNamespace(page=self)
+
+
+def test_browser_requests_scoped_by_navigation(tmp_path):
+    store = NetworkStore(str(tmp_path), RECORD)
+    # Страница - первый URL цепочки редиректов навигации
+    for page_url, body in [("https://shop.example/a", b"A"), ("https://shop.example/b-old", b"B")]:
+        store.record("GET", STOCK_URL, 200, [], body, scope=page_url)
+    store = NetworkStore(str(tmp_path), REPLAY)
+    handlers = []
+
+    async def route(pattern, handler):
+        handlers.append(handler)
+
+    async def run():
+        await attach_to_context(SimpleNamespace(route=route), store)
+        page = FakePage()
+        old = FakeRequest("https://shop.example/b-old", page, navigation=True)
+        await handlers[0](FakeRoute(FakeRequest("https://shop.example/b", page, navigation=True, redirected_from=old)))
+        stock = FakeRoute(FakeRequest(STOCK_URL, page))
+        await handlers[0](stock)
+        return stock.body
+
+    assert asyncio.run(run()) == b"B"
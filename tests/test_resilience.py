@@ -0,0 +1,33 @@
+"""Предохранитель магазина: отмененная пробная страница не блокирует магазин навсегда"""
+import asyncio
+
+import pytest
+
+from parsers.resilience import HALF_OPEN, Resilience
+
+
+def test_cancelled_probe_is_released():
+    resilience = Resilience(url_timeout=None, failure_threshold=1, reset_timeout=0.0)
+    breaker = resilience.breaker("lugi")
+    breaker._set_state(HALF_OPEN)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(3600)
+
+        probe = asyncio.create_task(resilience.call("lugi", hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def page():
+            return {"title": "ok"}
+
+        return await resilience.call("lugi", page)
+
+    assert asyncio.run(scenario()) == {"title": "ok"}
+    assert breaker.state == "closed"
@@ -0,0 +1,67 @@
+"""BrowserWatchdog публикует замеры браузера и контекстов как gauge"""
+import asyncio
+from types import SimpleNamespace
+
+from parsers.browser_pool import Fingerprint, PooledContext
+from parsers.watchdog import BrowserWatchdog
+from utils.metrics import BROWSER_PAGES_METRIC, BROWSER_RSS_METRIC, CONTEXT_HEAP_METRIC, metrics
+
+MB = 1024 * 1024
+
+
+class FakePage:
+    def __init__(self, heap_mb):
+        self.heap_mb = heap_mb
+
+    async def evaluate(self, script):
+        return self.heap_mb * MB
+
+
+class FakePool:
+    def __init__(self, contexts):
+        self.pooled = contexts
+
+    def contexts(self):
+        return list(self.pooled)
+
+    def stats(self):
+        return {}
+
+
+def pooled(*heaps):
+    context = SimpleNamespace(pages=[FakePage(heap) for heap in heaps])
+    return PooledContext(context=context, fingerprint=Fingerprint(user_agent="test"))
+
+
+def gauges():
+    return {(gauge["name"], gauge["labels"].get("context")): gauge["value"]
+            for gauge in metrics.snapshot()["gauges"]}
+
+
+def test_check_publishes_gauges(monkeypatch):
+    metrics.reset()
+    metrics.enable()
+    try:
+        pool = FakePool([pooled(10, 20), pooled(5)])
+        watchdog = BrowserWatchdog(pool, lambda: object(), max_context_heap_mb=None, max_context_pages=None)
+
+        async def rss(browser):
+            return 300.0
+
+        monkeypatch.setattr(watchdog, "browser_rss_mb", rss)
+        asyncio.run(watchdog.check())
+        assert gauges() == {
+            (BROWSER_RSS_METRIC, None): 300 * MB,
+            (BROWSER_PAGES_METRIC, None): 3,
+            (CONTEXT_HEAP_METRIC, "0"): 30 * MB,
+            (CONTEXT_HEAP_METRIC, "1"): 5 * MB,
+        }
+
+        # Контекст закрыт: его gauge не остается в выводе
+        pool.pooled.pop()
+        asyncio.run(watchdog.check())
+        assert (CONTEXT_HEAP_METRIC, "1") not in gauges()
+        assert gauges()[(BROWSER_PAGES_METRIC, None)] == 2
+    finally:
+        metrics.disable()
+        metrics.reset()
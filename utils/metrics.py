@@ -0,0 +1,471 @@
+"""
+Замеры этапов обхода: спаны (гистограммы длительностей) и счетчики.
+
+Выключено по умолчанию; включается переменной окружения PARSER_METRICS=1
+(или metrics.enable()). В выключенном состоянии span() возвращает общий
+пустой контекстный менеджер, inc() и observe() сразу возвращаются, поэтому
+инструментированный код почти ничего не теряет.
+
+Основные метрики:
+    parser_stage_seconds{stage, store}  гистограмма длительностей этапов
+                                        (browser_launch, goto, content, dom_parse, smart_save, inference, ...)
+    parser_page_seconds{store}          гистограмма полной обработки страницы
+    parser_pages_total{store, status}   счетчик страниц по результату
+    parser_events_total{event, store}   прочие счетчики (попадания в кэш, ошибки и т.п.)
+    parser_rate_limit{domain}           текущие значения (gauge) задает set_gauge, например
+                                        пределы parsers.rate_control и parser_circuit_open{store}
+    parser_browser_rss_bytes            память браузера по замерам parsers.watchdog, а также
+                                        parser_browser_open_pages и parser_context_js_heap_bytes{context}
+
+Для каждой страницы (metrics.page(url, store)) дополнительно собирается
+разбивка по этапам; последние страницы доступны в JSON-снимке (pages).
+
+Пример:
+    from utils.metrics import metrics
+
+    with metrics.page(url, "lugi"):
+        with metrics.span("goto", store="lugi"):
+            await page.goto(url)
+
+    print(metrics.prometheus())        # текстовый формат Prometheus
+    print(json.dumps(metrics.snapshot()))
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Границы корзин гистограмм, секунды: от разбора DOM до загрузки страницы с ожиданиями
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_METRIC = "parser_stage_seconds"
+PAGE_METRIC = "parser_page_seconds"
+PAGES_METRIC = "parser_pages_total"
+EVENTS_METRIC = "parser_events_total"
+RATE_LIMIT_METRIC = "parser_rate_limit"
+RATE_IN_FLIGHT_METRIC = "parser_rate_in_flight"
+CIRCUIT_METRIC = "parser_circuit_open"
+BROWSER_RSS_METRIC = "parser_browser_rss_bytes"
+BROWSER_PAGES_METRIC = "parser_browser_open_pages"
+CONTEXT_HEAP_METRIC = "parser_context_js_heap_bytes"
+
+HELP = {
+    STAGE_METRIC: "Длительность этапа обработки, секунды",
+    PAGE_METRIC: "Полная обработка страницы товара, секунды",
+    PAGES_METRIC: "Обработанные страницы по результату",
+    EVENTS_METRIC: "События обхода",
+    RATE_LIMIT_METRIC: "Текущий предел одновременных запросов к домену",
+    RATE_IN_FLIGHT_METRIC: "Запросы к домену в работе",
+    CIRCUIT_METRIC: "Предохранитель магазина разомкнут (1) или замкнут (0)",
+    BROWSER_RSS_METRIC: "Резидентная память всех процессов браузера, байты",
+    BROWSER_PAGES_METRIC: "Открытые страницы во всех контекстах пула",
+    CONTEXT_HEAP_METRIC: "JS-куча страниц контекста пула, байты",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Разбивка текущей страницы по этапам (см. MetricsRegistry.page)
+_current_page: contextvars.ContextVar[Optional["PageTrace"]] = contextvars.ContextVar("parser_page", default=None)
+
+
+def _enabled_from_env() -> bool:
+    return os.getenv("PARSER_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, "" if value is None else str(value)) for name, value in labels.items()))
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (как у Prometheus)"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Накопленные счетчики по корзинам, включая +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class PageTrace:
+    """Разбивка обработки одной страницы по этапам"""
+
+    __slots__ = ("url", "store", "started", "stages", "seconds", "status")
+
+    def __init__(self, url: str, store: Optional[str]):
+        self.url = url
+        self.store = store
+        self.started = time.time()
+        self.stages: Dict[str, float] = {}
+        self.seconds = 0.0
+        self.status = "ok"
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "store": self.store,
+            "status": self.status,
+            "seconds": round(self.seconds, 4),
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+        }
+
+
+class _NoopSpan:
+    """Спан выключенных метрик"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """Замер этапа: длительность попадает в parser_stage_seconds и в разбивку текущей страницы"""
+
+    __slots__ = ("registry", "stage", "labels", "started")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        seconds = time.perf_counter() - self.started
+        self.registry.observe(STAGE_METRIC, seconds, stage=self.stage, **self.labels)
+        trace = _current_page.get()
+        if trace is not None:
+            trace.add(self.stage, seconds)
+        if exc_type is not None:
+            self.registry.inc(EVENTS_METRIC, event=f"{self.stage}_error", **self.labels)
+        return False
+
+
+class _PageSpan:
+    """Обработка страницы целиком (см. MetricsRegistry.page)"""
+
+    __slots__ = ("registry", "trace", "token", "started")
+
+    def __init__(self, registry: "MetricsRegistry", url: str, store: Optional[str]):
+        self.registry = registry
+        self.trace = PageTrace(url, store)
+
+    def __enter__(self) -> PageTrace:
+        self.token = _current_page.set(self.trace)
+        self.started = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        trace = self.trace
+        trace.seconds = time.perf_counter() - self.started
+        _current_page.reset(self.token)
+        if exc_type is not None:
+            trace.status = "error"
+        self.registry.finish_page(trace)
+        return False
+
+
+class MetricsRegistry:
+    """Хранилище метрик процесса"""
+
+    def __init__(self, enabled: bool = False, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 keep_pages: int = 1000):
+        """
+        Args:
+            enabled (bool): Собирать ли метрики
+            buckets (Tuple[float, ...]): Границы корзин гистограмм, секунды
+            keep_pages (int): Сколько последних страниц хранить с разбивкой по этапам
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._pages: Deque[Dict[str, Any]] = deque(maxlen=keep_pages)
+        # Обработчики завершенных страниц (например, захват медленных страниц)
+        self._page_listeners: List[Any] = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Сбрасывает все накопленные значения"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._pages.clear()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Увеличивает счетчик
+
+        Args:
+            name (str): Имя метрики (например, parser_events_total)
+            value (float): Приращение
+            **labels: Метки
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """
+        Задает текущее значение (gauge)
+
+        Args:
+            name (str): Имя метрики (например, parser_rate_limit)
+            value (float): Значение
+            **labels: Метки
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def clear_gauge(self, name: str):
+        """
+        Удаляет все значения gauge с этим именем (например, перед публикацией
+        нового набора контекстов, чтобы не оставались значения закрытых)
+
+        Args:
+            name (str): Имя метрики
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name]:
+                del self._gauges[key]
+
+    def event(self, event: str, store: Optional[str] = None, value: float = 1):
+        """Счетчик parser_events_total{event, store}"""
+        if self.enabled:
+            self.inc(EVENTS_METRIC, value, event=event, store=store)
+
+    def observe(self, name: str, seconds: float, **labels):
+        """
+        Добавляет значение в гистограмму
+
+        Args:
+            name (str): Имя метрики
+            seconds (float): Значение
+            **labels: Метки
+        """
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def span(self, stage: str, **labels):
+        """
+        Контекстный менеджер замера этапа; работает и вокруг await
+
+        Args:
+            stage (str): Этап (goto, content, dom_parse, ...)
+            **labels: Метки (обычно store)
+        """
+        if not self.enabled:
+            return _NOOP
+        return Span(self, stage, labels)
+
+    def page(self, url: str, store: Optional[str] = None):
+        """
+        Контекстный менеджер обработки страницы: собирает разбивку по этапам
+        из спанов внутри блока. Статус можно уточнить через trace.status
+
+        Args:
+            url (str): URL страницы
+            store (Optional[str]): Магазин
+        """
+        if not self.enabled:
+            return _NOOP
+        return _PageSpan(self, url, store)
+
+    def current_page(self) -> Optional[PageTrace]:
+        """Разбивка страницы, которая обрабатывается в текущей задаче"""
+        return _current_page.get()
+
+    def mark_page(self, status: str):
+        """
+        Задает результат текущей страницы (по умолчанию "ok", при исключении "error")
+
+        Args:
+            status (str): Результат, метка status в parser_pages_total
+        """
+        trace = _current_page.get()
+        if trace is not None:
+            trace.status = status
+
+    def add_page_listener(self, listener):
+        """
+        Подписка на завершенные страницы
+
+        Args:
+            listener (Callable[[PageTrace], None]): Вызывается для каждой завершенной страницы
+        """
+        self._page_listeners.append(listener)
+
+    def remove_page_listener(self, listener):
+        if listener in self._page_listeners:
+            self._page_listeners.remove(listener)
+
+    def finish_page(self, trace: PageTrace):
+        self.observe(PAGE_METRIC, trace.seconds, store=trace.store)
+        self.inc(PAGES_METRIC, store=trace.store, status=trace.status)
+        with self._lock:
+            self._pages.append(trace.as_dict())
+        for listener in list(self._page_listeners):
+            listener(trace)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Снимок метрик для JSON
+
+        Returns:
+            Dict[str, Any]: counters, gauges и histograms (метки, count, sum, p50/p90/p99 по корзинам),
+                pages - последние страницы с разбивкой по этапам
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "p50": histogram.quantile(0.5),
+                    "p90": histogram.quantile(0.9),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": dict(histogram.cumulative()),
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+            pages = list(self._pages)
+        return {"counters": counters, "gauges": gauges, "histograms": histograms, "pages": pages}
+
+    def prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus (exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for name in sorted({name for name, _ in self._gauges}):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+                for (metric, labels), value in sorted(self._gauges.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """
+        Записывает метрики в файл: *.prom - формат Prometheus (для textfile collector), иначе JSON
+
+        Args:
+            path (str): Путь к файлу
+        """
+        import json
+
+        content = self.prometheus() if path.endswith(".prom") else json.dumps(
+            self.snapshot(), ensure_ascii=False, indent=2)
+        # Запись через временный файл: сборщик не увидит недописанный снимок
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(temporary, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# Метрики процесса
+metrics = MetricsRegistry(enabled=_enabled_from_env())
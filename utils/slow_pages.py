@@ -0,0 +1,398 @@
+"""
+Захват медленных страниц: диагностический пакет для URL, которые обрабатывались
+дольше порога по времени или по процессорному времени.
+
+Для каждой страницы (SlowPageCapture.track) собирается:
+    - разбивка по этапам из utils.metrics (метрики включаются при старте захвата);
+    - процессорное время цикла событий, потраченное именно этой задачей;
+    - сэмплы стека Python, снятые, пока выполнялась эта задача;
+    - журнал запросов браузера и HTTP-сессий (URL, статус, байты, время);
+    - итоговый HTML (последний разобранный или содержимое страницы браузера).
+
+Если страница превысила порог, пакет пишется в каталог ring-буфера:
+    <каталог>/<время>_<магазин>_<хэш URL>/
+        summary.json     - URL, причины, время, этапы, ошибка, самые частые функции
+        requests.jsonl   - журнал запросов
+        profile.folded   - стеки в формате flamegraph.pl / speedscope
+        page.html        - HTML
+Хранятся последние keep пакетов, старые удаляются.
+
+Включение: ParserRouter(slow_pages=SlowPageCapture("data/slow_pages")),
+python main.py --slow-pages DIR или переменная окружения PARSER_SLOW_PAGES=DIR.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('parser')
+
+# Кадр стека в сэмпле: (файл, строка, функция)
+Frame = Tuple[str, int, str]
+
+# Страница, которую обрабатывает текущая задача
+_current: contextvars.ContextVar[Optional["PageCapture"]] = contextvars.ContextVar("slow_page", default=None)
+# Запущенный захват (нужен create_session, чтобы подключить журнал HTTP-запросов)
+_active: Optional["SlowPageCapture"] = None
+
+
+def current_capture() -> Optional["PageCapture"]:
+    """Сборщик данных страницы, которую обрабатывает текущая задача (None, если захват выключен)"""
+    return _current.get()
+
+
+def capturing() -> bool:
+    """Запущен ли захват медленных страниц"""
+    return _active is not None
+
+
+class PageCapture:
+    """Данные обработки одной страницы"""
+
+    def __init__(self, url: str, store: Optional[str]):
+        self.url = url
+        self.store = store
+        self.started = time.time()
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.stages: Dict[str, float] = {}
+        self.requests: List[Dict[str, Any]] = []
+        self.samples: Counter = Counter()
+        self.html: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def log_request(self, method: str, url: str, source: str, status: Optional[int] = None,
+                    size: int = 0, seconds: Optional[float] = None, error: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Добавляет запрос в журнал страницы
+
+        Returns:
+            Dict[str, Any]: Запись журнала (статус и байты можно дописать позже)
+        """
+        entry = {
+            "method": method,
+            "url": url,
+            "source": source,
+            "status": status,
+            "bytes": size,
+            "ms": round(seconds * 1000, 1) if seconds is not None else None,
+        }
+        if error:
+            entry["error"] = error
+        self.requests.append(entry)
+        return entry
+
+    def watch(self, page):
+        """
+        Пишет в журнал запросы страницы браузера playwright
+
+        Args:
+            page: Страница playwright
+        """
+        def finished(request):
+            timing = request.timing or {}
+            seconds = timing.get("responseEnd", -1) / 1000 if timing.get("responseEnd", -1) >= 0 else None
+            entry = self.log_request(request.method, request.url, f"browser:{request.resource_type}", seconds=seconds)
+            # Статус и размер доступны только асинхронно; до сохранения пакета они обычно уже известны
+            asyncio.ensure_future(self._fill_browser_entry(request, entry))
+
+        def failed(request):
+            self.log_request(request.method, request.url, f"browser:{request.resource_type}", error=request.failure)
+
+        page.on("requestfinished", finished)
+        page.on("requestfailed", failed)
+
+    @staticmethod
+    async def _fill_browser_entry(request, entry: Dict[str, Any]):
+        try:
+            response = await request.response()
+            if response is not None:
+                entry["status"] = response.status
+            sizes = await request.sizes()
+            entry["bytes"] = sizes.get("responseBodySize", 0)
+        except Exception:
+            # Страница уже закрыта
+            pass
+
+    def summary(self, reasons: List[str], top: int = 25) -> Dict[str, Any]:
+        # Самые частые функции на вершине стека (собственное время)
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            filename, line, name = stack[-1]
+            leaves[f"{name} ({os.path.basename(filename)}:{line})"] += count
+        total = sum(self.samples.values())
+        return {
+            "url": self.url,
+            "store": self.store,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "reasons": reasons,
+            "seconds": round(self.seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "stages": {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+            "error": self.error,
+            "requests": len(self.requests),
+            "request_bytes": sum(entry["bytes"] or 0 for entry in self.requests),
+            "samples": total,
+            "top_functions": [
+                {"function": function, "samples": count, "share": round(count / total, 3)}
+                for function, count in leaves.most_common(top)
+            ],
+        }
+
+    def folded(self) -> str:
+        """Стеки в свернутом формате: "кадр;кадр;кадр количество" """
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ";".join(f"{name} ({os.path.basename(filename)})" for filename, _, name in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class _Metered:
+    """
+    Обертка корутины, которая считает процессорное время ее шагов и отмечает,
+    какая страница сейчас выполняется в цикле событий (для сэмплера стека)
+    """
+
+    def __init__(self, capture: "SlowPageCapture", page: PageCapture, coroutine: Awaitable):
+        self.capture = capture
+        self.page = page
+        self.coroutine = coroutine.__await__()
+
+    def __await__(self):
+        coroutine, page, capture = self.coroutine, self.page, self.capture
+        value, error = None, None
+        while True:
+            capture._running = page
+            started = time.thread_time()
+            try:
+                yielded = coroutine.throw(error) if error is not None else coroutine.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                page.cpu_seconds += time.thread_time() - started
+                capture._running = None
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coroutine.close()
+                raise
+            except BaseException as e:
+                # Отмена задачи и прочие исключения передаются внутрь корутины
+                value, error = None, e
+
+
+class SlowPageCapture:
+    """
+    Захват диагностических пакетов для медленных страниц
+
+    Пример:
+        capture = SlowPageCapture("data/slow_pages", latency_seconds=15)
+        async with ParserRouter(slow_pages=capture) as router:
+            await router.parse_urls(urls)
+    """
+
+    # Глубина сохраняемого стека
+    MAX_STACK_DEPTH = 64
+
+    def __init__(self, directory: str = "data/slow_pages", latency_seconds: Optional[float] = 10.0,
+                 cpu_seconds: Optional[float] = 2.0, keep: int = 100, sample_interval: float = 0.005):
+        """
+        Args:
+            directory (str): Каталог пакетов
+            latency_seconds (Optional[float]): Порог времени обработки страницы; None - не проверять
+            cpu_seconds (Optional[float]): Порог процессорного времени цикла событий; None - не проверять
+            keep (int): Сколько последних пакетов хранить
+            sample_interval (float): Период снятия стека, секунды
+        """
+        self.directory = directory
+        self.latency_seconds = latency_seconds
+        self.cpu_seconds = cpu_seconds
+        self.keep = keep
+        self.sample_interval = sample_interval
+        self.saved = 0
+        self._running: Optional[PageCapture] = None
+        self._loop_thread: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["SlowPageCapture"]:
+        """
+        Захват по переменным окружения: PARSER_SLOW_PAGES (каталог), PARSER_SLOW_PAGE_SECONDS,
+        PARSER_SLOW_PAGE_CPU_SECONDS
+
+        Returns:
+            Optional[SlowPageCapture]: None, если PARSER_SLOW_PAGES не задана
+        """
+        directory = os.getenv("PARSER_SLOW_PAGES")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            latency_seconds=float(os.getenv("PARSER_SLOW_PAGE_SECONDS", 10.0)),
+            cpu_seconds=float(os.getenv("PARSER_SLOW_PAGE_CPU_SECONDS", 2.0)),
+        )
+
+    def start(self):
+        """Запускает сэмплер стека и включает метрики этапов; вызывается из потока цикла событий"""
+        global _active
+        _active = self
+        # Разбивка по этапам берется из utils.metrics
+        metrics.enable()
+        self._loop_thread = threading.get_ident()
+        if self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name="slow-page-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """Останавливает сэмплер"""
+        global _active
+        if _active is self:
+            _active = None
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            page = self._running
+            if page is None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack: List[Frame] = []
+            while frame is not None and len(stack) < self.MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_filename, frame.f_lineno, code.co_name))
+                frame = frame.f_back
+            # Задача могла завершить шаг, пока снимался стек
+            if stack and self._running is page:
+                page.samples[tuple(reversed(stack))] += 1
+
+    async def track(self, url: str, store: Optional[str], coroutine: Awaitable) -> Any:
+        """
+        Выполняет обработку страницы под наблюдением и сохраняет пакет, если она оказалась медленной
+
+        Args:
+            url (str): URL страницы
+            store (Optional[str]): Магазин
+            coroutine (Awaitable): Обработка страницы (например, parser.parse_product_page(url))
+
+        Returns:
+            Any: Результат корутины (исключения пробрасываются дальше)
+        """
+        if self._sampler is None:
+            self.start()
+        page = PageCapture(url, store)
+        token = _current.set(page)
+        started = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            result = await _Metered(self, page, coroutine)
+        except Exception as e:
+            error = e
+        finally:
+            # Отмена (CancelledError) проходит без сохранения пакета
+            _current.reset(token)
+        page.seconds = time.perf_counter() - started
+        if error is not None:
+            page.error = f"{type(error).__name__}: {error}"
+        trace = metrics.current_page()
+        if trace is not None:
+            page.stages = dict(trace.stages)
+
+        reasons = self._reasons(page)
+        if reasons:
+            try:
+                path = await asyncio.to_thread(self._save, page, reasons)
+                logger.warning(f"Медленная страница {url} ({', '.join(reasons)}): {path}")
+            except Exception as e:
+                logger.error(f"Не удалось сохранить пакет медленной страницы {url}: {e}")
+        if error is not None:
+            raise error
+        return result
+
+    def _reasons(self, page: PageCapture) -> List[str]:
+        reasons = []
+        if self.latency_seconds is not None and page.seconds >= self.latency_seconds:
+            reasons.append(f"time {page.seconds:.1f}s >= {self.latency_seconds}s")
+        if self.cpu_seconds is not None and page.cpu_seconds >= self.cpu_seconds:
+            reasons.append(f"cpu {page.cpu_seconds:.1f}s >= {self.cpu_seconds}s")
+        return reasons
+
+    def _save(self, page: PageCapture, reasons: List[str]) -> str:
+        """Пишет пакет страницы и удаляет самые старые сверх keep"""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha1(page.url.encode("utf-8")).hexdigest()[:10]
+        stamp = datetime.fromtimestamp(page.started).strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.directory, f"{stamp}_{page.store or 'unknown'}_{digest}")
+        # Пакет собирается во временном каталоге: в ring-буфере не бывает недописанных пакетов
+        temporary = f"{path}.tmp"
+        os.makedirs(temporary, exist_ok=True)
+        with open(os.path.join(temporary, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(page.summary(reasons), f, ensure_ascii=False, indent=2)
+        with open(os.path.join(temporary, "requests.jsonl"), "w", encoding="utf-8") as f:
+            for entry in page.requests:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        with open(os.path.join(temporary, "profile.folded"), "w", encoding="utf-8") as f:
+            f.write(page.folded())
+        if page.html is not None:
+            with open(os.path.join(temporary, "page.html"), "w", encoding="utf-8") as f:
+                f.write(page.html)
+        os.replace(temporary, path)
+        self.saved += 1
+        metrics.event("slow_page", page.store)
+
+        bundles = sorted(name for name in os.listdir(self.directory) if not name.endswith(".tmp"))
+        for name in bundles[:max(0, len(bundles) - self.keep)]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return path
+
+
+def http_trace_config():
+    """
+    aiohttp.TraceConfig, который пишет запросы сессии в журнал текущей страницы.
+    Подключается в create_session (parsers.replay), пока запущен захват
+    """
+    import aiohttp
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+        context.entry = None
+
+    async def on_request_end(session, context, params):
+        page = _current.get()
+        if page is not None:
+            context.entry = page.log_request(params.method, str(params.url), "http", params.response.status,
+                                             seconds=time.perf_counter() - context.started)
+
+    async def on_response_chunk_received(session, context, params):
+        entry = getattr(context, "entry", None)
+        if entry is not None:
+            entry["bytes"] += len(params.chunk)
+
+    async def on_request_exception(session, context, params):
+        page = _current.get()
+        if page is not None:
+            page.log_request(params.method, str(params.url), "http", seconds=time.perf_counter() - context.started,
+                             error=f"{type(params.exception).__name__}: {params.exception}")
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_end)
+    config.on_response_chunk_received.append(on_response_chunk_received)
+    config.on_request_exception.append(on_request_exception)
+    return config